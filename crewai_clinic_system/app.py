@@ -1,133 +1,160 @@
 import os
 import json
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from celery import Celery
+import hashlib
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
+from celery import chain, uuid
 from dotenv import load_dotenv
-import re
-import time
-import crewai_tools
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
-# Importa a função que executa o processo CrewAI
-from crew_orchestrator import run_crew_process, get_roadmap_phases_from_file
+# O processo web não importa o CrewAI nem o LangChain: as tarefas são enfileiradas pelo nome
+# e executadas pelos workers (crew_tasks.py); aqui só entram o Celery, o Redis e o parser do roteiro.
+from celery_app import (
+    celery,
+    CELERY_BROKER_URL,
+    RUN_CREW_TASK,
+    PLAN_STAGE_TASK,
+    DEVELOPMENT_DISPATCH_TASK,
+    route_for_user_input,
+)
+from progress_events import iter_progress_events
+from metrics import CeleryQueueDepthCollector, render_metrics
+from spec_cache import get_roadmap_from_file
+from run_coalescing import RUN_COALESCING_ENABLED, claim_run, release_run
+from artifact_store import get_artifact, is_artifact_id, list_artifact_references
+from tracing import build_waterfall, load_trace, load_trace_otlp
+from projects import DEFAULT_PROJECT_ID, get_project_paths, init_project, project_exists
+from run_store import (
+    RUN_STORE_PATH,
+    artifact_referenced,
+    get_completed_items,
+    get_latest_run,
+    get_stage_output_info,
+    get_stage_output_chunk,
+    run_exists,
+    import_legacy_json
+)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'your_secret_key_here')
 
-# Configuração do Celery
-app.config['CELERY_BROKER_URL'] = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
-app.config['CELERY_RESULT_BACKEND'] = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
-
-# Dicionário de configuração dedicado para o Celery
-celery_config = {
-    'broker_url': app.config['CELERY_BROKER_URL'],
-    'result_backend': app.config['CELERY_RESULT_BACKEND'],
-    'task_serializer': 'json',
-    'result_serializer': 'json',
-    'accept_content': ['json'],
-    'timezone': 'America/Sao_Paulo',
-    'enable_utc': False,
-    'imports': ('crew_orchestrator', ),
-}
-
-celery = Celery(app.name, broker=app.config['CELERY_BROKER_URL'])
-celery.conf.update(celery_config)
-
-# Caminhos para arquivos (lidos do .env)
+celery_queue_depth = CeleryQueueDepthCollector(CELERY_BROKER_URL)
+
+# Caminhos para arquivos do projeto padrão (lidos do .env); os demais projetos ficam em PROJECTS_DIR (projects.py)
 PROJECT_STATUS_PATH = os.getenv("PROJECT_STATUS_PATH")
 TECHNOLOGIES_AND_ROADMAP_SPEC_PATH = os.getenv("TECHNOLOGIES_AND_ROADMAP_SPEC_PATH")
 SYSTEM_FLOW_SPEC_PATH = os.getenv("SYSTEM_FLOW_SPEC_PATH")
 DER_SPEC_PATH = os.getenv("DER_SPEC_PATH")
 
-# Arquivo para armazenar os resultados da última execução da tarefa Celery
+# Arquivo usado pelas versões anteriores para os resultados da última execução
+# (o histórico agora fica no SQLite em RUN_STORE_PATH; o arquivo só é importado uma vez)
 LAST_RUN_RESULTS_PATH = "last_run_results.json"
 
-def load_project_status():
-    """Carrega o status do projeto do arquivo JSON."""
+try:
+    import_legacy_json(PROJECT_STATUS_PATH, LAST_RUN_RESULTS_PATH)
+except Exception as e:
+    print(f"Erro ao importar os arquivos de status antigos para '{RUN_STORE_PATH}': {e}")
+
+# Quantos caracteres de cada seção a página carrega de início e o tamanho máximo de cada trecho de /runs/<id>/<seção>
+RESULTS_PREVIEW_CHARS = int(os.getenv("RESULTS_PREVIEW_CHARS", "5000"))
+RESULTS_PAGE_CHARS = int(os.getenv("RESULTS_PAGE_CHARS", "50000"))
+
+# Modo do pipeline: "single" (uma tarefa Celery para tudo) ou "canvas" (chain/chord de tarefas por etapa)
+CREW_PIPELINE_MODE = os.getenv("CREW_PIPELINE_MODE", "single")
+
+def load_project_status(project_id: str = DEFAULT_PROJECT_ID):
+    """Carrega os itens concluídos do projeto a partir do histórico de execuções (SQLite)."""
     try:
-        if os.path.exists(PROJECT_STATUS_PATH):
-            with open(PROJECT_STATUS_PATH, 'r', encoding='utf-8') as f:
-                status_data = json.load(f)
-                return status_data.get("completed_items", [])
-        else:
-            # Se o arquivo não existe, cria um novo com uma lista vazia
-            with open(PROJECT_STATUS_PATH, 'w', encoding='utf-8') as f:
-                json.dump({"completed_items": []}, f, indent=2)
-            return []
-    except json.JSONDecodeError:
-        print(f"Erro: Arquivo '{PROJECT_STATUS_PATH}' está corrompido ou mal formatado. Reiniciando status.")
-        with open(PROJECT_STATUS_PATH, 'w', encoding='utf-8') as f:
-            json.dump({"completed_items": []}, f, indent=2)
-        return []
+        return get_completed_items(project_id)
     except Exception as e:
         print(f"Ocorreu um erro ao carregar o status do projeto: {e}")
         return []
 
-def save_project_status(completed_items: list):
-    """Salva o status atualizado do projeto no arquivo JSON."""
-    try:
-        unique_and_sorted_items = sorted(list(set(completed_items)))
-        with open(PROJECT_STATUS_PATH, 'w', encoding='utf-8') as f:
-            json.dump({"completed_items": unique_and_sorted_items}, f, indent=2)
-        print(f"Status do projeto atualizado em '{PROJECT_STATUS_PATH}'.")
-    except Exception as e:
-        print(f"Erro ao salvar o status atualizado do projeto: {e}")
-
-def load_last_run_results():
-    """Carrega os resultados da última execução da tarefa CrewAI do arquivo."""
+def load_last_run_results(project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Carrega os resultados da última execução concluída do projeto: só o início de cada seção (RESULTS_PREVIEW_CHARS);
+    o restante é carregado sob demanda pela página via /runs/<id>/<seção>.
+    """
     try:
-        if os.path.exists(LAST_RUN_RESULTS_PATH):
-            with open(LAST_RUN_RESULTS_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
-    except json.JSONDecodeError:
-        print(f"Erro: Arquivo '{LAST_RUN_RESULTS_PATH}' está corrompido ou mal formatado.")
-        return None
+        return get_latest_run(project_id, preview_chars=RESULTS_PREVIEW_CHARS)
     except Exception as e:
         print(f"Ocorreu um erro ao carregar os resultados da última execução: {e}")
         return None
 
-def save_last_run_results(results: dict):
-    """Salva os resultados da última execução da tarefa CrewAI em um arquivo."""
-    try:
-        with open(LAST_RUN_RESULTS_PATH, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2)
-        print(f"Resultados da última execução salvos em '{LAST_RUN_RESULTS_PATH}'.")
-    except Exception as e:
-        print(f"Erro ao salvar os resultados da última execução: {e}")
-
-@celery.task
-def run_crew_task(user_input: str, current_completed_tasks: list):
+def start_crew_pipeline(user_input: str, current_completed_tasks: list, run_id: str = None,
+                        project_id: str = DEFAULT_PROJECT_ID) -> str:
     """
-    Tarefa Celery para executar o processo da CrewAI em segundo plano.
-    Salva os resultados em um arquivo após a conclusão.
+    Dispara o pipeline em etapas e retorna o id da execução.
+    O id é o da tarefa de despacho, que ao se substituir passa a ter o resultado final,
+    então /status/<id> e /events/<id> funcionam como no modo de tarefa única.
+    As etapas seguintes herdam a fila e a prioridade escolhidas aqui.
     """
-    app.app_context().push() # Necessário para acessar configurações de app dentro da tarefa Celery
-    
-    print(f"Iniciando tarefa CrewAI com input: {user_input}")
-    
-    results = run_crew_process(user_input, current_completed_tasks)
-    
-    # Atualiza o status do projeto principal
-    if results.get("newly_completed_items"):
-        updated_completed_tasks = list(set(current_completed_tasks + results["newly_completed_items"]))
-        save_project_status(updated_completed_tasks)
-        results["current_completed_tasks_after_run"] = updated_completed_tasks # Adiciona para o log
-    else:
-        results["current_completed_tasks_after_run"] = current_completed_tasks
+    run_id = run_id or uuid()
+    queue, priority = route_for_user_input(user_input)
+    chain(
+        celery.signature(
+            PLAN_STAGE_TASK, args=(user_input, current_completed_tasks, run_id, priority, project_id)
+        ).set(queue=queue),
+        celery.signature(DEVELOPMENT_DISPATCH_TASK, args=(run_id,)).set(task_id=run_id, queue=queue),
+    ).apply_async()
+    return run_id
 
 
-    save_last_run_results(results) # Salva o resultado completo da execução
+def submit_crew_run(user_input: str, current_completed_tasks: list, project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Enfileira uma execução do projeto, a menos que uma idêntica (mesmo projeto, mesma instrução normalizada
+    e mesmo status) já esteja em andamento: nesse caso retorna o id dela. Retorna (id da execução, se foi reaproveitada).
+    """
+    run_id = uuid()
+    if RUN_COALESCING_ENABLED:
+        try:
+            existing_run_id = claim_run(
+                user_input, current_completed_tasks, run_id,
+                is_stale=lambda other_id: celery.AsyncResult(other_id).ready(),
+                project_id=project_id
+            )
+        except Exception as e:
+            print(f"Erro ao verificar execuções em andamento (seguindo sem reaproveitamento): {e}")
+            existing_run_id = None
+        if existing_run_id:
+            return existing_run_id, True
 
-    print(f"Tarefa CrewAI concluída. Resultados salvos.")
-    return results
+    try:
+        if CREW_PIPELINE_MODE == "canvas":
+            start_crew_pipeline(user_input, current_completed_tasks, run_id, project_id)
+        else:
+            queue, priority = route_for_user_input(user_input)
+            celery.send_task(RUN_CREW_TASK, args=(user_input, current_completed_tasks),
+                             kwargs={"priority": priority, "project_id": project_id}, task_id=run_id, queue=queue)
+    except Exception:
+        # Nada foi enfileirado: a marcação não pode ficar no Redis, senão os envios idênticos seguintes seriam
+        # reaproveitados numa execução que não existe (o id nunca enfileirado fica PENDING, nunca "ready")
+        if RUN_COALESCING_ENABLED:
+            try:
+                release_run(run_id)
+            except Exception as e:
+                print(f"Erro ao liberar a execução {run_id} para novos envios: {e}")
+        raise
+    return run_id, False
+
+def project_error(project_id: str):
+    """
+    Resposta de erro para um projeto com id inválido (400) ou que ainda não existe (404); None se o projeto existe.
+    Leituras nunca criam o projeto (nem o seu banco do histórico): só o envio de uma execução ou projects.py.
+    """
+    try:
+        exists = project_exists(project_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not exists:
+        return jsonify({'error': f"Projeto '{project_id}' não encontrado. Crie-o com: python projects.py {project_id}"}), 404
+    return None
 
 # Novo endpoint para verificar o status da tarefa
 @app.route('/status/<task_id>')
 def task_status(task_id):
-    task = run_crew_task.AsyncResult(task_id)
+    task = celery.AsyncResult(task_id)
 
     if task.state == 'PENDING':
         response = {
@@ -152,20 +179,136 @@ def task_status(task_id):
     return jsonify(response)
 
 
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    completed_tasks = load_project_status()
-    error_roadmap, roadmap_phases = get_roadmap_phases_from_file()
-    
-    # Correção: Garante que roadmap_phases é um dicionário, mesmo que a função retorne uma lista vazia ou um erro
-    if not isinstance(roadmap_phases, dict):
-        roadmap_phases = {}
+@app.route('/events/<task_id>')
+def task_events(task_id):
+    """Stream Server-Sent Events com o progresso da tarefa, publicado pelo worker via Redis."""
+    def stream():
+        for event in iter_progress_events(task_id):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"data: {json.dumps(event)}\n\n"
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/runs/<run_id>/<section>', defaults={'project_id': DEFAULT_PROJECT_ID})
+@app.route('/projects/<project_id>/runs/<run_id>/<section>')
+def run_section(project_id, run_id, section):
+    """
+    Trecho da saída de uma seção da execução (planning, development, development:<tarefa>...) por offset/limit,
+    em caracteres. O ETag muda quando a seção é regravada; If-None-Match igual responde 304 sem ler o texto.
+    """
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', RESULTS_PAGE_CHARS, type=int), 1), RESULTS_PAGE_CHARS)
+
+    error = project_error(project_id)
+    if error:
+        return error
+    info = get_stage_output_info(run_id, section, project_id)
+    if info is None:
+        return jsonify({'error': 'Execução ou seção não encontrada.'}), 404
+    etag = hashlib.sha256(f"{run_id}\0{section}\0{info['created_at']}\0{offset}\0{limit}".encode("utf-8")).hexdigest()[:32]
+    if etag in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'})
+
+    chunk = get_stage_output_chunk(run_id, section, offset, limit, project_id)
+    if chunk is None:
+        return jsonify({'error': 'Execução ou seção não encontrada.'}), 404
+    next_offset = offset + len(chunk['content'])
+    response = jsonify({
+        'run_id': run_id,
+        'section': section,
+        'offset': offset,
+        'limit': limit,
+        'length': chunk['length'],
+        'next_offset': next_offset if next_offset < chunk['length'] else None,
+        'content': chunk['content'],
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/runs/<run_id>/trace', defaults={'project_id': DEFAULT_PROJECT_ID})
+@app.route('/projects/<project_id>/runs/<run_id>/trace')
+def run_trace(project_id, run_id):
+    """
+    Linha do tempo (cascata) dos spans da execução: tarefas Celery, kickoffs, tarefas, chamadas ao LLM e às ferramentas.
+    Com ?format=otlp, retorna os spans gravados em JSON no formato do OTLP (ExportTraceServiceRequest, com resource e scope).
+    """
+    error = project_error(project_id)
+    if error:
+        return error
+    if not run_exists(run_id, project_id):
+        return jsonify({'error': 'Execução não encontrada.'}), 404
+    if request.args.get('format') == 'otlp':
+        return jsonify(load_trace_otlp(run_id))
+    return render_template('trace.html', run_id=run_id, project_id=project_id, waterfall=build_waterfall(load_trace(run_id)))
+
+
+@app.route('/artifacts/<digest>', defaults={'project_id': DEFAULT_PROJECT_ID})
+@app.route('/projects/<project_id>/artifacts/<digest>')
+def artifact(project_id, digest):
+    """
+    Conteúdo de um artefato gerado (um arquivo por vez). O conteúdo nunca muda para o mesmo hash.
+    Só são servidos os artefatos referenciados por alguma execução do projeto.
+    """
+    error = project_error(project_id)
+    if error:
+        return error
+    content = get_artifact(digest) if is_artifact_id(digest) and artifact_referenced(digest, project_id) else None
+    if content is None:
+        return jsonify({'error': 'Artefato não encontrado.'}), 404
+    return Response(
+        content,
+        mimetype='text/plain',
+        headers={'ETag': f'"{digest}"', 'Cache-Control': 'public, max-age=31536000, immutable'}
+    )
+
+
+@app.route('/metrics')
+def metrics():
+    """Métricas no formato do Prometheus: etapas, agentes (LLM, tokens, ferramentas), tarefas e filas do Celery."""
+    body, content_type = render_metrics(extra_collectors=(celery_queue_depth,))
+    return Response(body, content_type=content_type)
+
+
+@app.route('/', methods=['GET', 'POST'], defaults={'project_id': DEFAULT_PROJECT_ID})
+@app.route('/projects/<project_id>/', methods=['GET', 'POST'])
+def index(project_id):
+    # Cada projeto tem seus próprios arquivos de especificação e de status (criados a partir do padrão).
+    # Só o envio de uma execução cria um projeto novo; na leitura, um projeto inexistente é 404.
+    if request.method == 'POST':
+        try:
+            init_project(project_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    error = project_error(project_id)
+    if error:
+        return error
+    paths = get_project_paths(project_id)
+
+    completed_tasks = load_project_status(project_id)
+    # Fases do roteiro com seus sub-itens ({fase: [sub-itens]}), parseadas só quando o arquivo muda
+    error_roadmap, roadmap_phases = get_roadmap_from_file(paths.technologies_and_roadmap_spec)
     
-    # Carrega os resultados da última execução do arquivo
-    last_run_results = load_last_run_results()
+    # Carrega os resultados da última execução do projeto
+    last_run_results = load_last_run_results(project_id)
     planning_output = last_run_results.get("planning_result") if last_run_results else None
     development_output = last_run_results.get("development_result") if last_run_results else None
     error_message = last_run_results.get("error") if last_run_results else None
+    # Tamanho completo de cada seção: a página carrega o restante sob demanda
+    section_lengths = last_run_results.get("section_lengths", {}) if last_run_results else {}
+    # O código gerado fica no armazenamento de artefatos; a página lista os arquivos com links
+    if last_run_results and last_run_results["stage_outputs"].get("artifacts"):
+        artifacts = json.loads(last_run_results["stage_outputs"]["artifacts"])
+    else:
+        artifacts = list_artifact_references(development_output)
 
     # Se houver erro ao carregar roadmap, sobrescreve o erro da última execução
     if error_roadmap:
@@ -174,13 +317,16 @@ def index():
     if request.method == 'POST':
         user_input = request.form['user_input']
         
-        # Dispara a tarefa Celery e obtém o ID
-        task = run_crew_task.delay(user_input, list(completed_tasks))
-        
-        flash(f"Processo CrewAI iniciado em segundo plano.", 'info')
+        # Dispara a tarefa Celery (ou o pipeline em etapas), ou acompanha uma execução idêntica em andamento
+        task_id, coalesced = submit_crew_run(user_input, list(completed_tasks), project_id)
+
+        if coalesced:
+            flash(f"Uma execução idêntica já está em andamento; acompanhando o progresso dela.", 'info')
+        else:
+            flash(f"Processo CrewAI iniciado em segundo plano.", 'info')
         
         # Redireciona com o task_id na URL para que o JS possa monitorar
-        return redirect(url_for('index', task_id=task.id))
+        return redirect(url_for('index', project_id=project_id, task_id=task_id))
 
     return render_template(
         'index.html',
@@ -188,6 +334,10 @@ def index():
         completed_tasks=completed_tasks,
         planning_output=planning_output,
         development_output=development_output,
+        artifacts=artifacts,
+        run_id=last_run_results["id"] if last_run_results else None,
+        project_id=project_id,
+        section_lengths=section_lengths,
         error_message=error_message,
     )
 
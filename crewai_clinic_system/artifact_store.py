@@ -0,0 +1,138 @@
+import os
+import re
+import hashlib
+import tempfile
+from urllib.parse import quote, unquote
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Artefatos gerados pelas tarefas (código, Dockerfiles, compose...) ficam em disco, endereçados pelo
+# SHA-256 do conteúdo: arquivos idênticos de execuções diferentes são gravados uma única vez e os
+# resultados (backend do Celery, histórico, página) guardam só a referência.
+ARTIFACT_STORE_ENABLED = os.getenv("ARTIFACT_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+ARTIFACT_STORE_DIR = os.getenv("ARTIFACT_STORE_DIR", "artifacts")
+# Blocos de código menores que isso continuam no texto (a referência não compensaria)
+ARTIFACT_MIN_BYTES = int(os.getenv("ARTIFACT_MIN_BYTES", "200"))
+
+# Bloco de código em Markdown: ```info\n...\n```, em que a info começa pela linguagem ("python title=app.py")
+_CODE_BLOCK = re.compile(r"^```([^\n]*)\n(.*?)\n```[ \t]*$", re.DOTALL | re.MULTILINE)
+_LANGUAGE = re.compile(r"[ \t]*([\w+#.-]*)")
+# Referência deixada no lugar do bloco: [artefato sha256:<hash> lang=<linguagem> nome=<arquivo> bytes=<tamanho>];
+# se a linha de abertura tinha mais que a linguagem, ela vai inteira (codificada) em info=<...> depois de lang
+_REFERENCE = re.compile(r"\[artefato sha256:([0-9a-f]{64}) lang=(\S*)(?: info=(\S*))? nome=(\S*) bytes=(\d+)\]")
+# Nome de arquivo citado na linha anterior ao bloco ("**backend/app.py**", "Arquivo: Dockerfile", "`docker-compose.yml`:")
+_FILE_NAME = re.compile(r"([\w.-]+(?:/[\w.-]+)*\.\w+|Dockerfile|Makefile|Procfile)\b")
+
+
+def _artifact_path(digest: str) -> str:
+    return os.path.join(ARTIFACT_STORE_DIR, digest[:2], digest)
+
+
+def is_artifact_id(digest: str) -> bool:
+    return bool(re.fullmatch(r"[0-9a-f]{64}", digest or ""))
+
+
+def put_artifact(content: str) -> str:
+    """Grava o conteúdo (se ainda não existir) e retorna seu SHA-256. A escrita é atômica (temporário + rename)."""
+    data = content.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    path = _artifact_path(digest)
+    if os.path.exists(path):
+        return digest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest
+
+
+def get_artifact(digest: str):
+    """Retorna o conteúdo do artefato, ou None se ele não existir."""
+    if not is_artifact_id(digest):
+        return None
+    try:
+        with open(_artifact_path(digest), 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _file_name_before(text: str, position: int) -> str:
+    """Nome de arquivo citado na última linha não vazia antes do bloco, ou ''."""
+    previous_lines = [line for line in text[:position].splitlines()[-2:] if line.strip()]
+    if not previous_lines:
+        return ""
+    match = _FILE_NAME.search(previous_lines[-1])
+    return match.group(1) if match else ""
+
+
+def externalize_artifacts(text: str, task_name: str = ""):
+    """
+    Move os blocos de código do texto para o armazenamento de artefatos.
+    Retorna (texto com referências no lugar dos blocos, lista de metadados dos artefatos).
+    Referências já presentes no texto entram na lista, então a função pode ser aplicada mais de uma vez.
+    """
+    if not text or not ARTIFACT_STORE_ENABLED:
+        return text, []
+    artifacts = []
+
+    def replace(match):
+        info, content = match.group(1), match.group(2)
+        if len(content.encode("utf-8")) < ARTIFACT_MIN_BYTES:
+            return match.group(0)
+        language = _LANGUAGE.match(info).group(1)
+        info_field = f" info={quote(info, safe='')}" if info != language else ""
+        name = _file_name_before(text, match.start())
+        digest = put_artifact(content)
+        return f"[artefato sha256:{digest} lang={language}{info_field} nome={name} bytes={len(content.encode('utf-8'))}]"
+
+    text = _CODE_BLOCK.sub(replace, text)
+    for digest, language, _, name, size in _REFERENCE.findall(text):
+        artifacts.append({"sha256": digest, "name": name, "language": language, "bytes": int(size), "task": task_name})
+    return text, artifacts
+
+
+def inline_artifacts(text: str) -> str:
+    """Troca as referências pelo conteúdo dos artefatos (blocos de código), para entregar o texto completo ao LLM."""
+    if not text or "[artefato sha256:" not in text:
+        return text
+
+    def replace(match):
+        content = get_artifact(match.group(1))
+        if content is None:
+            return match.group(0)
+        info = unquote(match.group(3)) if match.group(3) is not None else match.group(2)
+        return f"```{info}\n{content}\n```"
+
+    return _REFERENCE.sub(replace, text)
+
+
+def list_artifact_references(text: str) -> list:
+    """Metadados das referências a artefatos presentes no texto (sem ler os arquivos)."""
+    return [
+        {"sha256": digest, "name": name, "language": language, "bytes": int(size)}
+        for digest, language, _, name, size in _REFERENCE.findall(text or "")
+    ]
+
+
+def externalize_results(results: dict) -> dict:
+    """
+    Substitui o código do resultado do desenvolvimento por referências e lista os artefatos em results["artifacts"].
+    Aplicado antes de o resultado ir para o backend do Celery e para o histórico.
+    """
+    if not ARTIFACT_STORE_ENABLED or not isinstance(results.get("development_result"), str):
+        return results
+    try:
+        development_result, artifacts = externalize_artifacts(results["development_result"])
+    except OSError as e:
+        print(f"Erro ao gravar os artefatos em '{ARTIFACT_STORE_DIR}' (o resultado segue completo): {e}")
+        return results
+    return {**results, "development_result": development_result, "artifacts": artifacts}
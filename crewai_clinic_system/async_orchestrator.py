@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+from projects import DEFAULT_PROJECT_ID
+from crew_orchestrator import (
+    DEVELOPMENT_STAGE_TIME_LIMIT,
+    StatusUpdateError,
+    StageTimeLimitExceeded,
+    DevelopmentStageError,
+    with_partial_development,
+    prepare_run_state,
+    run_planning_stage,
+    run_development_task_stage,
+    run_status_update_stage,
+    combine_development_outputs,
+    build_run_results,
+    _notify,
+)
+from metrics import track_stage
+from crew_config.tasks import TASK_DEPENDENCIES
+from crew_config.rate_limiter import get_llm_priority, llm_priority
+from crew_config.budget import run_budget
+from tracing import current_span, span, use_span
+
+# Motor usado por run_crew_task: "sync" (uma execução bloqueia o processo/thread do worker) ou "async"
+# (as execuções do processo compartilham um event loop e o limite de chamadas simultâneas abaixo).
+# O "async" é um descarregamento em threads: o CrewAI fixado não tem kickoff assíncrono, então cada kickoff
+# bloqueante roda numa thread do executor do loop; memória e threads do worker não diminuem.
+CREW_ENGINE = os.getenv("CREW_ENGINE", "sync")
+# Máximo de kickoffs (esperas pelo LLM) simultâneos por processo, somando todas as execuções
+ASYNC_MAX_CONCURRENT_KICKOFFS = int(os.getenv("ASYNC_MAX_CONCURRENT_KICKOFFS", "32"))
+
+# Um semáforo por event loop (asyncio.Semaphore fica preso ao loop em que é usado)
+_semaphores = weakref.WeakKeyDictionary()
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+def _kickoff_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(ASYNC_MAX_CONCURRENT_KICKOFFS)
+    return semaphore
+
+
+async def _offload(func, *args):
+    """
+    Executa uma etapa bloqueante (kickoff do CrewAI) numa thread do executor, respeitando o limite de kickoffs
+    simultâneos. O loop continua livre para agendar as demais tarefas e execuções enquanto o LLM responde,
+    mas a espera pelo LLM continua ocupando uma thread.
+    """
+    async with _kickoff_semaphore():
+        return await asyncio.to_thread(func, *args)
+
+
+async def run_tasks_as_dag_async(state: dict, progress_callback=None, time_limit: int = DEVELOPMENT_STAGE_TIME_LIMIT) -> dict:
+    """
+    Versão assíncrona de run_tasks_as_dag: cada tarefa vira uma corrotina assim que suas dependências
+    terminam; o paralelismo é limitado pelo semáforo de kickoffs do processo, não por execução.
+    Falhas e tempo esgotado levantam DevelopmentStageError com as saídas das tarefas que concluíram.
+    """
+    task_names = state["tasks_for_dev_crew"]
+    dependencies = {
+        name: [dep for dep in TASK_DEPENDENCIES.get(name, ()) if dep in task_names]
+        for name in task_names
+    }
+
+    outputs = dict(state["development_outputs"])
+    pending = {name: deps for name, deps in dependencies.items() if name not in outputs}
+    running = {}
+    deadline = time.monotonic() + time_limit if time_limit else None
+    try:
+        while pending or running:
+            ready = [name for name, deps in pending.items() if all(dep in outputs for dep in deps)]
+            for name in ready:
+                del pending[name]
+                snapshot = {**state, "development_outputs": dict(outputs)}
+                running[asyncio.create_task(_offload(run_development_task_stage, snapshot, name, progress_callback))] = name
+
+            if not running:
+                raise ValueError(f"Dependência circular entre as tarefas: {sorted(pending)}")
+
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise StageTimeLimitExceeded(
+                    f"Tempo limite de {time_limit}s da etapa de desenvolvimento esgotado; tarefas interrompidas: {sorted(running.values())}"
+                )
+            for future in done:
+                name = running.pop(future)
+                outputs[name] = future.result()
+    except Exception as e:
+        # Não agenda novas tarefas; as que estão rodando são canceladas (a thread de um kickoff preso é abandonada)
+        for other in running:
+            other.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        raise DevelopmentStageError(str(e), outputs) from e
+
+    return outputs
+
+
+async def run_development_stage_async(state: dict, progress_callback=None) -> dict:
+    """Etapa 2 no motor assíncrono: sempre uma crew por tarefa, agendadas pelo grafo de dependências."""
+    tasks_for_dev_crew = state["tasks_for_dev_crew"]
+    if not tasks_for_dev_crew:
+        return state
+
+    _notify(progress_callback, "development", "started", "Desenvolvimento iniciado.", tasks=tasks_for_dev_crew)
+    try:
+        with track_stage("development"), span("stage", stage="development", tasks=",".join(tasks_for_dev_crew)):
+            outputs = await run_tasks_as_dag_async(state, progress_callback)
+    except DevelopmentStageError as e:
+        _notify(progress_callback, "development", "failed", f"Erro na etapa de desenvolvimento: {e}")
+        raise
+    _notify(progress_callback, "development", "finished", "Desenvolvimento concluído.")
+    return {
+        **state,
+        "development_outputs": outputs,
+        "development_result": combine_development_outputs(tasks_for_dev_crew, outputs),
+    }
+
+
+async def run_crew_process_async(user_input: str, current_completed_tasks: list, progress_callback=None,
+                                 project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Versão assíncrona de run_crew_process, com os mesmos resultados e erros.
+    Várias execuções podem rodar no mesmo event loop; só os kickoffs ocupam threads, e no máximo
+    ASYNC_MAX_CONCURRENT_KICKOFFS ao mesmo tempo. O orçamento da execução vale para todas as suas tarefas.
+    """
+    with run_budget(project_id):
+        error_roadmap, state = prepare_run_state(user_input, current_completed_tasks, project_id)
+        if error_roadmap:
+            return error_roadmap
+
+        try:
+            state = await _offload(run_planning_stage, state, progress_callback)
+        except Exception as e:
+            return {"error": f"Erro na etapa de planejamento: {e}", "planning_result": state["planning_result"], "development_result": "N/A", "newly_completed_items": []}
+
+        try:
+            state = await run_development_stage_async(state, progress_callback)
+        except DevelopmentStageError as e:
+            return build_run_results(with_partial_development(state, e.partial_outputs), [], f"Erro na etapa de desenvolvimento: {e}")
+
+        try:
+            newly_completed_items, context_report = await _offload(run_status_update_stage, state, progress_callback)
+        except json.JSONDecodeError as e:
+            return build_run_results(state, [], f"Erro de formato JSON na atualização de status. Tente novamente ou ajuste a instrução. Detalhes: {e}")
+        except StatusUpdateError as e:
+            return build_run_results(state, [], f"Erro geral na atualização de status: {e}. Resultado bruto: {e.raw_output}")
+        except Exception as e:
+            return build_run_results(state, [], f"Erro na atualização de status: {str(e) or type(e).__name__}")
+
+        return build_run_results(state, newly_completed_items, status_update_context=context_report)
+
+
+def _get_process_loop() -> asyncio.AbstractEventLoop:
+    """Event loop compartilhado pelas execuções deste processo, rodando numa thread própria (recriado após fork)."""
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(
+                max_workers=ASYNC_MAX_CONCURRENT_KICKOFFS, thread_name_prefix="crew-kickoff"
+            ))
+            threading.Thread(target=loop.run_forever, name="crew-event-loop", daemon=True).start()
+            _loop, _loop_pid = loop, os.getpid()
+        return _loop
+
+
+def run_crew_process_on_loop(user_input: str, current_completed_tasks: list, progress_callback=None,
+                             project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Ponto de entrada síncrono (para run_crew_task): agenda a execução no event loop do processo e espera o resultado.
+    Com o pool de threads do Celery, dezenas de execuções do mesmo processo dividem um único loop.
+    """
+    priority = get_llm_priority()
+    parent_span = current_span()
+
+    async def run_with_caller_priority():
+        # A corrotina roda no contexto da thread do loop; a prioridade e o span (trace) de quem chamou são repassados
+        with llm_priority(priority), use_span(parent_span):
+            return await run_crew_process_async(user_input, current_completed_tasks, progress_callback, project_id)
+
+    future = asyncio.run_coroutine_threadsafe(run_with_caller_priority(), _get_process_loop())
+    try:
+        return future.result()
+    except BaseException:
+        # Ex: limite de tempo do Celery na thread que espera; a execução no loop é cancelada
+        future.cancel()
+        raise
@@ -0,0 +1,248 @@
+"""
+Execução em lote: lê um JSONL de pedidos e roda cada um com run_crew_process, com concorrência limitada.
+
+Cada linha da entrada é um objeto JSON:
+  {"id": "clinica-a-fase-1", "project": "clinica-a", "user_input": "1"}
+"project" é opcional (projeto padrão) e "id" também (o número da linha é usado no lugar).
+
+Modos:
+  process  um pool de processos nesta máquina (--workers, padrão: número de CPUs)
+  celery   os pedidos vão para a fila de lote dos workers Celery, no máximo --workers ao mesmo tempo
+
+Cada pedido concluído vira uma linha no JSONL de saída assim que termina. Rodar de novo o mesmo comando
+retoma o lote: pedidos que já têm uma linha "ok" na saída são pulados e os que falharam são executados de novo.
+
+Uso:
+  python batch_runner.py pedidos.jsonl resultados.jsonl --workers 8
+  python batch_runner.py pedidos.jsonl resultados.jsonl --mode celery --workers 16
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_records(path: str) -> list:
+    """Lê os pedidos do JSONL: [(id, projeto, instrução)]. Linhas vazias são ignoradas; as inválidas levantam ValueError."""
+    from projects import DEFAULT_PROJECT_ID, validate_project_id
+
+    records, seen = [], set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Linha {line_number} de '{path}' não é JSON válido: {e}")
+            user_input = str(record.get("user_input") or "").strip()
+            if not user_input:
+                raise ValueError(f"Linha {line_number} de '{path}' sem 'user_input'.")
+            record_id = str(record.get("id") or line_number)
+            if record_id in seen:
+                raise ValueError(f"Id repetido na linha {line_number} de '{path}': {record_id}")
+            seen.add(record_id)
+            records.append((record_id, validate_project_id(record.get("project") or DEFAULT_PROJECT_ID), user_input))
+    return records
+
+
+def load_finished_ids(path: str) -> set:
+    """Ids dos pedidos cuja última linha na saída tem status "ok". Uma última linha cortada (interrupção) é ignorada."""
+    statuses = {}
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            statuses[str(entry.get("id"))] = entry.get("status")
+    return {record_id for record_id, status in statuses.items() if status == "ok"}
+
+
+class ResultWriter:
+    """Acrescenta uma linha por pedido concluído ao JSONL de saída, gravada em disco antes de seguir (fsync)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Se uma execução anterior foi interrompida no meio de uma linha, a próxima começa numa linha nova
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self._file = open(path, 'a', encoding='utf-8')
+        if needs_newline:
+            self._file.write("\n")
+
+    def write(self, entry: dict):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def _entry(record_id: str, project_id: str, user_input: str, duration: float, run_id: str = None,
+           results: dict = None, error: str = None) -> dict:
+    """Linha de saída de um pedido; falha se houve exceção ou se o resultado traz "error"."""
+    error = error or (results or {}).get("error")
+    return {
+        "id": record_id,
+        "project": project_id,
+        "user_input": user_input,
+        "status": "error" if error else "ok",
+        "error": error,
+        "run_id": run_id,
+        "newly_completed_items": (results or {}).get("newly_completed_items", []),
+        "duration_seconds": round(duration, 3),
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+
+
+def run_record(project_id: str, user_input: str) -> dict:
+    """
+    Executa um pedido no processo atual (chamado dentro do pool), com o mesmo registro de uma execução do worker:
+    histórico, artefatos e status do projeto. As chamadas ao LLM usam a prioridade "batch" do limitador de taxa.
+    """
+    from crew_orchestrator import run_crew_process
+    from crew_config.rate_limiter import llm_priority
+    from crew_tasks import save_last_run_results
+    from artifact_store import externalize_results
+    from projects import init_project
+    from run_store import start_run, get_completed_items
+    from tracing import trace_run
+
+    started = time.monotonic()
+    run_id = str(uuid.uuid4())
+    init_project(project_id)
+    start_run(run_id, user_input, project_id)
+    completed = get_completed_items(project_id)
+    with llm_priority("batch"), trace_run(run_id, "batch_run", project_id=project_id):
+        results = run_crew_process(user_input, completed, project_id=project_id)
+    results = externalize_results(results)
+    results["current_completed_tasks_after_run"] = list(set(completed + results.get("newly_completed_items", [])))
+    save_last_run_results(run_id, results, project_id=project_id)
+    return {"run_id": run_id, "results": results, "duration": time.monotonic() - started}
+
+
+def run_with_processes(records: list, writer: ResultWriter, workers: int) -> int:
+    """Roda os pedidos num pool de `workers` processos; retorna quantos falharam."""
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_record, record[1], record[2]): record for record in records}
+        try:
+            for future in as_completed(futures):
+                record_id, project_id, user_input = futures[future]
+                try:
+                    outcome = future.result()
+                    entry = _entry(record_id, project_id, user_input, outcome["duration"], outcome["run_id"], outcome["results"])
+                except Exception as e:
+                    entry = _entry(record_id, project_id, user_input, 0.0, error=f"{type(e).__name__}: {e}")
+                writer.write(entry)
+                failures += entry["status"] != "ok"
+                print(f"[{entry['status']}] {record_id} ({project_id}) em {entry['duration_seconds']:.1f}s")
+        except KeyboardInterrupt:
+            # Pedidos ainda não iniciados são cancelados; os concluídos já estão na saída
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return failures
+
+
+def run_with_celery(records: list, writer: ResultWriter, workers: int, poll_interval: float = 1.0) -> int:
+    """Envia os pedidos à fila de lote do Celery, com no máximo `workers` em andamento; retorna quantos falharam."""
+    from celery_app import celery, RUN_CREW_TASK, queue_for_priority
+    from run_store import get_completed_items
+
+    failures = 0
+    pending = list(records)
+    in_flight = {}
+    try:
+        while pending or in_flight:
+            while pending and len(in_flight) < workers:
+                record_id, project_id, user_input = record = pending.pop(0)
+                async_result = celery.send_task(
+                    RUN_CREW_TASK, args=(user_input, get_completed_items(project_id)),
+                    kwargs={"priority": "batch", "project_id": project_id},
+                    task_id=str(uuid.uuid4()), queue=queue_for_priority("batch"),
+                )
+                in_flight[async_result.id] = (record, async_result, time.monotonic())
+            for task_id, ((record_id, project_id, user_input), async_result, started) in list(in_flight.items()):
+                if not async_result.ready():
+                    continue
+                del in_flight[task_id]
+                result = async_result.get(propagate=False)
+                # Tempo desde o envio (inclui a espera na fila)
+                duration = time.monotonic() - started
+                if async_result.successful() and isinstance(result, dict):
+                    entry = _entry(record_id, project_id, user_input, duration, task_id, result)
+                else:
+                    entry = _entry(record_id, project_id, user_input, duration, task_id, error=f"{type(result).__name__}: {result}")
+                writer.write(entry)
+                failures += entry["status"] != "ok"
+                print(f"[{entry['status']}] {record_id} ({project_id}) em {entry['duration_seconds']:.1f}s")
+            if in_flight:
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        # As execuções já enviadas continuam nos workers; só não entram na saída (serão repetidas ao retomar)
+        print(f"Interrompido; {len(in_flight)} execuções enviadas continuam nos workers: {sorted(in_flight)}")
+        raise
+    return failures
+
+
+MODES = {"process": run_with_processes, "celery": run_with_celery}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Executa em lote os pedidos de um JSONL, com retomada.")
+    parser.add_argument("input", help="JSONL com um pedido por linha: {\"id\", \"project\", \"user_input\"}")
+    parser.add_argument("output", help="JSONL de resultados (acrescentado; usado para retomar o lote)")
+    parser.add_argument("--mode", choices=sorted(MODES), default="process", help="pool de processos local ou workers Celery")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="pedidos executados ao mesmo tempo")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers deve ser pelo menos 1")
+
+    input_path, output_path = os.path.abspath(args.input), os.path.abspath(args.output)
+    # Os caminhos de especificação do .env são relativos à pasta do app
+    os.chdir(APP_DIR)
+    sys.path.insert(0, APP_DIR)
+
+    try:
+        records = read_records(input_path)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    finished = load_finished_ids(output_path)
+    todo = [record for record in records if record[0] not in finished]
+    print(f"{len(records)} pedidos; {len(records) - len(todo)} já concluídos em '{output_path}'; "
+          f"{len(todo)} a executar ({args.mode}, {args.workers} ao mesmo tempo).")
+    if not todo:
+        return 0
+
+    writer = ResultWriter(output_path)
+    try:
+        failures = MODES[args.mode](todo, writer, args.workers)
+    except KeyboardInterrupt:
+        print("Lote interrompido; rode o mesmo comando para retomar.")
+        return 130
+    finally:
+        writer.close()
+    print(f"Lote concluído: {len(todo) - failures} ok, {failures} com erro.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Benchmarks offline do processo CrewAI, usando o modelo roteirizado (LLM_BACKEND=fake) no lugar da OpenAI.
+
+Suítes:
+  crew    run_crew_process de ponta a ponta para cada seleção de fases ("1", "1,2,3", texto livre)
+  celery  vazão de run_crew_task com um worker local (Redis) em diferentes concorrências
+  web     latência das rotas / e /status/<id>
+  startup tempo de importação e memória (RSS) do processo web (app) e do worker (crew_tasks)
+
+Uso:
+  python benchmark.py --suites crew,web --iterations 5 --latency 0.05
+  python benchmark.py --compare bench_results/abc1234.json
+
+Os resultados são gravados em JSON (por padrão bench_results/<commit>.json) para comparar commits.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CREW_SCENARIOS = {
+    "fase_1": "1",
+    "fases_1_2_3": "1,2,3",
+    "texto_livre": "Implementar o cadastro de pacientes com agendamento de consultas",
+}
+
+
+def _configure_environment(args, redis_available: bool):
+    """Ambiente isolado: LLM roteirizado, sem cache de LLM nem checkpoints e histórico em banco temporário."""
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_SECONDS"] = str(args.latency)
+    os.environ["LLM_CACHE_BACKEND"] = ""
+    os.environ["CREW_CHECKPOINTS_ENABLED"] = "false"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ["RUN_STORE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="crew_bench_"), "run_history.sqlite3")
+    if not redis_available:
+        # Sem Redis, /status consulta um backend em memória (a suíte celery é pulada)
+        os.environ["CELERY_RESULT_BACKEND"] = "cache+memory://"
+
+
+def _redis_available(url: str) -> bool:
+    try:
+        import redis
+        return bool(redis.Redis.from_url(url, socket_timeout=1).ping())
+    except Exception:
+        return False
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except Exception:
+        return "desconhecido"
+
+
+def summarize(samples: list) -> dict:
+    """Estatísticas de uma lista de durações (segundos)."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    percentile = lambda p: ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+    return {
+        "count": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+def _llm_calls_total() -> float:
+    from prometheus_client import REGISTRY
+    return sum(
+        sample.value
+        for metric in REGISTRY.collect() if metric.name == "crew_llm_calls"
+        for sample in metric.samples if sample.name == "crew_llm_calls_total"
+    )
+
+
+def bench_crew(args) -> dict:
+    """run_crew_process de ponta a ponta; a sobrecarga de orquestração é o tempo total menos a latência simulada do LLM."""
+    from crew_orchestrator import run_crew_process
+
+    results = {}
+    for scenario, user_input in CREW_SCENARIOS.items():
+        durations, overheads, llm_calls, errors = [], [], [], 0
+        for _ in range(args.iterations):
+            calls_before = _llm_calls_total()
+            start = time.perf_counter()
+            run_results = run_crew_process(user_input, [])
+            elapsed = time.perf_counter() - start
+            calls = _llm_calls_total() - calls_before
+            durations.append(elapsed)
+            llm_calls.append(calls)
+            overheads.append(max(0.0, elapsed - calls * args.latency))
+            if run_results.get("error"):
+                errors += 1
+                print(f"[crew/{scenario}] erro: {run_results['error']}")
+        results[scenario] = {
+            "user_input": user_input,
+            "duration_seconds": summarize(durations),
+            "orchestration_overhead_seconds": summarize(overheads),
+            "llm_calls_per_run": statistics.fmean(llm_calls) if llm_calls else 0,
+            "errors": errors,
+        }
+        print(f"[crew/{scenario}] p50={results[scenario]['duration_seconds']['p50']:.3f}s")
+    return results
+
+
+def _start_worker(concurrency: int):
+    command = [
+        sys.executable, "-m", "celery", "-A", "celery_app.celery", "worker",
+        "--pool=threads", f"--concurrency={concurrency}", "--loglevel=WARNING",
+        f"--hostname=bench-{uuid.uuid4().hex[:8]}@%h",
+    ]
+    return subprocess.Popen(command, cwd=BENCH_DIR, env=dict(os.environ))
+
+
+def _wait_for_worker(celery_app, timeout: float = 60) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if celery_app.control.ping(timeout=1):
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def bench_celery(args) -> dict:
+    """Vazão de run_crew_task com um worker local (pool de threads) para cada concorrência."""
+    from celery_app import celery
+    from crew_tasks import run_crew_task
+
+    results = {}
+    for concurrency in args.concurrency:
+        worker = _start_worker(concurrency)
+        try:
+            if not _wait_for_worker(celery):
+                results[str(concurrency)] = {"error": "worker não respondeu ao ping"}
+                continue
+            celery.control.purge()
+            start = time.perf_counter()
+            submitted = [(time.perf_counter(), run_crew_task.delay("1", [])) for _ in range(args.runs)]
+            latencies = []
+            for submitted_at, async_result in submitted:
+                async_result.get(timeout=args.timeout, propagate=False)
+                latencies.append(time.perf_counter() - submitted_at)
+            elapsed = time.perf_counter() - start
+            results[str(concurrency)] = {
+                "runs": args.runs,
+                "elapsed_seconds": elapsed,
+                "runs_per_second": args.runs / elapsed if elapsed else 0,
+                "latency_seconds": summarize(latencies),
+            }
+            print(f"[celery/concorrência {concurrency}] {results[str(concurrency)]['runs_per_second']:.2f} execuções/s")
+        finally:
+            worker.terminate()
+            try:
+                worker.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+    return results
+
+
+def bench_web(args) -> dict:
+    """Latência das rotas / e /status/<id> pelo cliente de testes do Flask (sem servidor HTTP)."""
+    from app import app
+
+    client = app.test_client()
+    routes = {"index": "/", "status": f"/status/{uuid.uuid4()}"}
+    results = {}
+    for name, path in routes.items():
+        client.get(path) # aquecimento (templates, conexões, cache do roteiro)
+        durations = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            response = client.get(path)
+            durations.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                print(f"[web/{name}] status HTTP {response.status_code}")
+        results[name] = {"path": path, "latency_seconds": summarize(durations)}
+        print(f"[web/{name}] p50={results[name]['latency_seconds']['p50'] * 1000:.2f}ms")
+    return results
+
+
+# Importa o módulo num processo novo e mede tempo, pico de memória e se o CrewAI/LangChain foi carregado
+_STARTUP_PROBE = """
+import sys, time, json, resource
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = sorted({{name.split('.')[0] for name in sys.modules}} & {{'crewai', 'crewai_tools', 'langchain', 'langchain_core', 'langchain_openai', 'openai'}})
+print(json.dumps({{"import_seconds": elapsed, "max_rss_mb": max_rss_kb / 1024, "heavy_modules": heavy}}))
+"""
+
+
+def bench_startup(args) -> dict:
+    """Tempo de importação e memória do processo web (app) e do worker (crew_tasks), cada um num processo novo."""
+    results = {}
+    for role, module in (("web", "app"), ("worker", "crew_tasks")):
+        samples, last = [], {}
+        for _ in range(args.startup_runs):
+            output = subprocess.check_output(
+                [sys.executable, "-c", _STARTUP_PROBE.format(module=module)],
+                cwd=BENCH_DIR, env=dict(os.environ), text=True, stderr=subprocess.DEVNULL
+            )
+            last = json.loads(output.strip().splitlines()[-1])
+            samples.append(last["import_seconds"])
+        results[role] = {
+            "module": module,
+            "import_seconds": summarize(samples),
+            "max_rss_mb": last.get("max_rss_mb"),
+            "heavy_modules": last.get("heavy_modules"),
+        }
+        print(f"[startup/{role}] importação p50={results[role]['import_seconds']['p50']:.2f}s, "
+              f"RSS={results[role]['max_rss_mb']:.0f}MB, pesados={results[role]['heavy_modules']}")
+    return results
+
+
+SUITES = {"crew": bench_crew, "celery": bench_celery, "web": bench_web, "startup": bench_startup}
+
+
+def _flatten(prefix: str, value, into: dict):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, into)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        into[prefix] = value
+    return into
+
+
+def compare(baseline: dict, current: dict):
+    """Imprime a variação percentual das métricas em comum (durações maiores e vazão menor são regressões)."""
+    old = _flatten("", baseline.get("suites", {}), {})
+    new = _flatten("", current.get("suites", {}), {})
+    print(f"\nComparação com {baseline.get('commit')} -> {current.get('commit')}:")
+    for key in sorted(old.keys() & new.keys()):
+        if not key.endswith((".p50", ".p95", ".mean", "runs_per_second", "max_rss_mb")) or not old[key]:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100
+        print(f"  {key}: {old[key]:.4f} -> {new[key]:.4f} ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks offline do processo CrewAI (LLM roteirizado).")
+    parser.add_argument("--suites", default="crew,web", help=f"suítes separadas por vírgula: {', '.join(SUITES)}")
+    parser.add_argument("--iterations", type=int, default=3, help="execuções de run_crew_process por cenário")
+    parser.add_argument("--latency", type=float, default=0.0, help="latência simulada de cada chamada ao LLM (s)")
+    parser.add_argument("--concurrency", default="1,2,4", help="concorrências do worker Celery")
+    parser.add_argument("--runs", type=int, default=8, help="execuções enviadas ao Celery por concorrência")
+    parser.add_argument("--timeout", type=float, default=600, help="tempo máximo de espera por execução no Celery (s)")
+    parser.add_argument("--requests", type=int, default=200, help="requisições por rota na suíte web")
+    parser.add_argument("--startup-runs", type=int, default=3, help="processos novos por papel na suíte startup")
+    parser.add_argument("--output", help="arquivo JSON de saída (padrão: bench_results/<commit>.json)")
+    parser.add_argument("--compare", help="JSON de um benchmark anterior para comparar")
+    args = parser.parse_args(argv)
+    args.concurrency = [int(value) for value in args.concurrency.split(",") if value.strip()]
+
+    broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+    redis_available = _redis_available(broker_url)
+    _configure_environment(args, redis_available)
+    # Os caminhos de especificação do .env são relativos à pasta do app
+    os.chdir(BENCH_DIR)
+    sys.path.insert(0, BENCH_DIR)
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {
+            "latency_seconds": args.latency,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "runs": args.runs,
+            "requests": args.requests,
+            "redis_available": redis_available,
+        },
+        "suites": {},
+    }
+    for suite in [name.strip() for name in args.suites.split(",") if name.strip()]:
+        if suite not in SUITES:
+            parser.error(f"suíte desconhecida: {suite}")
+        if suite == "celery" and not redis_available:
+            print(f"Redis indisponível em {broker_url}; suíte celery ignorada.")
+            report["suites"][suite] = {"skipped": "Redis indisponível"}
+            continue
+        report["suites"][suite] = SUITES[suite](args)
+
+    output = args.output or os.path.join(BENCH_DIR, "bench_results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em '{output}'.")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
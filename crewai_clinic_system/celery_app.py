@@ -0,0 +1,120 @@
+import os
+import bz2
+import gzip
+import zlib
+from celery import Celery
+from kombu import Queue
+from kombu.serialization import register
+from kombu.utils.json import dumps as json_dumps, loads as json_loads
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Configuração do Celery compartilhada pelo processo web e pelos workers.
+# Este módulo não importa o CrewAI: o web enfileira as tarefas pelo nome e só os workers
+# carregam crew_tasks.py (via 'imports'), com o CrewAI, o LangChain e as ferramentas.
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+# Compressão dos resultados (e dos estados passados entre as etapas do modo "canvas"): zlib, gzip, bzip2,
+# zstd (requer o pacote zstandard) ou vazio para desativar. O histórico completo fica no SQLite,
+# então o backend só precisa guardar o resultado até ele ser consultado: CELERY_RESULT_EXPIRES segundos.
+CELERY_RESULT_COMPRESSION = os.getenv('CELERY_RESULT_COMPRESSION', 'zlib') or None
+CELERY_RESULT_EXPIRES = int(os.getenv('CELERY_RESULT_EXPIRES', '86400'))
+
+
+def _compressors(method: str):
+    if method == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+    return {
+        'zlib': (zlib.compress, zlib.decompress),
+        'gzip': (gzip.compress, gzip.decompress),
+        'bzip2': (bz2.compress, bz2.decompress),
+    }[method]
+
+
+def register_compressed_json(method: str) -> str:
+    """
+    Registra no kombu o serializador "json+<método>" (JSON comprimido) e retorna seu nome.
+    O backend de resultados do Celery não comprime sozinho (result_compression não é aplicado),
+    então os resultados usam este serializador.
+    """
+    compress, decompress = _compressors(method)
+    name = f'json+{method}'
+
+    def encode(obj) -> bytes:
+        return compress(json_dumps(obj).encode('utf-8'))
+
+    def decode(data):
+        # Resultados gravados antes da compressão ser ativada estão em JSON puro
+        if isinstance(data, str):
+            return json_loads(data)
+        try:
+            return json_loads(decompress(data).decode('utf-8'))
+        except Exception:
+            return json_loads(data)
+
+    register(
+        name,
+        encode,
+        decode,
+        content_type=f'application/x-json-{method}',
+        content_encoding='binary',
+    )
+    return name
+
+
+def route_for_user_input(user_input: str):
+    """
+    Escolhe a fila e a prioridade no limitador de taxa do LLM ("interactive" ou "batch") de uma execução.
+    Instruções livres são interativas; listas de fases ("1,2,3") vão para a fila bulk conforme as fases escolhidas.
+    """
+    phases = [int(x.strip()) for x in (user_input or "").split(',') if x.strip().isdigit()]
+    if phases and (len(set(phases)) >= CREW_BULK_MIN_PHASES or CREW_BULK_PHASES.intersection(phases)):
+        return CREW_BULK_QUEUE, "batch"
+    return CREW_INTERACTIVE_QUEUE, "interactive"
+
+
+def queue_for_priority(priority: str) -> str:
+    """Fila das etapas de uma execução com a prioridade dada (modo "canvas")."""
+    return CREW_BULK_QUEUE if priority == "batch" else CREW_INTERACTIVE_QUEUE
+
+
+RESULT_SERIALIZER = register_compressed_json(CELERY_RESULT_COMPRESSION) if CELERY_RESULT_COMPRESSION else 'json'
+
+# Filas: execuções curtas (instrução livre, poucas fases) não esperam atrás das longas.
+# Para limitar a espera das interativas, dedique workers à fila interativa (ver README).
+CREW_INTERACTIVE_QUEUE = os.getenv('CREW_INTERACTIVE_QUEUE', 'crew_interactive')
+CREW_BULK_QUEUE = os.getenv('CREW_BULK_QUEUE', 'crew_bulk')
+# Uma lista de fases vai para a fila bulk se tiver ao menos CREW_BULK_MIN_PHASES fases ou incluir uma de CREW_BULK_PHASES
+CREW_BULK_MIN_PHASES = int(os.getenv('CREW_BULK_MIN_PHASES', '2'))
+CREW_BULK_PHASES = {int(x) for x in os.getenv('CREW_BULK_PHASES', '3').split(',') if x.strip().isdigit()}
+
+# Nomes das tarefas registradas em crew_tasks.py
+RUN_CREW_TASK = "crew_tasks.run_crew_task"
+PLAN_STAGE_TASK = "crew_tasks.plan_stage_task"
+DEVELOPMENT_DISPATCH_TASK = "crew_tasks.development_dispatch_task"
+
+# Dicionário de configuração dedicado para o Celery
+celery_config = {
+    'broker_url': CELERY_BROKER_URL,
+    'result_backend': CELERY_RESULT_BACKEND,
+    'task_serializer': 'json',
+    'result_serializer': RESULT_SERIALIZER,
+    'accept_content': ['json'],
+    'result_accept_content': sorted({'json', RESULT_SERIALIZER}),
+    'task_compression': CELERY_RESULT_COMPRESSION,
+    'result_expires': CELERY_RESULT_EXPIRES,
+    'timezone': 'America/Sao_Paulo',
+    'enable_utc': False,
+    'imports': ('crew_tasks', ),
+    # Um worker sem -Q consome as duas filas; tarefas sem fila explícita vão para a interativa
+    'task_queues': (Queue(CREW_INTERACTIVE_QUEUE), Queue(CREW_BULK_QUEUE)),
+    'task_default_queue': CREW_INTERACTIVE_QUEUE,
+    # Cada processo reserva o mínimo de tarefas: uma execução longa não segura outras paradas no worker
+    'worker_prefetch_multiplier': 1,
+}
+
+celery = Celery('crewai_clinic_system', broker=CELERY_BROKER_URL)
+celery.conf.update(celery_config)
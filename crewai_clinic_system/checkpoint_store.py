@@ -0,0 +1,71 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Checkpoints por tarefa: permitem retomar execuções interrompidas e pular tarefas cujas entradas não mudaram
+CREW_CHECKPOINTS_ENABLED = os.getenv("CREW_CHECKPOINTS_ENABLED", "false").lower() in ("1", "true", "yes")
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "checkpoints")
+
+
+def file_hash(path: str) -> str:
+    """Hash SHA-256 do conteúdo do arquivo ('missing' se ele não existir)."""
+    if not path or not os.path.exists(path):
+        return "missing"
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def checkpoint_key(task_name: str, description: str, input_files: list, upstream_outputs: dict) -> str:
+    """
+    Chave do checkpoint de uma tarefa: template/descrição já formatada, hashes dos arquivos
+    que a tarefa lê e saídas das tarefas das quais ela depende.
+    Se qualquer um desses itens mudar, a chave muda e a tarefa é executada de novo.
+    """
+    payload = json.dumps({
+        "task": task_name,
+        "description": description,
+        "files": {path: file_hash(path) for path in sorted(set(input_files))},
+        "upstream": {name: hashlib.sha256(output.encode("utf-8")).hexdigest() for name, output in sorted(upstream_outputs.items())},
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _checkpoint_path(key: str) -> str:
+    return os.path.join(CHECKPOINT_DIR, key[:2], f"{key}.json")
+
+
+def load_checkpoint(key: str):
+    """Retorna a saída gravada para a chave, ou None se não houver checkpoint válido."""
+    path = _checkpoint_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)["output"]
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, KeyError) as e:
+        print(f"Checkpoint '{path}' inválido, será ignorado: {e}")
+        return None
+
+
+def save_checkpoint(key: str, task_name: str, output):
+    """Grava a saída da tarefa de forma atômica (arquivo temporário + rename)."""
+    path = _checkpoint_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"task": task_name, "output": output, "created_at": time.time()}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
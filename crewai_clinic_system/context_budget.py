@@ -0,0 +1,139 @@
+import os
+import re
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Orçamento de tokens para o contexto injetado na tarefa de atualização de status
+STATUS_UPDATE_CONTEXT_BUDGET_TOKENS = int(os.getenv("STATUS_UPDATE_CONTEXT_BUDGET_TOKENS", "6000"))
+OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "gpt-4o")
+
+# Blocos de código em Markdown: ```linguagem\n ... ```
+CODE_BLOCK_PATTERN = re.compile(r"```([\w.+-]*)[^\n]*\n(.*?)```", re.S)
+# Linhas que descrevem a "interface" de um arquivo de código e sobrevivem à compactação
+SIGNATURE_PATTERN = re.compile(
+    r"^\s*(?:async\s+def|def|class|@\w+|(?:export\s+)?(?:default\s+)?(?:async\s+)?function|"
+    r"export\s+(?:default\s+)?(?:const|class|interface|type)|interface|type\s+\w+\s*=|"
+    r"CREATE\s+TABLE|FROM|EXPOSE|CMD|ENTRYPOINT|services:|"
+    r"@app\.|@router\.|router\.\w+\(|app\.(?:get|post|put|delete)\()",
+    re.I
+)
+# Nome do arquivo logo antes de um bloco de código (ex: "**`auth/models.py`**", "Arquivo: Dockerfile")
+FILE_NAME_PATTERN = re.compile(r"([\w./-]+\.\w+|Dockerfile|docker-compose\.ya?ml)\W*$")
+# Primeira linha do bloco com o nome do arquivo em comentário (ex: "# auth/models.py", "// src/App.jsx")
+FILE_COMMENT_PATTERN = re.compile(r"^\s*(?:#|//|<!--)\s*(?:file:|arquivo:)?\s*([\w./-]+\.\w+|Dockerfile)\b", re.I)
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Conta tokens com o tiktoken (se disponível); senão estima ~4 caracteres por token."""
+    global _encoding
+    if not text:
+        return 0
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(OPENAI_MODEL_NAME)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # tiktoken ausente ou sem acesso aos arquivos de encoding (ex: ambiente offline)
+            print(f"tiktoken indisponível ({e}); usando estimativa de tokens por caracteres.")
+            _encoding = False
+    if _encoding is False:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def _code_block_file_name(text_before: str, code: str) -> str:
+    first_line = code.splitlines()[0] if code.strip() else ""
+    comment_match = FILE_COMMENT_PATTERN.match(first_line)
+    if comment_match:
+        return comment_match.group(1)
+    previous_lines = [line for line in text_before.rstrip().splitlines()[-2:] if line.strip()]
+    for line in reversed(previous_lines):
+        name_match = FILE_NAME_PATTERN.search(line.strip().strip("*`:"))
+        if name_match:
+            return name_match.group(1)
+    return ""
+
+
+def compact_code_blocks(text: str) -> str:
+    """Substitui cada bloco de código pelo nome do arquivo e suas assinaturas (classes, funções, rotas, serviços)."""
+    def replace(match):
+        language, code = match.group(1), match.group(2)
+        file_name = _code_block_file_name(text[:match.start()], code)
+        signatures = [line.rstrip() for line in code.splitlines() if SIGNATURE_PATTERN.match(line)]
+        header = f"[código {language or 'texto'}{': ' + file_name if file_name else ''}, {len(code.splitlines())} linhas]"
+        if not signatures:
+            return header
+        return header + "\n" + "\n".join(signatures)
+
+    return CODE_BLOCK_PATTERN.sub(replace, text)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta o texto para caber em max_tokens, mantendo o início e o fim (onde costumam estar resumo e conclusão)."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    marker = "\n[... conteúdo omitido para caber no orçamento de tokens ...]\n"
+    # Aproximação por caracteres, refinada até caber
+    ratio = max_tokens / max(count_tokens(text), 1)
+    keep = int(len(text) * ratio) - len(marker)
+    while keep > 0:
+        candidate = text[:keep * 2 // 3] + marker + text[-(keep // 3):]
+        if count_tokens(candidate) <= max_tokens:
+            return candidate
+        keep = int(keep * 0.9)
+    return marker.strip()
+
+
+def summarize_completed_items(completed_items: list, roadmap: dict) -> str:
+    """
+    Mostra o status como diferença em relação ao roteiro: fases/sub-itens pendentes ou concluídos,
+    e apenas a contagem dos demais itens já concluídos (que não precisam ser repetidos).
+    """
+    completed = set(completed_items)
+    roadmap_items = [item for phase, sub_items in roadmap.items() for item in [phase, *sub_items]]
+    lines = [f"[{'x' if item in completed else ' '}] {item}" for item in roadmap_items]
+    others = len(completed - set(roadmap_items))
+    if others:
+        lines.append(f"(+{others} outros itens/artefatos já concluídos; não os repita)")
+    return "\n".join(lines) if lines else "[]"
+
+
+def fit_fields_to_budget(fields: dict, budget_tokens: int = STATUS_UPDATE_CONTEXT_BUDGET_TOKENS):
+    """
+    Ajusta os campos de texto (nome -> texto) ao orçamento de tokens:
+    primeiro compacta blocos de código; se ainda não couber, mantém inteiros os campos pequenos,
+    divide o restante do orçamento entre os maiores e corta o excedente.
+    Retorna (campos ajustados, relatório de tokens).
+    """
+    tokens_before = {name: count_tokens(text) for name, text in fields.items()}
+    fitted = dict(fields)
+    if sum(tokens_before.values()) > budget_tokens:
+        fitted = {name: compact_code_blocks(text) for name, text in fitted.items()}
+        compacted_tokens = {name: count_tokens(text) for name, text in fitted.items()}
+        total = sum(compacted_tokens.values())
+        if total > budget_tokens:
+            # Campos pequenos ficam inteiros; o orçamento restante é dividido entre os maiores
+            allocation = {}
+            remaining = budget_tokens
+            by_size = sorted(compacted_tokens.items(), key=lambda item: item[1])
+            for index, (name, size) in enumerate(by_size):
+                allocation[name] = min(size, remaining // (len(by_size) - index))
+                remaining -= allocation[name]
+            fitted = {name: truncate_to_tokens(text, max(1, allocation[name])) for name, text in fitted.items()}
+
+    tokens_after = {name: count_tokens(text) for name, text in fitted.items()}
+    report = {
+        "budget_tokens": budget_tokens,
+        "tokens_before": sum(tokens_before.values()),
+        "tokens_after": sum(tokens_after.values()),
+        "tokens_saved": sum(tokens_before.values()) - sum(tokens_after.values()),
+        "fields": {name: {"before": tokens_before[name], "after": tokens_after[name]} for name in fields},
+    }
+    return fitted, report
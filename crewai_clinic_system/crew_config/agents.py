@@ -1,93 +1,142 @@
 import os
+from types import MappingProxyType
 from dotenv import load_dotenv
 from crewai import Agent
 from langchain_openai import ChatOpenAI # Ou o modelo que você estiver usando
+from crew_config.llm_cache import llm_for_agent
+from crew_config.instrumentation import instrument_llm, agent_step_callback
+from crew_config.budget import guard_llm, budget_step_callback
+from crew_config.http_pool import get_http_client, reset_http_client
 
 load_dotenv()
 
-# Instancie seu modelo de linguagem sem limite de tokens na saída
-# O modelo usará seu limite interno padrão (que é bastante alto)
-llm_model = ChatOpenAI(
-    model_name=os.getenv("OPENAI_MODEL_NAME", "gpt-4o"),
-    openai_api_key=os.getenv("OPENAI_API_KEY"),
-    temperature=0.2 # Mantemos a temperatura para um comportamento mais focado
-)
-
-# --- Definição dos Agentes ---
-
-product_owner = Agent(
-    role='Product Owner',
-    goal='Criar planos de desenvolvimento detalhados e pragmáticos, priorizando funcionalidades e alinhando-se com a visão do produto. Supervisionar o progresso geral e garantir que os requisitos sejam atendidos. **Seja direto e conciso em seus planos, focando nos pontos essenciais.**',
-    backstory=(
-        'Você é um Product Owner experiente em metodologias ágeis, '
-        'com um profundo entendimento das necessidades de negócios e capacidade de traduzir '
-        'visões em planos de ação claros e priorizados. Você é o elo entre o cliente e a equipe de desenvolvimento. **Sua comunicação é sempre direta e sem floreios.**'
-    ),
-    verbose=True,
-    allow_delegation=True,
-    llm=llm_model
-)
-
-tech_lead = Agent(
-    role='Tech Lead',
-    goal='Supervisionar o design técnico, garantir a coerência arquitetônica, definir padrões de codificação e resolver desafios técnicos complexos. Fornecer orientação técnica à equipe de desenvolvimento. **Sua análise e diretrizes são sempre precisas e vão direto ao ponto, evitando verborragia.**',
-    backstory=(
-        'Você é um Tech Lead sênior com vasta experiência em arquitetura de software e '
-        'liderança de equipes técnicas. Seu foco é construir sistemas escaláveis, seguros e de alta performance. '
-        '**Sua comunicação é clara, técnica e concisa.**'
-    ),
-    verbose=True,
-    allow_delegation=True,
-    llm=llm_model
-)
-
-backend_developer = Agent(
-    role='Backend Developer',
-    goal='Desenvolver e manter a lógica de negócios, APIs, bancos de dados e integrações do lado do servidor. Escrever código limpo, eficiente e testável. **Gere apenas o código solicitado, sem comentários excessivos, focando na auto-documentação do código.**',
-    backstory=(
-        'Você é um Backend Developer apaixonado por construir sistemas robustos e eficientes. '
-        'Seu expertise inclui Python, frameworks web (ex: Flask, Django), bancos de dados e APIs RESTful. '
-        '**Você preza por código enxuto, direto e sem comentários redundantes.**'
-    ),
-    verbose=True,
-    allow_delegation=False, # Geralmente desenvolvedores não delegam tarefas de codificação
-    llm=llm_model
-)
-
-frontend_developer = Agent(
-    role='Frontend Developer',
-    goal='Desenvolver e implementar interfaces de usuário responsivas, intuitivas e esteticamente agradáveis. Garantir a melhor experiência do usuário e integração perfeita com o backend. **Gere apenas o código solicitado, sem comentários excessivos, focando na auto-documentação do código.**',
-    backstory=(
-        'Você é um Frontend Developer criativo e detalhista, com forte domínio de '
-        'HTML, CSS, JavaScript e frameworks modernos como React ou Next.js. Você se preocupa com a usabilidade e a performance. '
-        '**Você preza por código enxuto, direto e sem comentários redundantes.**'
-    ),
-    verbose=True,
-    allow_delegation=False,
-    llm=llm_model
-)
-
-qa_engineer = Agent(
-    role='QA Engineer',
-    goal='Garantir a qualidade do software através de testes abrangentes, identificação de bugs e validação de requisitos. Desenvolver e executar planos de teste rigorosos. **Seja objetivo em seus relatórios e planos de teste.**',
-    backstory=(
-        'Você é um QA Engineer meticuloso com experiência em testes funcionais, de integração e de regressão. '
-        'Seu objetivo é garantir que o produto final seja livre de defeitos e atenda às especificações. **Seus documentos são diretos e focados na ação.**'
-    ),
-    verbose=True,
-    allow_delegation=False,
-    llm=llm_model
-)
-
-devops_engineer = Agent(
-    role='DevOps Engineer',
-    goal='Projetar, implementar e manter a infraestrutura de CI/CD, automação de deploy, monitoramento e escalabilidade. Garantir a operação contínua e eficiente dos sistemas. **Sua configuração é sempre minimalista e eficiente, com foco na funcionalidade principal.**',
-    backstory=(
-        'Você é um DevOps Engineer experiente em automação, conteinerização (Docker), '
-        'orquestração (Docker Compose, Kubernetes) e ferramentas de CI/CD. Você busca otimizar o fluxo de desenvolvimento para produção. '
-        '**Você valoriza a automação e a clareza nas configurações, sem excesso de comentários ou informações redundantes.**'
-    ),
-    verbose=True,
-    allow_delegation=True,
-    llm=llm_model
-)
\ No newline at end of file
+# "openai" (padrão) ou "fake" (modelo roteirizado, sem rede, para benchmarks e testes offline)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
+
+def build_llm_model():
+    """Cria o modelo de linguagem usado pelos agentes; o ChatOpenAI usa o cliente HTTP (com pool) do processo."""
+    if LLM_BACKEND == "fake":
+        from crew_config.fake_llm import FakeChatModel
+        return FakeChatModel(
+            latency_seconds=float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0")),
+            prompt_tokens=int(os.getenv("FAKE_LLM_PROMPT_TOKENS", "500")),
+            completion_tokens=int(os.getenv("FAKE_LLM_COMPLETION_TOKENS", "200")),
+        )
+    # Instancie seu modelo de linguagem sem limite de tokens na saída
+    # O modelo usará seu limite interno padrão (que é bastante alto)
+    return ChatOpenAI(
+        model_name=os.getenv("OPENAI_MODEL_NAME", "gpt-4o"),
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        temperature=0.2, # Mantemos a temperatura para um comportamento mais focado
+        http_client=get_http_client()
+    )
+
+
+def reset_llm_model():
+    """
+    Recria o cliente HTTP e o modelo deste processo (chamado no worker_process_init do Celery),
+    para que cada processo worker tenha seu próprio pool de conexões, aquecido entre tarefas e execuções.
+    Agentes e ferramentas não são pré-criados aqui: build_crew_graph (crew_config/factory.py) os cria a cada execução.
+    """
+    global llm_model
+    reset_http_client()
+    llm_model = build_llm_model()
+    return llm_model
+
+
+llm_model = build_llm_model()
+
+# --- Templates dos Agentes ---
+# Os templates são imutáveis; as instâncias de Agent são criadas por execução em build_agents().
+
+AGENT_TEMPLATES = MappingProxyType({
+    "product_owner": MappingProxyType({
+        "role": 'Product Owner',
+        "goal": 'Criar planos de desenvolvimento detalhados e pragmáticos, priorizando funcionalidades e alinhando-se com a visão do produto. Supervisionar o progresso geral e garantir que os requisitos sejam atendidos. **Seja direto e conciso em seus planos, focando nos pontos essenciais.**',
+        "backstory": (
+            'Você é um Product Owner experiente em metodologias ágeis, '
+            'com um profundo entendimento das necessidades de negócios e capacidade de traduzir '
+            'visões em planos de ação claros e priorizados. Você é o elo entre o cliente e a equipe de desenvolvimento. **Sua comunicação é sempre direta e sem floreios.**'
+        ),
+        "verbose": True,
+        "allow_delegation": True,
+    }),
+
+    "tech_lead": MappingProxyType({
+        "role": 'Tech Lead',
+        "goal": 'Supervisionar o design técnico, garantir a coerência arquitetônica, definir padrões de codificação e resolver desafios técnicos complexos. Fornecer orientação técnica à equipe de desenvolvimento. **Sua análise e diretrizes são sempre precisas e vão direto ao ponto, evitando verborragia.**',
+        "backstory": (
+            'Você é um Tech Lead sênior com vasta experiência em arquitetura de software e '
+            'liderança de equipes técnicas. Seu foco é construir sistemas escaláveis, seguros e de alta performance. '
+            '**Sua comunicação é clara, técnica e concisa.**'
+        ),
+        "verbose": True,
+        "allow_delegation": True,
+    }),
+
+    "backend_developer": MappingProxyType({
+        "role": 'Backend Developer',
+        "goal": 'Desenvolver e manter a lógica de negócios, APIs, bancos de dados e integrações do lado do servidor. Escrever código limpo, eficiente e testável. **Gere apenas o código solicitado, sem comentários excessivos, focando na auto-documentação do código.**',
+        "backstory": (
+            'Você é um Backend Developer apaixonado por construir sistemas robustos e eficientes. '
+            'Seu expertise inclui Python, frameworks web (ex: Flask, Django), bancos de dados e APIs RESTful. '
+            '**Você preza por código enxuto, direto e sem comentários redundantes.**'
+        ),
+        "verbose": True,
+        "allow_delegation": False, # Geralmente desenvolvedores não delegam tarefas de codificação
+    }),
+
+    "frontend_developer": MappingProxyType({
+        "role": 'Frontend Developer',
+        "goal": 'Desenvolver e implementar interfaces de usuário responsivas, intuitivas e esteticamente agradáveis. Garantir a melhor experiência do usuário e integração perfeita com o backend. **Gere apenas o código solicitado, sem comentários excessivos, focando na auto-documentação do código.**',
+        "backstory": (
+            'Você é um Frontend Developer criativo e detalhista, com forte domínio de '
+            'HTML, CSS, JavaScript e frameworks modernos como React ou Next.js. Você se preocupa com a usabilidade e a performance. '
+            '**Você preza por código enxuto, direto e sem comentários redundantes.**'
+        ),
+        "verbose": True,
+        "allow_delegation": False,
+    }),
+
+    "qa_engineer": MappingProxyType({
+        "role": 'QA Engineer',
+        "goal": 'Garantir a qualidade do software através de testes abrangentes, identificação de bugs e validação de requisitos. Desenvolver e executar planos de teste rigorosos. **Seja objetivo em seus relatórios e planos de teste.**',
+        "backstory": (
+            'Você é um QA Engineer meticuloso com experiência em testes funcionais, de integração e de regressão. '
+            'Seu objetivo é garantir que o produto final seja livre de defeitos e atenda às especificações. **Seus documentos são diretos e focados na ação.**'
+        ),
+        "verbose": True,
+        "allow_delegation": False,
+    }),
+
+    "devops_engineer": MappingProxyType({
+        "role": 'DevOps Engineer',
+        "goal": 'Projetar, implementar e manter a infraestrutura de CI/CD, automação de deploy, monitoramento e escalabilidade. Garantir a operação contínua e eficiente dos sistemas. **Sua configuração é sempre minimalista e eficiente, com foco na funcionalidade principal.**',
+        "backstory": (
+            'Você é um DevOps Engineer experiente em automação, conteinerização (Docker), '
+            'orquestração (Docker Compose, Kubernetes) e ferramentas de CI/CD. Você busca otimizar o fluxo de desenvolvimento para produção. '
+            '**Você valoriza a automação e a clareza nas configurações, sem excesso de comentários ou informações redundantes.**'
+        ),
+        "verbose": True,
+        "allow_delegation": True,
+    }),
+})
+
+
+def build_agents(llm=None):
+    """
+    Cria um conjunto novo de agentes a partir dos templates, todos usando o mesmo `llm`.
+    Agentes listados em LLM_CACHE_AGENTS recebem o `llm` com o cache de respostas ativado.
+    Cada agente tem suas chamadas ao LLM e às ferramentas contabilizadas nas métricas do Prometheus,
+    e suas chamadas ao LLM e delegações descontadas dos orçamentos da tarefa e da execução (crew_config/budget.py).
+    """
+    llm = llm or llm_model
+    return {
+        name: Agent(
+            llm=guard_llm(instrument_llm(llm_for_agent(llm, name), name)),
+            step_callback=budget_step_callback(template["role"], agent_step_callback(name)),
+            **template
+        )
+        for name, template in AGENT_TEMPLATES.items()
+    }
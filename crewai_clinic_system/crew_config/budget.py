@@ -0,0 +1,265 @@
+# crew_config/budget.py - Orçamentos por tarefa e por execução (delegações, iterações, tokens e tempo)
+
+import os
+import re
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+
+from metrics import BUDGET_EXCEEDED, DELEGATIONS
+from crew_config.llm_cache import copy_llm
+
+load_dotenv()
+
+# Limites de cada tarefa (uma crew de uma tarefa, ou cada tarefa da crew sequencial); 0 desativa o limite.
+# Iterações são chamadas ao LLM, somando as dos agentes para quem o trabalho foi delegado.
+CREW_TASK_MAX_DELEGATIONS = int(os.getenv("CREW_TASK_MAX_DELEGATIONS", "4"))
+CREW_TASK_MAX_ITERATIONS = int(os.getenv("CREW_TASK_MAX_ITERATIONS", "25"))
+CREW_TASK_MAX_TOKENS = int(os.getenv("CREW_TASK_MAX_TOKENS", "60000"))
+CREW_TASK_MAX_SECONDS = int(os.getenv("CREW_TASK_MAX_SECONDS", "900"))
+# Limites da execução inteira (todas as etapas de run_crew_process)
+CREW_RUN_MAX_DELEGATIONS = int(os.getenv("CREW_RUN_MAX_DELEGATIONS", "20"))
+CREW_RUN_MAX_ITERATIONS = int(os.getenv("CREW_RUN_MAX_ITERATIONS", "150"))
+CREW_RUN_MAX_TOKENS = int(os.getenv("CREW_RUN_MAX_TOKENS", "400000"))
+CREW_RUN_MAX_SECONDS = int(os.getenv("CREW_RUN_MAX_SECONDS", "3000"))
+
+# Ferramentas de delegação do CrewAI ("Delegate work to co-worker", "Ask question to co-worker")
+_DELEGATION_TOOL = re.compile(r"co-?worker", re.I)
+_FINAL_ANSWER = re.compile(r"Final Answer:\s*(.*)", re.S)
+
+_run_budget = contextvars.ContextVar("run_budget", default=None)
+_task_budget = contextvars.ContextVar("task_budget", default=None)
+
+
+class BudgetExceeded(Exception):
+    """Um orçamento da tarefa ou da execução foi atingido; a crew é interrompida com a melhor saída até então."""
+
+    def __init__(self, scope: str, limit: str, message: str):
+        super().__init__(message)
+        self.scope = scope
+        self.limit = limit
+
+
+class Budget:
+    """Contadores de uma tarefa ou execução e seus limites. Compartilhado pelas threads da mesma execução."""
+
+    def __init__(self, scope: str, name: str, max_delegations: int, max_iterations: int, max_tokens: int, max_seconds: int):
+        self.scope = scope
+        self.name = name
+        self.limits = {"delegations": max_delegations, "iterations": max_iterations, "tokens": max_tokens, "seconds": max_seconds}
+        self.delegations = 0
+        self.iterations = 0
+        self.tokens = 0
+        self.started = time.monotonic()
+        self.edges = []
+        self.exceeded = None
+        self.last_output = ""
+        # Na execução: orçamentos de tarefas atingidos durante ela
+        self.events = []
+        self._lock = threading.Lock()
+
+    def _exceed(self, limit: str, message: str):
+        # Chamado com o lock; só o primeiro limite atingido é registrado. Retorna a exceção se ela é nova
+        # (o aviso e a métrica ficam para depois de liberar o lock, em _announce).
+        if self.exceeded is not None:
+            return None
+        self.exceeded = BudgetExceeded(self.scope, limit, f"Orçamento da {self._label()} atingido: {message}")
+        return self.exceeded
+
+    def _check_limit(self, limit: str, value, description: str):
+        # Chamado com o lock. Todos os limites usam a mesma regra: um limite N permite N (0 desativa)
+        maximum = self.limits[limit]
+        if maximum and value > maximum:
+            return self._exceed(limit, f"{description} de {maximum}")
+        return None
+
+    def _announce(self, exceeded):
+        if exceeded is not None:
+            BUDGET_EXCEEDED.labels(scope=self.scope, limit=exceeded.limit).inc()
+            print(exceeded)
+
+    def _label(self) -> str:
+        return f"tarefa '{self.name}'" if self.scope == "task" else f"execução {self.name}".strip()
+
+    def check(self):
+        """
+        Chamado antes de cada chamada ao LLM: levanta BudgetExceeded se algum limite já foi ultrapassado
+        ou se esta chamada passaria do limite de iterações.
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            exceeded = (
+                self._check_limit("seconds", elapsed, f"{elapsed:.0f}s")
+                or self._check_limit("iterations", self.iterations + 1, f"{self.iterations + 1}ª chamada ao LLM")
+            )
+            current = self.exceeded
+        self._announce(exceeded)
+        if current is not None:
+            raise current
+
+    def charge_llm_start(self):
+        """Conta a chamada ao LLM que vai começar (depois de check() em todos os orçamentos ativos)."""
+        with self._lock:
+            self.iterations += 1
+
+    def charge_llm_end(self, tokens: int, output: str):
+        """Desconta os tokens da chamada concluída; se passar do limite, a próxima chamada é interrompida."""
+        with self._lock:
+            self.tokens += tokens
+            if output:
+                self.last_output = output
+            exceeded = self._check_limit("tokens", self.tokens, f"{self.tokens} tokens")
+        self._announce(exceeded)
+
+    def charge_delegation(self, agent: str, coworker: str):
+        """Conta a delegação e detecta ciclos: se B já delegou para A, A -> B fecha o ciclo A -> B -> A."""
+        with self._lock:
+            self.delegations += 1
+            exceeded = None
+            if agent and coworker and (coworker, agent) in self.edges:
+                exceeded = self._exceed("delegation_cycle", f"ciclo de delegação {agent} -> {coworker} -> {agent}")
+            self.edges.append((agent, coworker))
+            exceeded = exceeded or self._check_limit("delegations", self.delegations, f"{self.delegations} delegações")
+        self._announce(exceeded)
+
+    def start_next_task(self, name: str):
+        """Zera os contadores para a próxima tarefa da crew sequencial (o orçamento é por tarefa)."""
+        with self._lock:
+            self.name = name
+            self.delegations = self.iterations = self.tokens = 0
+            self.started = time.monotonic()
+            self.edges = []
+            self.last_output = ""
+
+    def best_output(self) -> str:
+        """Última resposta do LLM na tarefa (a parte após "Final Answer:", se houver)."""
+        match = _FINAL_ANSWER.search(self.last_output or "")
+        return (match.group(1) if match else self.last_output or "").strip()
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "delegations": self.delegations,
+                "iterations": self.iterations,
+                "tokens": self.tokens,
+                "seconds": round(time.monotonic() - self.started, 1),
+                "limits": dict(self.limits),
+                "exceeded": {"limit": self.exceeded.limit, "message": str(self.exceeded)} if self.exceeded else None,
+                "events": list(self.events),
+            }
+
+
+def _active_budgets() -> list:
+    return [budget for budget in (_task_budget.get(), _run_budget.get()) if budget is not None]
+
+
+def current_run_budget():
+    return _run_budget.get()
+
+
+def current_task_budget():
+    return _task_budget.get()
+
+
+def record_budget_event(task_name: str, exc: BudgetExceeded):
+    """Registra no orçamento da execução (e no seu relatório nos resultados) uma tarefa interrompida por orçamento."""
+    budget = _run_budget.get()
+    if budget is not None:
+        with budget._lock:
+            budget.events.append({"task": task_name, "scope": exc.scope, "limit": exc.limit, "message": str(exc)})
+
+
+@contextmanager
+def run_budget(name: str = ""):
+    """Orçamento da execução inteira; as threads e corrotinas que copiam o contexto dividem os mesmos contadores."""
+    budget = Budget("run", name, CREW_RUN_MAX_DELEGATIONS, CREW_RUN_MAX_ITERATIONS, CREW_RUN_MAX_TOKENS, CREW_RUN_MAX_SECONDS)
+    token = _run_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _run_budget.reset(token)
+
+
+@contextmanager
+def task_budget(name: str):
+    """Orçamento de uma tarefa (ou da primeira tarefa de uma crew sequencial; ver Budget.start_next_task)."""
+    budget = Budget("task", name, CREW_TASK_MAX_DELEGATIONS, CREW_TASK_MAX_ITERATIONS, CREW_TASK_MAX_TOKENS, CREW_TASK_MAX_SECONDS)
+    token = _task_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _task_budget.reset(token)
+
+
+class BudgetGuardHandler(BaseCallbackHandler):
+    """
+    Callback do LangChain que desconta cada chamada ao LLM dos orçamentos ativos e interrompe a crew
+    (BudgetExceeded na próxima chamada) quando um limite é atingido.
+    """
+    # Sem isso o LangChain só registra a exceção do callback e segue com a chamada
+    raise_error = True
+
+    def _start(self):
+        # Verifica todos os orçamentos antes de contar a chamada em qualquer um deles
+        budgets = _active_budgets()
+        for budget in budgets:
+            budget.check()
+        for budget in budgets:
+            budget.charge_llm_start()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._start()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._start()
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        output = "".join(generation.text for batch in response.generations for generation in batch)
+        for budget in _active_budgets():
+            budget.charge_llm_end(int(usage.get("total_tokens") or 0), output)
+
+
+def guard_llm(llm):
+    """Retorna uma cópia de `llm` com o BudgetGuardHandler somado aos callbacks existentes."""
+    callbacks = list(llm.callbacks or []) if isinstance(llm.callbacks, list) else []
+    return copy_llm(llm, callbacks=[*callbacks, BudgetGuardHandler()])
+
+
+def _coworker(tool_input) -> str:
+    """Nome do colega na entrada da ferramenta de delegação (dict, JSON ou "colega|tarefa|contexto")."""
+    if isinstance(tool_input, str):
+        try:
+            tool_input = json.loads(tool_input)
+        except ValueError:
+            return tool_input.split("|")[0].strip().lower()
+    if isinstance(tool_input, dict):
+        return str(tool_input.get("coworker") or tool_input.get("co-worker") or "").strip().lower()
+    return ""
+
+
+def budget_step_callback(agent_role: str, next_callback=None):
+    """
+    step_callback do Agent: conta as delegações (ferramentas "... co-worker") nos orçamentos ativos
+    e repassa o passo para `next_callback` (as métricas por agente).
+    """
+    agent = agent_role.strip().lower()
+
+    def on_step(step_output):
+        if isinstance(step_output, list):
+            for step in step_output:
+                action = step[0] if isinstance(step, tuple) else step
+                tool = getattr(action, "tool", None)
+                if tool and _DELEGATION_TOOL.search(tool):
+                    coworker = _coworker(getattr(action, "tool_input", None))
+                    DELEGATIONS.labels(agent=agent, coworker=coworker or "?").inc()
+                    for budget in _active_budgets():
+                        budget.charge_delegation(agent, coworker)
+        if next_callback is not None:
+            next_callback(step_output)
+
+    return on_step
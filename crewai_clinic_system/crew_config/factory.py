@@ -0,0 +1,35 @@
+# crew_config/factory.py - Fábrica de agentes e tarefas por execução
+
+from types import MappingProxyType
+from typing import NamedTuple
+
+from crew_config.agents import build_agents
+from crew_config.tasks import build_file_tools, build_task
+from projects import ProjectPaths
+
+
+class CrewGraph(NamedTuple):
+    """Agentes, ferramentas e tarefas de uma única execução, indexados pelo nome do template."""
+    agents: MappingProxyType
+    tools: MappingProxyType
+    tasks: MappingProxyType
+
+    def new_task(self, name: str, context: dict, upstream_outputs: dict = None):
+        """Cria uma tarefa adicional (ex: atualização de status) ligada aos mesmos agentes e ferramentas."""
+        return build_task(name, context, self.agents, self.tools, upstream_outputs)
+
+
+def build_crew_graph(task_names: list, context: dict, llm=None, paths: ProjectPaths = None) -> CrewGraph:
+    """
+    Monta um grafo novo de agentes/tarefas para uma execução.
+    Nada é compartilhado com outras execuções além do cliente LLM, então várias
+    execuções (inclusive de projetos diferentes) podem rodar em paralelo no mesmo processo (threads, gevent).
+    As ferramentas de arquivo ficam ligadas aos arquivos do projeto `paths`.
+    """
+    agents = MappingProxyType(build_agents(llm))
+    tools = MappingProxyType(build_file_tools(paths))
+    tasks = MappingProxyType({
+        name: build_task(name, context, agents, tools)
+        for name in task_names
+    })
+    return CrewGraph(agents=agents, tools=tools, tasks=tasks)
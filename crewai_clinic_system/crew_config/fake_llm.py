@@ -0,0 +1,75 @@
+# crew_config/fake_llm.py - Modelo de chat determinístico para benchmarks e execuções offline
+
+import json
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Resposta padrão no formato ReAct que os agentes do CrewAI esperam para encerrar uma tarefa
+DEFAULT_FINAL_ANSWER = (
+    "Thought: I now can give a great answer\n"
+    "Final Answer: Resultado simulado da tarefa.\n"
+    "```python\n# app/main.py\ndef main():\n    pass\n```"
+)
+
+# Respostas roteirizadas: o primeiro trecho encontrado no prompt escolhe a resposta
+DEFAULT_SCRIPT = (
+    ("lista JSON de strings", "Thought: I now can give a great answer\nFinal Answer: " + json.dumps(["Fase 1: Descoberta e Design"], ensure_ascii=False)),
+    ("plano de desenvolvimento", "Thought: I now can give a great answer\nFinal Answer: Plano simulado: 1. Analisar requisitos 2. Projetar arquitetura 3. Implementar módulos."),
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Substituto do ChatOpenAI sem rede: devolve respostas roteirizadas após uma latência fixa
+    e informa contagens de tokens configuráveis em llm_output["token_usage"], como a OpenAI.
+    """
+
+    script: tuple = DEFAULT_SCRIPT
+    default_response: str = DEFAULT_FINAL_ANSWER
+    latency_seconds: float = 0.0
+    prompt_tokens: int = 500
+    completion_tokens: int = 200
+    model_name: str = "fake-chat-model"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "latency_seconds": self.latency_seconds}
+
+    def respond(self, prompt: str) -> str:
+        """Escolhe a resposta roteirizada para o prompt."""
+        for marker, response in self.script:
+            if marker in prompt:
+                return response
+        return self.default_response
+
+    def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
+        # Soma o uso de tokens dos prompts do lote, como o ChatOpenAI faz
+        token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        for output in llm_outputs:
+            for key, value in ((output or {}).get("token_usage") or {}).items():
+                token_usage[key] = token_usage.get(key, 0) + value
+        return {"token_usage": token_usage, "model_name": self.model_name}
+
+    def _generate(self, messages: List[Any], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.respond(prompt)))],
+            llm_output={
+                "token_usage": {
+                    "prompt_tokens": self.prompt_tokens,
+                    "completion_tokens": self.completion_tokens,
+                    "total_tokens": self.prompt_tokens + self.completion_tokens,
+                },
+                "model_name": self.model_name,
+            },
+        )
@@ -0,0 +1,94 @@
+# crew_config/http_pool.py - Cliente HTTP com pool de conexões keep-alive, um por processo worker
+
+import os
+import threading
+import httpx
+from dotenv import load_dotenv
+
+from metrics import LLM_HTTP_CONNECTIONS
+from crew_config.rate_limiter import rate_limit_request, rate_limit_response
+
+load_dotenv()
+
+# Tamanho do pool e tempos limite (em segundos) das conexões com a API do LLM
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "120"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+LLM_HTTP_READ_TIMEOUT = float(os.getenv("LLM_HTTP_READ_TIMEOUT", "600"))
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _record(reused: bool):
+    with _stats_lock:
+        _stats["hits" if reused else "misses"] += 1
+    LLM_HTTP_CONNECTIONS.labels(result="hit" if reused else "miss").inc()
+
+
+def _track_connection_reuse(request: httpx.Request):
+    """
+    Hook de requisição: o trace do httpcore só emite "connection.connect_tcp" quando abre uma conexão nova,
+    então a requisição que não o recebe reaproveitou uma conexão do pool.
+    """
+    state = {"connected": False}
+    previous_trace = request.extensions.get("trace")
+
+    def trace(event_name, info):
+        if event_name == "connection.connect_tcp.started":
+            state["connected"] = True
+        elif event_name == "http11.send_request_headers.started" or event_name == "http2.send_request_headers.started":
+            _record(reused=not state["connected"])
+        if previous_trace is not None:
+            previous_trace(event_name, info)
+
+    request.extensions["trace"] = trace
+
+
+def build_http_client() -> httpx.Client:
+    """Cria um cliente HTTP com pool keep-alive e os limites configurados."""
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(LLM_HTTP_READ_TIMEOUT, connect=LLM_HTTP_CONNECT_TIMEOUT),
+        # O limitador de taxa compartilhado vale para toda requisição, inclusive as retentativas do cliente OpenAI
+        event_hooks={"request": [rate_limit_request, _track_connection_reuse], "response": [rate_limit_response]},
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Retorna o cliente HTTP deste processo. Depois de um fork, o processo filho cria o seu próprio
+    (conexões abertas no pai não são compartilhadas entre processos).
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = build_http_client()
+            _client_pid = os.getpid()
+        return _client
+
+
+def reset_http_client() -> httpx.Client:
+    """Descarta o cliente herdado (sem fechar os sockets do processo pai) e cria um novo para este processo."""
+    global _client, _client_pid
+    with _client_lock:
+        _client = build_http_client()
+        _client_pid = os.getpid()
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+    return _client
+
+
+def get_pool_stats() -> dict:
+    """Requisições ao LLM que reaproveitaram uma conexão (hits) ou abriram uma nova (misses) neste processo."""
+    with _stats_lock:
+        total = _stats["hits"] + _stats["misses"]
+        return {**_stats, "hit_rate": _stats["hits"] / total if total else None}
@@ -0,0 +1,100 @@
+# crew_config/instrumentation.py - Métricas por agente (chamadas ao LLM, tokens, ferramentas e erros) e spans do trace
+
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+
+from metrics import record_llm_call, record_llm_error, record_tool_call
+from tracing import current_span, record_span, span
+from crew_config.llm_cache import copy_llm
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Callback do LangChain que mede latência, tokens e erros das chamadas ao LLM de um agente
+    e registra cada chamada como um span "llm.call" no trace da execução.
+    """
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+        # run_id da chamada -> (perf_counter, time_ns, caracteres do prompt, span pai)
+        self._started = {}
+
+    def _start(self, run_id, prompt_chars: int):
+        self._started[run_id] = (time.perf_counter(), time.time_ns(), prompt_chars, current_span())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, sum(len(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, sum(len(str(message.content)) for batch in messages for message in batch))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started, start_ns, prompt_chars, parent = self._started.pop(run_id, (None, None, 0, None))
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        record_llm_call(
+            self.agent_name,
+            time.perf_counter() - started if started else 0.0,
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0),
+        )
+        if start_ns:
+            record_span(
+                "llm.call", start_ns, parent=parent, agent=self.agent_name,
+                prompt_chars=prompt_chars,
+                output_chars=sum(len(generation.text) for batch in response.generations for generation in batch),
+                prompt_tokens=usage.get("prompt_tokens"),
+                completion_tokens=usage.get("completion_tokens"),
+            )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started, start_ns, prompt_chars, parent = self._started.pop(run_id, (None, None, 0, None))
+        record_llm_error(self.agent_name)
+        if start_ns:
+            record_span("llm.call", start_ns, parent=parent, error=f"{type(error).__name__}: {error}",
+                        agent=self.agent_name, prompt_chars=prompt_chars)
+
+
+def instrument_llm(llm, agent_name: str):
+    """Retorna uma cópia de `llm` com o LLMMetricsHandler do agente somado aos callbacks existentes."""
+    callbacks = list(llm.callbacks or []) if isinstance(llm.callbacks, list) else []
+    return copy_llm(llm, callbacks=[*callbacks, LLMMetricsHandler(agent_name)])
+
+
+def agent_step_callback(agent_name: str):
+    """
+    step_callback do Agent: a cada passo com ações, conta as ferramentas usadas pelo agente.
+    O passo é um AgentFinish ou uma lista de (AgentAction, observação).
+    """
+    def on_step(step_output):
+        if not isinstance(step_output, list):
+            return
+        for step in step_output:
+            action = step[0] if isinstance(step, tuple) else step
+            tool = getattr(action, "tool", None)
+            if tool:
+                record_tool_call(agent_name, tool)
+
+    return on_step
+
+
+class TracedToolMixin:
+    """Mede cada uso da ferramenta como um span "tool.call" (nome, tamanho da entrada e da saída)."""
+
+    def _run(self, *args, **kwargs):
+        input_chars = sum(len(str(value)) for value in (*args, *kwargs.values()))
+        # Ferramentas de arquivo são ligadas a um arquivo ou diretório: o caminho identifica qual leitura foi feita
+        path = getattr(self, "file_path", None) or getattr(self, "directory", None) or getattr(self, "path", None)
+        with span("tool.call", tool=self.name, path=path, input_chars=input_chars) as tool_span:
+            result = super()._run(*args, **kwargs)
+            tool_span.set_attribute("output_chars", len(str(result)))
+            return result
+
+
+_traced_tool_classes = {}
+
+
+def traced_tool_class(tool_class):
+    """Subclasse de `tool_class` cujas chamadas viram spans no trace da execução."""
+    if tool_class not in _traced_tool_classes:
+        _traced_tool_classes[tool_class] = type(f"Traced{tool_class.__name__}", (TracedToolMixin, tool_class), {})
+    return _traced_tool_classes[tool_class]
@@ -0,0 +1,198 @@
+# crew_config/llm_cache.py - Cache de respostas do LLM endereçado por conteúdo
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+# Backend do cache: "" (desativado), "sqlite" ou "redis"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_REDIS_URL = os.getenv("LLM_CACHE_REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+# Agentes que usam o cache (nomes de AGENT_TEMPLATES separados por vírgula, ou "*" para todos)
+LLM_CACHE_AGENTS = [name.strip() for name in os.getenv("LLM_CACHE_AGENTS", "*").split(",") if name.strip()]
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Chave do cache. `llm_string` contém o nome do modelo e os parâmetros (ex: temperatura);
+    `prompt` é a lista completa de mensagens serializada, incluindo resultados de ferramentas.
+    """
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class SQLiteLLMCache(BaseCache):
+    """Cache em SQLite local com TTL e remoção LRU acima de `max_entries`."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        return loads(value)
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, dumps(list(return_val)), now, now)
+            )
+            if self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self, **kwargs):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+class RedisLLMCache(BaseCache):
+    """
+    Cache no Redis (o mesmo usado pelo Celery). O TTL é aplicado pelo próprio Redis
+    e um sorted set com o último acesso de cada chave mantém o limite LRU de entradas.
+    """
+
+    def __init__(self, redis_url: str = LLM_CACHE_REDIS_URL, ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, prefix: str = "llm_cache"):
+        import redis
+        self.redis = redis.Redis.from_url(redis_url)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self._lru_key = f"{prefix}:lru"
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}:entry:{key}"
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = cache_key(prompt, llm_string)
+        value = self.redis.get(self._entry_key(key))
+        if value is None:
+            # Entrada expirada pelo TTL: remove também do índice LRU
+            self.redis.zrem(self._lru_key, key)
+            return None
+        self.redis.zadd(self._lru_key, {key: time.time()})
+        return loads(value.decode("utf-8"))
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        key = cache_key(prompt, llm_string)
+        pipe = self.redis.pipeline()
+        pipe.set(self._entry_key(key), dumps(list(return_val)), ex=self.ttl_seconds or None)
+        pipe.zadd(self._lru_key, {key: time.time()})
+        pipe.zcard(self._lru_key)
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            evicted = [member.decode("utf-8") for member, _ in self.redis.zpopmin(self._lru_key, size - self.max_entries)]
+            if evicted:
+                self.redis.delete(*[self._entry_key(key) for key in evicted])
+
+    def clear(self, **kwargs):
+        keys = [self._entry_key(member.decode("utf-8")) for member in self.redis.zrange(self._lru_key, 0, -1)]
+        if keys:
+            self.redis.delete(*keys)
+        self.redis.delete(self._lru_key)
+
+
+class AgentCacheView(BaseCache):
+    """Encaminha para o cache compartilhado e contabiliza hits/misses de um agente."""
+
+    def __init__(self, cache: BaseCache, agent_name: str):
+        self.cache = cache
+        self.agent_name = agent_name
+
+    def lookup(self, prompt: str, llm_string: str):
+        result = self.cache.lookup(prompt, llm_string)
+        _record_lookup(self.agent_name, hit=result is not None)
+        return result
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        self.cache.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs):
+        self.cache.clear(**kwargs)
+
+
+_cache_stats = {}
+_cache_stats_lock = threading.Lock()
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def _record_lookup(agent_name: str, hit: bool):
+    with _cache_stats_lock:
+        stats = _cache_stats.setdefault(agent_name, {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+
+
+def get_cache_stats() -> dict:
+    """Retorna os contadores de hits/misses por agente neste processo."""
+    with _cache_stats_lock:
+        return {agent: dict(stats) for agent, stats in _cache_stats.items()}
+
+
+def get_shared_cache():
+    """Retorna o cache configurado em LLM_CACHE_BACKEND (criado uma vez por processo), ou None."""
+    global _shared_cache
+    if not LLM_CACHE_BACKEND:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            if LLM_CACHE_BACKEND == "sqlite":
+                _shared_cache = SQLiteLLMCache()
+            elif LLM_CACHE_BACKEND == "redis":
+                _shared_cache = RedisLLMCache()
+            else:
+                raise ValueError(f"LLM_CACHE_BACKEND inválido: '{LLM_CACHE_BACKEND}'. Use 'sqlite' ou 'redis'.")
+        return _shared_cache
+
+
+def copy_llm(llm, **update):
+    """
+    Cópia rasa do modelo com os campos de `update` trocados. Os modelos do LangChain 0.2 (usado pelo CrewAI
+    fixado em requirements.txt) são pydantic v1; os do LangChain 0.3+ são pydantic v2 (model_copy).
+    """
+    if hasattr(llm, "model_copy"):
+        return llm.model_copy(update=update)
+    # Em pydantic v1, BaseModel.copy() descarta os campos com exclude=True (tags, metadata, callback_manager)
+    return type(llm).construct(_fields_set=set(llm.__fields_set__) | set(update), **{**llm.__dict__, **update})
+
+
+def llm_for_agent(llm, agent_name: str):
+    """Retorna uma cópia de `llm` com o cache ativado se o agente optou por ele; senão o próprio `llm`."""
+    cache = get_shared_cache()
+    if cache is None or ("*" not in LLM_CACHE_AGENTS and agent_name not in LLM_CACHE_AGENTS):
+        return llm
+    return copy_llm(llm, cache=AgentCacheView(cache, agent_name))
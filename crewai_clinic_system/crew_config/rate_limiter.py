@@ -0,0 +1,256 @@
+# crew_config/rate_limiter.py - Limite distribuído de requisições e tokens por minuto para o LLM (Redis)
+
+import os
+import json
+import time
+import random
+import weakref
+import threading
+import contextvars
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from dotenv import load_dotenv
+
+from metrics import LLM_RATE_LIMIT_WAIT, LLM_RATE_LIMITED_RESPONSES
+
+load_dotenv()
+
+# Limites da conta no provedor (0 desativa o respectivo balde); compartilhados por todos os workers
+LLM_RATE_LIMIT_RPM = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_TPM = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+LLM_RATE_LIMIT_REDIS_URL = os.getenv("LLM_RATE_LIMIT_REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+# Fração da capacidade que execuções "batch" deixam livre para as "interactive"
+LLM_RATE_LIMIT_BATCH_RESERVE = float(os.getenv("LLM_RATE_LIMIT_BATCH_RESERVE", "0.2"))
+# Tokens de resposta estimados por chamada (o custo é acertado com o uso real quando a resposta chega)
+LLM_RATE_LIMIT_COMPLETION_ESTIMATE = int(os.getenv("LLM_RATE_LIMIT_COMPLETION_ESTIMATE", "1000"))
+# Espera máxima por capacidade; depois disso a chamada segue (e o provedor decide)
+LLM_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", "300"))
+
+PRIORITIES = ("interactive", "batch")
+
+# Classe de prioridade das chamadas ao LLM feitas no contexto atual (execução, thread ou corrotina)
+_llm_priority = contextvars.ContextVar("llm_priority", default="interactive")
+
+# Reabastece os dois baldes pelo relógio do Redis (o mesmo para todos os workers), respeita a pausa
+# imposta por um Retry-After e reserva capacidade para a prioridade interativa.
+# Retorna 0 se a chamada pode seguir (e desconta o custo) ou os milissegundos a esperar.
+_ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local paused_until = tonumber(redis.call('GET', KEYS[3]) or '0')
+if paused_until > now then
+    return paused_until - now
+end
+local rpm, tpm = tonumber(ARGV[1]), tonumber(ARGV[2])
+local cost, reserve = tonumber(ARGV[3]), tonumber(ARGV[4])
+
+local function refill(key, capacity)
+    local data = redis.call('HMGET', key, 'level', 'ts')
+    local level = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    return math.min(capacity, level + (now - ts) * capacity / 60000)
+end
+
+local wait = 0
+local requests, tokens
+if rpm > 0 then
+    requests = refill(KEYS[1], rpm)
+    local needed = 1 + reserve * rpm
+    if requests < needed then wait = math.max(wait, (needed - requests) * 60000 / rpm) end
+end
+if tpm > 0 then
+    tokens = refill(KEYS[2], tpm)
+    local needed = math.min(cost, tpm) + reserve * tpm
+    if tokens < needed then wait = math.max(wait, (needed - tokens) * 60000 / tpm) end
+end
+if wait == 0 then
+    if requests then requests = requests - 1 end
+    if tokens then tokens = tokens - cost end
+end
+if requests then
+    redis.call('HSET', KEYS[1], 'level', tostring(requests), 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], 120000)
+end
+if tokens then
+    redis.call('HSET', KEYS[2], 'level', tostring(tokens), 'ts', now)
+    redis.call('PEXPIRE', KEYS[2], 120000)
+end
+return math.ceil(wait)
+"""
+
+# Acerta o balde de tokens com a diferença entre o uso real e o estimado (pode ficar negativo: dívida)
+_ADJUST_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local tpm, delta = tonumber(ARGV[1]), tonumber(ARGV[2])
+local data = redis.call('HMGET', KEYS[1], 'level', 'ts')
+local level = tonumber(data[1]) or tpm
+local ts = tonumber(data[2]) or now
+level = math.min(tpm, level + (now - ts) * tpm / 60000) - delta
+redis.call('HSET', KEYS[1], 'level', tostring(math.max(level, -tpm)), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+return 1
+"""
+
+# Pausa todos os workers até now + ARGV[1] ms (só estende uma pausa existente, nunca a encurta)
+_PAUSE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local until_ms = now + tonumber(ARGV[1])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if until_ms > current then
+    redis.call('SET', KEYS[1], until_ms, 'PX', tonumber(ARGV[1]))
+end
+return until_ms
+"""
+
+
+def get_llm_priority() -> str:
+    return _llm_priority.get()
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """Define a prioridade ("interactive" ou "batch") das chamadas ao LLM feitas dentro do bloco."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Prioridade desconhecida: {priority}. Use uma de {PRIORITIES}.")
+    token = _llm_priority.set(priority)
+    try:
+        yield
+    finally:
+        _llm_priority.reset(token)
+
+
+def parse_retry_after(headers) -> float:
+    """Segundos a esperar segundo os cabeçalhos retry-after-ms / retry-after (segundos ou data HTTP)."""
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0.0
+
+
+class RedisRateLimiter:
+    """Baldes de tokens (requisições/min e tokens/min) no Redis, compartilhados por todos os processos."""
+
+    def __init__(self, redis_url: str = LLM_RATE_LIMIT_REDIS_URL, rpm: int = LLM_RATE_LIMIT_RPM,
+                 tpm: int = LLM_RATE_LIMIT_TPM, prefix: str = "llm_rate_limit"):
+        import redis
+        self.redis = redis.Redis.from_url(redis_url)
+        self.rpm = rpm
+        self.tpm = tpm
+        self.keys = (f"{prefix}:requests", f"{prefix}:tokens", f"{prefix}:paused_until")
+        self._acquire = self.redis.register_script(_ACQUIRE_SCRIPT)
+        self._adjust = self.redis.register_script(_ADJUST_SCRIPT)
+        self._pause = self.redis.register_script(_PAUSE_SCRIPT)
+
+    def acquire(self, tokens: int, priority: str = None, max_wait: float = LLM_RATE_LIMIT_MAX_WAIT_SECONDS) -> float:
+        """Bloqueia até haver capacidade para uma chamada de `tokens` tokens. Retorna o tempo esperado."""
+        priority = priority or get_llm_priority()
+        reserve = LLM_RATE_LIMIT_BATCH_RESERVE if priority == "batch" else 0.0
+        started = time.monotonic()
+        while True:
+            wait_ms = self._acquire(keys=self.keys, args=[self.rpm, self.tpm, tokens, reserve])
+            waited = time.monotonic() - started
+            if not wait_ms:
+                break
+            if waited >= max_wait:
+                print(f"Limite de taxa do LLM: espera máxima de {max_wait}s atingida; seguindo com a chamada.")
+                break
+            # Jitter evita que os workers acordem todos juntos; batch acorda um pouco depois
+            jitter = random.uniform(0, 0.1) + (0.1 if priority == "batch" else 0.0)
+            time.sleep(min(wait_ms / 1000, 5.0, max_wait - waited) + jitter)
+        LLM_RATE_LIMIT_WAIT.labels(priority=priority).observe(waited)
+        return waited
+
+    def adjust(self, delta_tokens: int):
+        """Soma ao balde de tokens a diferença entre o uso real e o estimado."""
+        if self.tpm and delta_tokens:
+            self._adjust(keys=[self.keys[1]], args=[self.tpm, delta_tokens])
+
+    def pause(self, seconds: float):
+        """Pausa as chamadas de todos os workers (ex: Retry-After de uma resposta 429)."""
+        if seconds > 0:
+            self._pause(keys=[self.keys[2]], args=[int(seconds * 1000)])
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+_disabled_reason = None
+# Estimativa usada por cada requisição em andamento, para o acerto com o uso real
+_estimates = weakref.WeakKeyDictionary()
+
+
+def get_rate_limiter():
+    """Retorna o limitador do processo, ou None se nenhum limite estiver configurado."""
+    global _limiter
+    if not (LLM_RATE_LIMIT_RPM or LLM_RATE_LIMIT_TPM):
+        return None
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RedisRateLimiter()
+        return _limiter
+
+
+def _estimate_tokens(request) -> int:
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        return LLM_RATE_LIMIT_COMPLETION_ESTIMATE
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in body.get("messages", []))
+    completion = body.get("max_tokens") or body.get("max_completion_tokens") or LLM_RATE_LIMIT_COMPLETION_ESTIMATE
+    return prompt_chars // 4 + int(completion)
+
+
+def _fail_open(error: Exception):
+    global _disabled_reason
+    if _disabled_reason is None:
+        print(f"Limitador de taxa do LLM indisponível ({error}); as chamadas seguem sem limite.")
+    _disabled_reason = str(error)
+
+
+def rate_limit_request(request):
+    """Hook de requisição do cliente HTTP do LLM: espera capacidade no balde compartilhado."""
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return
+    estimate = _estimate_tokens(request)
+    try:
+        limiter.acquire(estimate)
+        _estimates[request] = estimate
+    except Exception as e:
+        _fail_open(e)
+
+
+def rate_limit_response(response):
+    """
+    Hook de resposta: num 429/503, pausa todos os workers pelo Retry-After e devolve a estimativa
+    (a chamada recusada não consumiu tokens); numa resposta JSON bem-sucedida, acerta o custo com o uso real.
+    """
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return
+    estimate = _estimates.pop(response.request, None)
+    try:
+        if response.status_code in (429, 503):
+            LLM_RATE_LIMITED_RESPONSES.labels(status=str(response.status_code)).inc()
+            limiter.pause(parse_retry_after(response.headers) or 1.0)
+            if estimate:
+                limiter.adjust(-estimate)
+        elif estimate and response.status_code < 300 and "application/json" in response.headers.get("content-type", ""):
+            response.read()
+            usage = response.json().get("usage") or {}
+            if usage.get("total_tokens"):
+                limiter.adjust(int(usage["total_tokens"]) - estimate)
+    except Exception as e:
+        _fail_open(e)
@@ -0,0 +1,32 @@
+# crew_config/spec_search_tool.py - Ferramenta de busca nas especificações (trechos relevantes, não o arquivo inteiro)
+
+from typing import List, Type
+from pydantic import BaseModel, Field
+
+try:
+    from crewai.tools import BaseTool
+except ImportError:  # versões antigas do CrewAI expõem o BaseTool pelo crewai_tools
+    from crewai_tools import BaseTool
+
+from spec_index import SPEC_SEARCH_TOP_K, SPEC_SEARCH_MAX_TOKENS, search_specs
+
+
+class SpecSearchInput(BaseModel):
+    query: str = Field(..., description="Termos a buscar nas especificações (ex: 'agendamento de consultas', 'tabela paciente').")
+
+
+class SpecSearchTool(BaseTool):
+    """Busca BM25 nas seções dos arquivos Markdown de especificação do projeto."""
+    name: str = "Buscar nas especificações do projeto"
+    description: str = (
+        "Retorna apenas as seções mais relevantes das especificações do projeto (roteiro e tecnologias, "
+        "fluxo do sistema e DER) para a busca informada. Faça buscas específicas, uma por assunto, "
+        "em vez de tentar ler os documentos inteiros."
+    )
+    args_schema: Type[BaseModel] = SpecSearchInput
+    file_paths: List[str] = Field(default_factory=list)
+    top_k: int = SPEC_SEARCH_TOP_K
+    max_tokens: int = SPEC_SEARCH_MAX_TOKENS
+
+    def _run(self, query: str) -> str:
+        return search_specs(query, self.file_paths, top_k=self.top_k, max_tokens=self.max_tokens)
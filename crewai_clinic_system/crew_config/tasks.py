@@ -1,186 +1,270 @@
 # crew_config/tasks.py - Conteúdo ATUALIZADO
 
+from types import MappingProxyType
 from crewai import Task
 # ATUALIZADO: Importe as ferramentas de arquivo específicas
 from crewai_tools import FileReadTool, FileWriterTool, DirectoryReadTool
-import os
-
-# Carregar os caminhos das especificações do ambiente
-PROJECT_STATUS_PATH = os.getenv("PROJECT_STATUS_PATH")
-TECHNOLOGIES_AND_ROADMAP_SPEC_PATH = os.getenv("TECHNOLOGIES_AND_ROADMAP_SPEC_PATH")
-SYSTEM_FLOW_SPEC_PATH = os.getenv("SYSTEM_FLOW_SPEC_PATH")
-DER_SPEC_PATH = os.getenv("DER_SPEC_PATH")
-
-# Ferramentas para manipulação de arquivos
-# AGORA USAMOS FERRAMENTAS ESPECÍFICAS DE LEITURA E ESCRITA
-# Note que estamos criando instâncias separadas para leitura e escrita do mesmo arquivo
-file_read_project_status = FileReadTool(
-    file_path=PROJECT_STATUS_PATH,
-    description="Permite ler o conteúdo do arquivo JSON de status do projeto. "
-                "Use para verificar o status atual."
-)
-file_write_project_status = FileWriterTool(
-    file_path=PROJECT_STATUS_PATH,
-    description="Permite escrever no arquivo JSON de status do projeto. "
-                "Use para atualizar a lista de itens concluídos no projeto."
-)
-
-file_read_tech_roadmap = FileReadTool(
-    file_path=TECHNOLOGIES_AND_ROADMAP_SPEC_PATH,
-    description="Permite ler o arquivo Markdown que contém as tecnologias propostas e o roteiro de desenvolvimento do projeto."
-)
-
-file_read_system_flow = FileReadTool(
-    file_path=SYSTEM_FLOW_SPEC_PATH,
-    description="Permite ler o arquivo Markdown que descreve o fluxo geral do sistema."
-)
-
-file_read_der_spec = FileReadTool(
-    file_path=DER_SPEC_PATH,
-    description="Permite ler o arquivo Markdown que contém a especificação do Diagrama Entidade-Relacionamento (DER)."
-)
-
-# Ferramenta opcional para leitura de diretórios, se necessário por algum agente
-# Certifique-se de que o caminho 'path' está correto para o uso pretendido
-directory_read_tool = DirectoryReadTool(
-    path='./', # Este é o diretório raiz do projeto. Ajuste se precisar ler de outra pasta.
-    description="Permite ler o conteúdo de diretórios. Use com cautela e apenas quando necessário."
-)
-
-
-# --- Definição das Tarefas ---
-
-orchestrate_development_plan_task = Task(
-    description=(
-        "Com base nos requisitos e no status atual do projeto, crie um plano de desenvolvimento detalhado. "
-        "Considere o seguinte pedido do usuário: '{user_project_plan}'. "
-        "O status atual do projeto é: {completed_tasks_context}. "
-        "O plano deve ser pragmático, modular e iterativo, identificando os próximos passos claros e as fases envolvidas, "
-        "considerando o que já foi feito. Inclua sub-tarefas específicas para cada fase, se aplicável, "
-        "e como elas se encaixam no progresso geral do projeto."
-    ),
-    expected_output=(
-        "Um plano de desenvolvimento detalhado, articulado em etapas e sub-tarefas, "
-        "levando em conta o estado atual e o que o usuário solicitou."
-    ),
-    # ATUALIZADO: Usando as ferramentas de leitura específicas
-    tools=[file_read_tech_roadmap, file_read_system_flow, file_read_der_spec, file_read_project_status],
-    agent=None,  # Será atribuído na Crew
-)
-
-analyze_requirements_der_task = Task(
-    description=(
-        "Analise cuidadosamente os documentos de fluxo do sistema e o DER. "
-        "Identifique todos os requisitos funcionais e não-funcionais, e prepare um resumo claro "
-        "que servirá de base para o design da arquitetura. "
-        "Garanta que a análise esteja alinhada com as necessidades do projeto e com o que já foi feito: {completed_tasks_context}."
-    ),
-    expected_output="Um resumo detalhado dos requisitos funcionais e não-funcionais, e uma análise do DER.",
-    # ATUALIZADO: Usando as ferramentas de leitura específicas
-    tools=[file_read_system_flow, file_read_der_spec, file_read_project_status],
-    agent=None,
-)
-
-design_architecture_db_schema_task = Task(
-    description=(
-        "Com base nos requisitos analisados e no DER, projete a arquitetura geral do sistema e o esquema do banco de dados. "
-        "Inclua a estrutura de microsserviços, tecnologias principais e o design de alto nível do banco de dados (tabelas, relações). "
-        "Considere as tecnologias propostas no roteiro e o status atual: {completed_tasks_context}. "
-        "Crie também a documentação técnica inicial para a arquitetura e o esquema do banco de dados."
-    ),
-    expected_output="Documentos de design de arquitetura e esquema de banco de dados, detalhando a estrutura do sistema.",
-    # ATUALIZADO: Usando as ferramentas de leitura específicas
-    tools=[file_read_tech_roadmap, file_read_der_spec, file_read_project_status],
-    agent=None,
-)
-
-develop_backend_auth_skeleton_task = Task(
-    description=(
-        "Desenvolva o esqueleto para o microsserviço de autenticação do backend. "
-        "Isso inclui a configuração inicial do projeto, modelos de usuário, endpoints de registro/login básicos, "
-        "e integração com um sistema de autenticação (ex: JWT). "
-        "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
-        "O código deve ser funcional e seguir as melhores práticas de backend."
-    ),
-    expected_output="Código Python funcional para o esqueleto do microsserviço de autenticação.",
-    agent=None,
-    # Não há ferramentas de arquivo para esta tarefa específica, pois o foco é a geração de código pelo LLM
-)
-
-develop_frontend_login_dashboard_skeleton_task = Task(
-    description=(
-        "Desenvolva o esqueleto para as interfaces de login e dashboard do frontend. "
-        "Isso inclui os componentes UI, rotas básicas, e integração inicial com o backend de autenticação. "
-        "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
-        "O código deve ser funcional e seguir as melhores práticas de frontend (ex: React, Next.js)."
-    ),
-    expected_output="Código React/Next.js funcional para o esqueleto das interfaces de login e dashboard.",
-    agent=None,
-    # Não há ferramentas de arquivo para esta tarefa específica
-)
-
-develop_backend_chat_skeleton_task = Task(
-    description=(
-        "Desenvolva o esqueleto para o microsserviço de chat do backend. "
-        "Isso inclui a configuração inicial, modelos de mensagens e salas de chat, e endpoints básicos para envio/recebimento de mensagens. "
-        "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
-        "O código deve ser funcional e seguir as melhores práticas de backend."
-    ),
-    expected_output="Código Python funcional para o esqueleto do microsserviço de chat.",
-    agent=None,
-    # Não há ferramentas de arquivo para esta tarefa específica
-)
-
-develop_frontend_chat_task = Task(
-    description=(
-        "Desenvolva a interface de chat no frontend e integre-a com o microsserviço de chat do backend. "
-        "Isso inclui a UI para exibir mensagens, enviar novas mensagens, e lidar com a comunicação em tempo real (WebSockets, se aplicável). "
-        "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
-        "O código deve ser funcional e seguir as melhores práticas de frontend."
-    ),
-    expected_output="Código React/Next.js funcional para a interface de chat.",
-    agent=None,
-    # Não há ferramentas de arquivo para esta tarefa específica
-)
-
-create_test_plans_task = Task(
-    description=(
-        "Crie planos de teste abrangentes para todas as funcionalidades desenvolvidas. "
-        "Isso inclui casos de teste para o backend (API, lógica de negócios) e frontend (UI, fluxo do usuário). "
-        "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
-        "Priorize testes de integração e end-to-end."
-    ),
-    expected_output="Documentos detalhados de planos de teste para as funcionalidades desenvolvidas.",
-    agent=None,
-)
-
-setup_infra_docker_task = Task(
-    description=(
-        "Configure a infraestrutura básica usando Docker e Docker Compose para os microsserviços do backend e frontend. "
-        "Isso inclui a criação de Dockerfiles para cada serviço e um docker-compose.yml para orquestração. "
-        "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
-        "Garanta que a configuração permita um ambiente de desenvolvimento local fácil e reflita a arquitetura proposta."
-    ),
-    expected_output="Arquivos Dockerfile e docker-compose.yml funcionais para a configuração da infraestrutura.",
-    agent=None,
-)
-
-update_project_status_task = Task(
-    description=(
-        "Analise os resultados do planejamento e desenvolvimento mais recentes. "
-        "Atualize o arquivo de status do projeto ({PROJECT_STATUS_PATH}) com os novos itens CONCLUÍDOS. "
-        "Use o arquivo de roteiro de desenvolvimento em ({TECHNOLOGIES_AND_ROADMAP_SPEC_PATH}) como referência "
-        "para identificar as fases ou sub-tarefas que foram efetivamente concluídas ou avançadas. "
-        "O plano gerado foi: {planning_result_context}. "
-        "Os resultados de desenvolvimento foram: {development_result_context}. "
-        "O status anterior era: {completed_tasks_context}. "
-        "**Sua saída DEVE ser uma lista JSON de strings contendo APENAS os nomes EXATOS das tarefas ou fases do roteiro que foram definitivamente concluídas, OU os nomes EXATOS de novos artefatos/documentos gerados. NÃO inclua nada além da lista JSON. Exemplo: ['Fase 1: Descoberta e Design', 'DER Analisado', 'Plano de Arquitetura']**."
-    ),
-    expected_output=(
-        "Uma lista JSON de strings contendo os nomes EXATOS das tarefas ou fases do roteiro que foram "
-        "concluídas, ou novos artefatos/documentos gerados. EX: ['Fase 1: Descoberta e Design', 'DER Analisado']"
+from crew_config.spec_search_tool import SpecSearchTool
+from crew_config.instrumentation import traced_tool_class
+
+# Os caminhos das especificações e do status vêm do projeto da execução (projects.py)
+from projects import ProjectPaths, get_project_paths
+
+# Cada leitura, escrita ou busca vira um span "tool.call" no trace da execução (tracing.py)
+FileReadTool = traced_tool_class(FileReadTool)
+FileWriterTool = traced_tool_class(FileWriterTool)
+DirectoryReadTool = traced_tool_class(DirectoryReadTool)
+SpecSearchTool = traced_tool_class(SpecSearchTool)
+
+
+def build_file_tools(paths: ProjectPaths = None):
+    """
+    Cria um conjunto novo de ferramentas de arquivo para uma execução, ligadas aos arquivos do projeto `paths`
+    (o projeto padrão, se omitido). Cada execução recebe suas próprias instâncias, sem estado compartilhado.
+    """
+    paths = paths or get_project_paths()
+    # Ferramentas para manipulação de arquivos
+    # AGORA USAMOS FERRAMENTAS ESPECÍFICAS DE LEITURA E ESCRITA
+    # Note que estamos criando instâncias separadas para leitura e escrita do mesmo arquivo
+    return {
+        "file_read_project_status": FileReadTool(
+            file_path=paths.project_status,
+            description="Permite ler o conteúdo do arquivo JSON de status do projeto. "
+                        "Use para verificar o status atual."
+        ),
+        "file_write_project_status": FileWriterTool(
+            file_path=paths.project_status,
+            description="Permite escrever no arquivo JSON de status do projeto. "
+                        "Use para atualizar a lista de itens concluídos no projeto."
+        ),
+        "file_read_tech_roadmap": FileReadTool(
+            file_path=paths.technologies_and_roadmap_spec,
+            description="Permite ler o arquivo Markdown que contém as tecnologias propostas e o roteiro de desenvolvimento do projeto."
+        ),
+        "file_read_system_flow": FileReadTool(
+            file_path=paths.system_flow_spec,
+            description="Permite ler o arquivo Markdown que descreve o fluxo geral do sistema."
+        ),
+        "file_read_der_spec": FileReadTool(
+            file_path=paths.der_spec,
+            description="Permite ler o arquivo Markdown que contém a especificação do Diagrama Entidade-Relacionamento (DER)."
+        ),
+        # Busca nas especificações: devolve só as seções relevantes (índice BM25 em spec_index.py)
+        "spec_search": SpecSearchTool(
+            file_paths=[paths.technologies_and_roadmap_spec, paths.system_flow_spec, paths.der_spec],
+        ),
+        # Ferramenta opcional para leitura de diretórios, se necessário por algum agente
+        # Certifique-se de que o caminho 'path' está correto para o uso pretendido
+        "directory_read_tool": DirectoryReadTool(
+            path=paths.workspace, # Diretório do projeto (a raiz do repositório no projeto padrão)
+            description="Permite ler o conteúdo de diretórios. Use com cautela e apenas quando necessário."
+        ),
+    }
+
+
+# Arquivos do projeto lidos por cada ferramenta de leitura (usados para invalidar checkpoints quando mudam)
+TOOL_INPUT_FILES = MappingProxyType({
+    "file_read_project_status": ("project_status",),
+    "file_read_tech_roadmap": ("technologies_and_roadmap_spec",),
+    "file_read_system_flow": ("system_flow_spec",),
+    "file_read_der_spec": ("der_spec",),
+    "spec_search": ("technologies_and_roadmap_spec", "system_flow_spec", "der_spec"),
+})
+
+
+# --- Templates das Tarefas ---
+# Os templates são imutáveis; as instâncias de Task são criadas por execução em build_task().
+# "agent" é o nome do agente em crew_config/agents.py e "tools" os nomes em build_file_tools().
+
+TASK_TEMPLATES = MappingProxyType({
+    "orchestrate_development_plan_task": MappingProxyType({
+        "description": (
+            "Com base nos requisitos e no status atual do projeto, crie um plano de desenvolvimento detalhado. "
+            "Considere o seguinte pedido do usuário: '{user_project_plan}'. "
+            "O status atual do projeto é: {completed_tasks_context}. "
+            "O plano deve ser pragmático, modular e iterativo, identificando os próximos passos claros e as fases envolvidas, "
+            "considerando o que já foi feito. Inclua sub-tarefas específicas para cada fase, se aplicável, "
+            "e como elas se encaixam no progresso geral do projeto."
+        ),
+        "expected_output": (
+            "Um plano de desenvolvimento detalhado, articulado em etapas e sub-tarefas, "
+            "levando em conta o estado atual e o que o usuário solicitou."
+        ),
+        # As especificações são consultadas pela busca (trechos relevantes), não lidas inteiras
+        "tools": ("spec_search", "file_read_project_status"),
+        "agent": "product_owner",
+    }),
+
+    "analyze_requirements_der_task": MappingProxyType({
+        "description": (
+            "Analise cuidadosamente os documentos de fluxo do sistema e o DER. "
+            "Identifique todos os requisitos funcionais e não-funcionais, e prepare um resumo claro "
+            "que servirá de base para o design da arquitetura. "
+            "Garanta que a análise esteja alinhada com as necessidades do projeto e com o que já foi feito: {completed_tasks_context}."
+        ),
+        "expected_output": "Um resumo detalhado dos requisitos funcionais e não-funcionais, e uma análise do DER.",
+        "tools": ("spec_search", "file_read_project_status"),
+        "agent": "product_owner",
+    }),
+
+    "design_architecture_db_schema_task": MappingProxyType({
+        "description": (
+            "Com base nos requisitos analisados e no DER, projete a arquitetura geral do sistema e o esquema do banco de dados. "
+            "Inclua a estrutura de microsserviços, tecnologias principais e o design de alto nível do banco de dados (tabelas, relações). "
+            "Considere as tecnologias propostas no roteiro e o status atual: {completed_tasks_context}. "
+            "Crie também a documentação técnica inicial para a arquitetura e o esquema do banco de dados."
+        ),
+        "expected_output": "Documentos de design de arquitetura e esquema de banco de dados, detalhando a estrutura do sistema.",
+        "tools": ("spec_search", "file_read_project_status"),
+        "agent": "tech_lead",
+    }),
+
+    "develop_backend_auth_skeleton_task": MappingProxyType({
+        "description": (
+            "Desenvolva o esqueleto para o microsserviço de autenticação do backend. "
+            "Isso inclui a configuração inicial do projeto, modelos de usuário, endpoints de registro/login básicos, "
+            "e integração com um sistema de autenticação (ex: JWT). "
+            "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
+            "O código deve ser funcional e seguir as melhores práticas de backend."
+        ),
+        "expected_output": "Código Python funcional para o esqueleto do microsserviço de autenticação.",
+        # Não há ferramentas de arquivo para esta tarefa específica, pois o foco é a geração de código pelo LLM
+        "tools": (),
+        "agent": "backend_developer",
+    }),
+
+    "develop_frontend_login_dashboard_skeleton_task": MappingProxyType({
+        "description": (
+            "Desenvolva o esqueleto para as interfaces de login e dashboard do frontend. "
+            "Isso inclui os componentes UI, rotas básicas, e integração inicial com o backend de autenticação. "
+            "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
+            "O código deve ser funcional e seguir as melhores práticas de frontend (ex: React, Next.js)."
+        ),
+        "expected_output": "Código React/Next.js funcional para o esqueleto das interfaces de login e dashboard.",
+        # Não há ferramentas de arquivo para esta tarefa específica
+        "tools": (),
+        "agent": "frontend_developer",
+    }),
+
+    "develop_backend_chat_skeleton_task": MappingProxyType({
+        "description": (
+            "Desenvolva o esqueleto para o microsserviço de chat do backend. "
+            "Isso inclui a configuração inicial, modelos de mensagens e salas de chat, e endpoints básicos para envio/recebimento de mensagens. "
+            "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
+            "O código deve ser funcional e seguir as melhores práticas de backend."
+        ),
+        "expected_output": "Código Python funcional para o esqueleto do microsserviço de chat.",
+        # Não há ferramentas de arquivo para esta tarefa específica
+        "tools": (),
+        "agent": "backend_developer",
+    }),
+
+    "develop_frontend_chat_task": MappingProxyType({
+        "description": (
+            "Desenvolva a interface de chat no frontend e integre-a com o microsserviço de chat do backend. "
+            "Isso inclui a UI para exibir mensagens, enviar novas mensagens, e lidar com a comunicação em tempo real (WebSockets, se aplicável). "
+            "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
+            "O código deve ser funcional e seguir as melhores práticas de frontend."
+        ),
+        "expected_output": "Código React/Next.js funcional para a interface de chat.",
+        # Não há ferramentas de arquivo para esta tarefa específica
+        "tools": (),
+        "agent": "frontend_developer",
+    }),
+
+    "create_test_plans_task": MappingProxyType({
+        "description": (
+            "Crie planos de teste abrangentes para todas as funcionalidades desenvolvidas. "
+            "Isso inclui casos de teste para o backend (API, lógica de negócios) e frontend (UI, fluxo do usuário). "
+            "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
+            "Priorize testes de integração e end-to-end."
+        ),
+        "expected_output": "Documentos detalhados de planos de teste para as funcionalidades desenvolvidas.",
+        "tools": (),
+        "agent": "qa_engineer",
+    }),
+
+    "setup_infra_docker_task": MappingProxyType({
+        "description": (
+            "Configure a infraestrutura básica usando Docker e Docker Compose para os microsserviços do backend e frontend. "
+            "Isso inclui a criação de Dockerfiles para cada serviço e um docker-compose.yml para orquestração. "
+            "O contexto atual do projeto e tarefas concluídas é: {completed_tasks_context}. "
+            "Garanta que a configuração permita um ambiente de desenvolvimento local fácil e reflita a arquitetura proposta."
+        ),
+        "expected_output": "Arquivos Dockerfile e docker-compose.yml funcionais para a configuração da infraestrutura.",
+        "tools": (),
+        "agent": "devops_engineer",
+    }),
+
+    "update_project_status_task": MappingProxyType({
+        "description": (
+            "Analise os resultados do planejamento e desenvolvimento mais recentes. "
+            "Atualize o arquivo de status do projeto ({PROJECT_STATUS_PATH}) com os novos itens CONCLUÍDOS. "
+            "Use o arquivo de roteiro de desenvolvimento em ({TECHNOLOGIES_AND_ROADMAP_SPEC_PATH}) como referência "
+            "para identificar as fases ou sub-tarefas que foram efetivamente concluídas ou avançadas. "
+            "O plano gerado foi: {planning_result_context}. "
+            "Os resultados de desenvolvimento foram: {development_result_context}. "
+            "Tarefas cuja saída começa com '[Tarefa interrompida por orçamento' NÃO foram concluídas: "
+            "não marque como concluídos os itens que dependem delas. "
+            "O status anterior era: {completed_tasks_context}. "
+            "**Sua saída DEVE ser uma lista JSON de strings contendo APENAS os nomes EXATOS das tarefas ou fases do roteiro que foram definitivamente concluídas, OU os nomes EXATOS de novos artefatos/documentos gerados. NÃO inclua nada além da lista JSON. Exemplo: ['Fase 1: Descoberta e Design', 'DER Analisado', 'Plano de Arquitetura']**."
+        ),
+        "expected_output": (
+            "Uma lista JSON de strings contendo os nomes EXATOS das tarefas ou fases do roteiro que foram "
+            "concluídas, ou novos artefatos/documentos gerados. EX: ['Fase 1: Descoberta e Design', 'DER Analisado']"
+        ),
+        # ATUALIZADO: Usando as ferramentas de leitura e escrita específicas
+        "tools": ("file_read_project_status", "file_write_project_status", "file_read_tech_roadmap"),
+        "agent": "product_owner",
+    }),
+})
+
+
+def build_task(name: str, context: dict, agents: dict, tools: dict, upstream_outputs: dict = None):
+    """
+    Cria uma instância nova de Task a partir do template `name`.
+    Os placeholders da descrição são preenchidos com `context`, sem alterar o template.
+    Se informado, `upstream_outputs` (nome da tarefa -> saída) é anexado à descrição como contexto.
+    """
+    template = TASK_TEMPLATES[name]
+    description = template["description"].format(**context)
+    if upstream_outputs:
+        description += "\n\nResultados das tarefas anteriores das quais esta tarefa depende:\n\n" + "\n\n".join(
+            f"### {upstream_name}\n{output}" for upstream_name, output in upstream_outputs.items()
+        )
+    return Task(
+        description=description,
+        expected_output=template["expected_output"],
+        tools=[tools[tool_name] for tool_name in template["tools"]],
+        agent=agents[template["agent"]],
+    )
+
+
+def task_input_files(name: str, paths: ProjectPaths = None) -> list:
+    """Retorna os arquivos de especificação/status do projeto lidos pelas ferramentas da tarefa `name`."""
+    paths = paths or get_project_paths()
+    return [
+        getattr(paths, field)
+        for tool_name in TASK_TEMPLATES[name]["tools"]
+        for field in TOOL_INPUT_FILES.get(tool_name, ())
+    ]
+
+
+# --- Dependências entre Tarefas (modo de execução DAG) ---
+# Cada tarefa declara as tarefas das quais depende. Tarefas sem dependência entre si
+# podem ser executadas em paralelo quando CREW_EXECUTION_MODE=dag.
+TASK_DEPENDENCIES = MappingProxyType({
+    "analyze_requirements_der_task": (),
+    "design_architecture_db_schema_task": ("analyze_requirements_der_task",),
+    "develop_backend_auth_skeleton_task": ("design_architecture_db_schema_task",),
+    "develop_frontend_login_dashboard_skeleton_task": ("design_architecture_db_schema_task",),
+    "develop_backend_chat_skeleton_task": ("design_architecture_db_schema_task",),
+    "develop_frontend_chat_task": ("design_architecture_db_schema_task", "develop_backend_chat_skeleton_task"),
+    "create_test_plans_task": (
+        "develop_backend_auth_skeleton_task",
+        "develop_frontend_login_dashboard_skeleton_task",
+        "develop_backend_chat_skeleton_task",
+        "develop_frontend_chat_task",
     ),
-    # ATUALIZADO: Usando as ferramentas de leitura e escrita específicas
-    tools=[file_read_project_status, file_write_project_status, file_read_tech_roadmap],
-    agent=None,
-)
\ No newline at end of file
+    "setup_infra_docker_task": ("design_architecture_db_schema_task",),
+})
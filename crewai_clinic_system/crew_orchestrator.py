@@ -1,68 +1,237 @@
 import os
 import json
+import time
+import contextvars
 from dotenv import load_dotenv
 from crewai import Crew, Process
-import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
-# Carregar os caminhos das especificações
-SYSTEM_FLOW_SPEC_PATH = os.getenv("SYSTEM_FLOW_SPEC_PATH")
-DER_SPEC_PATH = os.getenv("DER_SPEC_PATH")
-TECHNOLOGIES_AND_ROADMAP_SPEC_PATH = os.getenv("TECHNOLOGIES_AND_ROADMAP_SPEC_PATH")
-PROJECT_STATUS_PATH = os.getenv("PROJECT_STATUS_PATH")
-
-# Importar agentes e tarefas
-from crew_config.agents import (
-    product_owner,
-    tech_lead,
-    backend_developer,
-    frontend_developer,
-    qa_engineer,
-    devops_engineer
+# Modo de execução da crew de desenvolvimento: "sequential" (padrão) ou "dag"
+CREW_EXECUTION_MODE = os.getenv("CREW_EXECUTION_MODE", "sequential")
+CREW_MAX_PARALLEL_TASKS = int(os.getenv("CREW_MAX_PARALLEL_TASKS", "4"))
+# Tempo máximo (em segundos) da etapa de desenvolvimento executada como DAG; ao esgotar, as tarefas em andamento
+# são abandonadas e a execução termina com as saídas das que já concluíram (0 desativa)
+DEVELOPMENT_STAGE_TIME_LIMIT = int(os.getenv("DEVELOPMENT_STAGE_TIME_LIMIT", "3000"))
+
+# Importar a fábrica de agentes e tarefas (instâncias novas a cada execução)
+from crew_config.factory import build_crew_graph
+from crew_config.tasks import TASK_DEPENDENCIES, TASK_TEMPLATES, task_input_files
+from spec_cache import get_roadmap_from_file
+from projects import DEFAULT_PROJECT_ID, ProjectPaths, get_project_paths
+from context_budget import fit_fields_to_budget, summarize_completed_items
+from status_extractor import (
+    BUDGET_STOPPED_MARKER,
+    STATUS_EXTRACTION_MODE,
+    STATUS_EXTRACTION_MIN_CONFIDENCE,
+    extract_completed_items,
 )
-from crew_config.tasks import (
-    orchestrate_development_plan_task,
-    analyze_requirements_der_task,
-    design_architecture_db_schema_task,
-    develop_backend_auth_skeleton_task,
-    develop_frontend_login_dashboard_skeleton_task,
-    develop_backend_chat_skeleton_task,
-    develop_frontend_chat_task,
-    create_test_plans_task,
-    setup_infra_docker_task,
-    update_project_status_task
+from metrics import STAGE_DURATION, track_stage
+from tracing import record_span, span
+from crew_config.budget import (
+    BudgetExceeded,
+    current_run_budget,
+    current_task_budget,
+    record_budget_event,
+    run_budget,
+    task_budget,
 )
+from checkpoint_store import CREW_CHECKPOINTS_ENABLED, checkpoint_key, load_checkpoint, save_checkpoint
+
+# Fases do roteiro e as tarefas (nomes dos templates) que as implementam
+PHASE_TO_TASKS = {
+    "Fase 1: Descoberta e Design": ["analyze_requirements_der_task", "design_architecture_db_schema_task"],
+    "Fase 2: Configuração e Bootstrap": ["setup_infra_docker_task"],
+    "Fase 3: Desenvolvimento Iterativo por Módulos/Funcionalidades": [
+        "develop_backend_auth_skeleton_task",
+        "develop_frontend_login_dashboard_skeleton_task",
+        "develop_backend_chat_skeleton_task",
+        "develop_frontend_chat_task",
+    ],
+    "Fase 4: Testes Abrangentes e Qualidade": ["create_test_plans_task"],
+}
+
+DEVELOPMENT_TASKS = [
+    "develop_backend_auth_skeleton_task",
+    "develop_frontend_login_dashboard_skeleton_task",
+    "develop_backend_chat_skeleton_task",
+    "develop_frontend_chat_task",
+]
+
+DEVELOPMENT_AGENTS = [
+    "product_owner",
+    "tech_lead",
+    "backend_developer",
+    "frontend_developer",
+    "qa_engineer",
+    "devops_engineer",
+]
+
+def get_roadmap_phases_from_file(paths: ProjectPaths = None):
+    """Lê o arquivo de roteiro do projeto e extrai as fases (lista de nomes, na ordem do arquivo)."""
+    paths = paths or get_project_paths()
+    error_roadmap, roadmap = get_roadmap_from_file(paths.technologies_and_roadmap_spec)
+    if error_roadmap:
+        return error_roadmap, []
+    return None, list(roadmap)
+
+
+class StatusUpdateError(ValueError):
+    """Falha na etapa de atualização de status, com a saída bruta do LLM para diagnóstico."""
+
+    def __init__(self, message: str, raw_output: str):
+        super().__init__(message)
+        self.raw_output = raw_output
+
+
+class StageTimeLimitExceeded(Exception):
+    """Uma etapa passou do seu tempo limite."""
+
+
+class DevelopmentStageError(Exception):
+    """Falha (ou tempo esgotado) na etapa de desenvolvimento, com as saídas das tarefas que chegaram a concluir."""
+
+    def __init__(self, message: str, partial_outputs: dict):
+        super().__init__(message)
+        self.partial_outputs = partial_outputs
+
+
+def with_partial_development(state: dict, partial_outputs: dict) -> dict:
+    """Estado com as saídas parciais do desenvolvimento, para que uma execução interrompida entregue o que ficou pronto."""
+    if not partial_outputs:
+        return state
+    return {
+        **state,
+        "development_outputs": partial_outputs,
+        "development_result": combine_development_outputs(state["tasks_for_dev_crew"], partial_outputs),
+    }
+
+
+def _budget_stopped_output(budget, exc: BudgetExceeded) -> str:
+    """
+    Saída de uma tarefa interrompida por orçamento: o marcador BUDGET_STOPPED_MARKER (a tarefa não foi concluída,
+    ver status_extractor.is_budget_stopped) seguido da melhor resposta até então.
+    """
+    note = f"{BUDGET_STOPPED_MARKER}: {exc}. A tarefa NÃO foi concluída; o texto abaixo é parcial.]"
+    best_output = budget.best_output()
+    return f"{note}\n\n{best_output}" if best_output else note
+
+
+def _traced_kickoff(crew, stage: str, task_names: list):
+    """
+    Crew.kickoff() dentro de um span "crew.kickoff" do trace da execução. Numa crew de uma tarefa, o span
+    "task" fica aninhado no da crew; na crew sequencial, os spans das tarefas vêm do task_callback.
+    Se um orçamento (crew_config/budget.py) for atingido, a crew para e a saída é a melhor resposta até então,
+    marcada como interrompida (_budget_stopped_output).
+    Retorna (saída, se a crew foi interrompida por orçamento); saídas interrompidas não viram checkpoint.
+    """
+    with span("crew.kickoff", stage=stage, tasks=",".join(task_names)) as kickoff_span, \
+            task_budget(task_names[0] if task_names else stage) as budget:
+        stopped = False
+        try:
+            if len(task_names) == 1:
+                with span("task", task=task_names[0]) as task_span:
+                    output = crew.kickoff()
+                    task_span.set_attribute("output_chars", len(str(output)))
+            else:
+                output = crew.kickoff()
+        except BudgetExceeded as e:
+            stopped = True
+            kickoff_span.set_attribute("budget_exceeded", f"{e.scope}:{e.limit}")
+            record_budget_event(budget.name, e)
+            output = _budget_stopped_output(budget, e)
+        kickoff_span.set_attribute("output_chars", len(str(output)))
+        kickoff_span.set_attribute("delegations", budget.delegations)
+    return output, stopped
+
+
+def _kickoff_single_task(task, agents, manager_llm, task_name: str = ""):
+    """Executa uma única tarefa em uma crew própria e retorna (saída, se foi interrompida por orçamento)."""
+    single_task_crew = Crew(
+        agents=agents,
+        tasks=[task],
+        verbose=True,
+        process=Process.sequential,
+        manager_llm=manager_llm
+    )
+    return _traced_kickoff(single_task_crew, "development_task", [task_name])
+
+
+def _load_task_checkpoint(task_name: str, description: str, input_files: list, upstream_outputs: dict = None):
+    """
+    Procura a saída gravada de uma tarefa cujas entradas não mudaram.
+    Retorna (chave, saída); a saída é None se não houver checkpoint (ou se os checkpoints estiverem desativados).
+    """
+    if not CREW_CHECKPOINTS_ENABLED:
+        return None, None
+    key = checkpoint_key(task_name, description, input_files, upstream_outputs or {})
+    return key, load_checkpoint(key)
+
+
+def _phase_completed_items(task_name: str, state: dict):
+    """
+    Itens concluídos das fases do roteiro implementadas pela tarefa (a fase e seus sub-itens),
+    ou None se a tarefa não pertence a nenhuma fase de PHASE_TO_TASKS.
+    """
+    phases = [phase_name for phase_name, task_names in PHASE_TO_TASKS.items() if task_name in task_names]
+    if not phases:
+        return None
+    _, roadmap = get_roadmap_from_file(_project_paths(state).technologies_and_roadmap_spec)
+    phase_items = set(phases)
+    for phase_name in phases:
+        phase_items.update((roadmap or {}).get(phase_name, ()))
+    return [item for item in state["current_completed_tasks"] if item in phase_items]
+
+
+def _load_development_checkpoint(task_name: str, task, state: dict, upstream_outputs: dict):
+    """
+    Checkpoint de uma tarefa de desenvolvimento. A chave usa só os itens concluídos das fases que a tarefa implementa,
+    no lugar da lista completa e do project_status.json (que guarda apenas essa lista): concluir itens de outras fases
+    não invalida o checkpoint. Tarefas fora de PHASE_TO_TASKS usam a lista completa.
+    """
+    paths = _project_paths(state)
+    input_files = task_input_files(task_name, paths)
+    phase_items = _phase_completed_items(task_name, state)
+    if phase_items is None:
+        return _load_task_checkpoint(task_name, task.description, input_files, upstream_outputs)
+    # As saídas das dependências já entram na chave pelos hashes de `upstream_outputs`
+    description = TASK_TEMPLATES[task_name]["description"].format(
+        **{**_run_context(state), "completed_tasks_context": str(phase_items)}
+    )
+    input_files = [path for path in input_files if path != paths.project_status]
+    return _load_task_checkpoint(task_name, description, input_files, upstream_outputs)
+
 
-def get_roadmap_phases_from_file():
-    """Lê o arquivo de roteiro e extrai as fases."""
+def _save_task_checkpoint(key: str, task_name: str, output: str):
+    """Grava a saída da tarefa, se os checkpoints estiverem ativos; falhas de gravação não interrompem a execução."""
+    if key is None:
+        return
     try:
-        if not os.path.exists(TECHNOLOGIES_AND_ROADMAP_SPEC_PATH):
-            return {"error": f"Erro: O arquivo de roteiro '{TECHNOLOGIES_AND_ROADMAP_SPEC_PATH}' não foi encontrado."}, []
-        with open(TECHNOLOGIES_AND_ROADMAP_SPEC_PATH, 'r', encoding='utf-8') as f:
-            roadmap_content = f.read()
-        phases = re.findall(r"(Fase \d+: .*?)\n", roadmap_content)
-        return None, [phase.strip() for phase in phases]
+        save_checkpoint(key, task_name, output)
     except Exception as e:
-        return {"error": f"Erro ao ler ou parsear o roteiro: {e}"}, []
+        print(f"Erro ao gravar checkpoint da tarefa '{task_name}': {e}")
 
 
-def run_crew_process(user_input: str, current_completed_tasks: list):
+def _notify(progress_callback, stage: str, status: str, message: str = "", **detail):
+    """Envia um evento de progresso, se houver callback; falhas no envio não interrompem a execução."""
+    if progress_callback is None:
+        return
+    try:
+        progress_callback(stage, status, message, **detail)
+    except Exception as e:
+        print(f"Erro ao publicar progresso ({stage}/{status}): {e}")
+
+
+def select_development_tasks(user_input: str, phases: list):
     """
-    Executa o processo CrewAI com base na entrada do usuário e no status atual do projeto.
-    Retorna os resultados do planejamento, do desenvolvimento e os itens recém-concluídos.
+    Interpreta a entrada do usuário (números de fases ou instrução livre).
+    Retorna o plano do usuário e a lista ordenada de nomes de tarefas de desenvolvimento.
     """
-    
-    # --- Etapa 0: Processar Entrada do Usuário e Status ---
     user_project_plan = ""
     tasks_for_dev_crew = []
 
-    # Read roadmap content to get phases
-    error_roadmap, phases = get_roadmap_phases_from_file()
-    if error_roadmap:
-        return error_roadmap # Return the error directly if roadmap loading fails
-
     selected_indices_list = []
     try:
         selected_indices_list = [int(x.strip()) for x in user_input.split(',') if x.strip().isdigit()]
@@ -72,106 +241,381 @@ def run_crew_process(user_input: str, current_completed_tasks: list):
     if selected_indices_list:
         user_selected_phases_names = [phases[idx-1] for idx in selected_indices_list if 0 < idx <= len(phases)]
         user_project_plan = f"Desenvolver o sistema, focando nas seguintes fases do roteiro de desenvolvimento: {', '.join(user_selected_phases_names)}."
-        
-        phase_to_task_mapping = {
-            "Fase 1: Descoberta e Design": [analyze_requirements_der_task, design_architecture_db_schema_task],
-            "Fase 2: Configuração e Bootstrap": [setup_infra_docker_task],
-            "Fase 3: Desenvolvimento Iterativo por Módulos/Funcionalidades": [
-                develop_backend_auth_skeleton_task,
-                develop_frontend_login_dashboard_skeleton_task,
-                develop_backend_chat_skeleton_task,
-                develop_frontend_chat_task,
-            ],
-            "Fase 4: Testes Abrangentes e Qualidade": [create_test_plans_task],
-        }
 
         for selected_phase_name in user_selected_phases_names:
-            if selected_phase_name in phase_to_task_mapping:
-                for task in phase_to_task_mapping[selected_phase_name]:
-                    if task not in tasks_for_dev_crew:
-                        tasks_for_dev_crew.append(task)
-        
+            if selected_phase_name in PHASE_TO_TASKS:
+                for task_name in PHASE_TO_TASKS[selected_phase_name]:
+                    if task_name not in tasks_for_dev_crew:
+                        tasks_for_dev_crew.append(task_name)
+
         # Garante que tarefas essenciais para fases de desenvolvimento sejam incluídas
-        if any(task in tasks_for_dev_crew for task in [
-            develop_backend_auth_skeleton_task, develop_frontend_login_dashboard_skeleton_task,
-            develop_backend_chat_skeleton_task, develop_frontend_chat_task
-        ]):
-            if create_test_plans_task not in tasks_for_dev_crew:
-                tasks_for_dev_crew.append(create_test_plans_task)
-            if setup_infra_docker_task not in tasks_for_dev_crew:
-                tasks_for_dev_crew.append(setup_infra_docker_task)
+        if any(task_name in tasks_for_dev_crew for task_name in DEVELOPMENT_TASKS):
+            if "create_test_plans_task" not in tasks_for_dev_crew:
+                tasks_for_dev_crew.append("create_test_plans_task")
+            if "setup_infra_docker_task" not in tasks_for_dev_crew:
+                tasks_for_dev_crew.append("setup_infra_docker_task")
 
         if any(phase in user_selected_phases_names for phase in ["Fase 1: Descoberta e Design", "Fase 2: Configuração e Bootstrap", "Fase 3: Desenvolvimento Iterativo por Módulos/Funcionalidades"]):
-            if analyze_requirements_der_task not in tasks_for_dev_crew:
-                tasks_for_dev_crew.insert(0, analyze_requirements_der_task)
-            if design_architecture_db_schema_task not in tasks_for_dev_crew:
-                tasks_for_dev_crew.insert(1, design_architecture_db_schema_task)
+            if "analyze_requirements_der_task" not in tasks_for_dev_crew:
+                tasks_for_dev_crew.insert(0, "analyze_requirements_der_task")
+            if "design_architecture_db_schema_task" not in tasks_for_dev_crew:
+                tasks_for_dev_crew.insert(1, "design_architecture_db_schema_task")
 
     else: # User provided a specific instruction
         user_project_plan = user_input
-        tasks_for_dev_crew.append(analyze_requirements_der_task)
-        tasks_for_dev_crew.append(design_architecture_db_schema_task)
+        tasks_for_dev_crew.append("analyze_requirements_der_task")
+        tasks_for_dev_crew.append("design_architecture_db_schema_task")
+
+    return user_project_plan, tasks_for_dev_crew
+
+
+def prepare_run_state(user_input: str, current_completed_tasks: list, project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Etapa 0: interpreta a entrada do usuário e monta o estado da execução do projeto `project_id`.
+    O estado é um dicionário serializável em JSON, passado de etapa em etapa (inclusive entre workers Celery).
+    Retorna (erro, estado); em caso de erro no roteiro o estado é None.
+    """
+    # Read roadmap content to get phases
+    error_roadmap, phases = get_roadmap_phases_from_file(get_project_paths(project_id))
+    if error_roadmap:
+        return error_roadmap, None
+
+    user_project_plan, tasks_for_dev_crew = select_development_tasks(user_input, phases)
+    return None, {
+        "project_id": project_id,
+        "user_input": user_input,
+        "current_completed_tasks": list(current_completed_tasks),
+        "user_project_plan": user_project_plan,
+        "tasks_for_dev_crew": tasks_for_dev_crew,
+        "planning_result": "N/A",
+        "development_outputs": {},
+        "development_result": "Nenhuma tarefa de desenvolvimento foi executada.",
+    }
 
 
-    # --- Etapa 1: Orquestração e Geração do Plano de Desenvolvimento Detalhado ---
-    # Formata a descrição da tarefa com o contexto do usuário
-    orchestrate_development_plan_task.description = \
-        orchestrate_development_plan_task.description.format(
-            user_project_plan=user_project_plan,
-            completed_tasks_context=str(current_completed_tasks)
-        )
+def _project_paths(state: dict) -> ProjectPaths:
+    """Arquivos do projeto da execução (estados anteriores ao modo multiprojeto usam o projeto padrão)."""
+    return get_project_paths(state.get("project_id", DEFAULT_PROJECT_ID))
+
+
+def _run_context(state: dict) -> dict:
+    """Contexto usado para preencher os templates das tarefas desta execução."""
+    paths = _project_paths(state)
+    return {
+        "user_project_plan": state["user_project_plan"],
+        "completed_tasks_context": str(state["current_completed_tasks"]),
+        "PROJECT_STATUS_PATH": paths.project_status,
+        "TECHNOLOGIES_AND_ROADMAP_SPEC_PATH": paths.technologies_and_roadmap_spec,
+    }
+
+
+def run_planning_stage(state: dict, progress_callback=None) -> dict:
+    """Etapa 1: Orquestração e Geração do Plano de Desenvolvimento Detalhado."""
+    graph = build_crew_graph(["orchestrate_development_plan_task"], _run_context(state), paths=_project_paths(state))
+    product_owner = graph.agents["product_owner"]
+
+    planning_task = graph.tasks["orchestrate_development_plan_task"]
+
+    checkpoint, planning_result = _load_task_checkpoint(
+        "orchestrate_development_plan_task",
+        planning_task.description,
+        task_input_files("orchestrate_development_plan_task", _project_paths(state)),
+    )
+    if planning_result is not None:
+        _notify(progress_callback, "planning", "finished", "Planejamento reaproveitado do checkpoint.", cached=True)
+        return {**state, "planning_result": planning_result}
 
     planning_crew = Crew(
         agents=[product_owner],
-        tasks=[orchestrate_development_plan_task],
+        tasks=[planning_task],
         verbose=True,
         process=Process.sequential,
         manager_llm=product_owner.llm
     )
 
-    planning_result = "N/A"
+    _notify(progress_callback, "planning", "started", "Planejamento iniciado.")
     try:
-        planning_result = planning_crew.kickoff()
+        with track_stage("planning"):
+            output, budget_stopped = _traced_kickoff(planning_crew, "planning", ["orchestrate_development_plan_task"])
+            planning_result = str(output)
     except Exception as e:
-        return {"error": f"Erro na etapa de planejamento: {e}", "planning_result": planning_result, "development_result": "N/A", "newly_completed_items": []}
-
-    # --- Etapa 2: Executar as Tarefas de Desenvolvimento ---
-    final_development_result = "Nenhuma tarefa de desenvolvimento foi executada."
-
-    # Garante que a tarefa de orquestração não seja passada para a crew de desenvolvimento
-    if orchestrate_development_plan_task in tasks_for_dev_crew:
-        tasks_for_dev_crew.remove(orchestrate_development_plan_task)
-
-    if tasks_for_dev_crew:
-        main_development_crew = Crew(
-            agents=[
-                product_owner,
-                tech_lead,
-                backend_developer,
-                frontend_developer,
-                qa_engineer,
-                devops_engineer
-            ],
-            tasks=tasks_for_dev_crew,
-            verbose=True,
-            process=Process.sequential,
-            manager_llm=product_owner.llm
-        )
-        try:
-            final_development_result = main_development_crew.kickoff()
-        except Exception as e:
-            return {"error": f"Erro na etapa de desenvolvimento: {e}", "planning_result": planning_result, "development_result": final_development_result, "newly_completed_items": []}
-
-    # --- Etapa 3: Atualizar o Status do Projeto ---
-    # Formata a descrição da tarefa de atualização de status
-    update_project_status_task.description = \
-        update_project_status_task.description.format(
-            PROJECT_STATUS_PATH=PROJECT_STATUS_PATH,
-            TECHNOLOGIES_AND_ROADMAP_SPEC_PATH=TECHNOLOGIES_AND_ROADMAP_SPEC_PATH,
-            planning_result_context=planning_result,
-            development_result_context=final_development_result,
-            completed_tasks_context=str(current_completed_tasks)
-        )
+        _notify(progress_callback, "planning", "failed", f"Erro na etapa de planejamento: {e}")
+        raise
+    if not budget_stopped:
+        _save_task_checkpoint(checkpoint, "orchestrate_development_plan_task", planning_result)
+    _notify(progress_callback, "planning", "finished", "Planejamento concluído.")
+    return {**state, "planning_result": planning_result}
+
+
+def run_development_task_stage(state: dict, task_name: str, progress_callback=None) -> str:
+    """
+    Executa uma única tarefa de desenvolvimento em uma crew própria.
+    As saídas das dependências (já presentes em state["development_outputs"]) entram na descrição da tarefa,
+    então a tarefa pode rodar em qualquer processo ou worker.
+    """
+    run_context = _run_context(state)
+    upstream_outputs = {
+        dep: state["development_outputs"][dep]
+        for dep in TASK_DEPENDENCIES.get(task_name, ())
+        if dep in state["development_outputs"]
+    }
+    graph = build_crew_graph([], run_context, paths=_project_paths(state))
+    task = graph.new_task(task_name, run_context, upstream_outputs=upstream_outputs)
+    development_agents = [graph.agents[name] for name in DEVELOPMENT_AGENTS]
+
+    checkpoint, output = _load_development_checkpoint(task_name, task, state, upstream_outputs)
+    if output is not None:
+        _notify(progress_callback, "development_task", "finished", f"Tarefa '{task_name}' reaproveitada do checkpoint.", task=task_name, cached=True)
+        return output
+
+    _notify(progress_callback, "development_task", "started", f"Tarefa '{task_name}' iniciada.", task=task_name)
+    try:
+        with track_stage("development_task", task_name):
+            output, budget_stopped = _kickoff_single_task(task, development_agents, graph.agents["product_owner"].llm, task_name)
+            output = str(output)
+    except Exception:
+        _notify(progress_callback, "development_task", "failed", f"Tarefa '{task_name}' falhou.", task=task_name)
+        raise
+    if not budget_stopped:
+        _save_task_checkpoint(checkpoint, task_name, output)
+    _notify(progress_callback, "development_task", "finished", f"Tarefa '{task_name}' concluída.", task=task_name)
+    return output
+
+
+def development_task_levels(task_names: list) -> list:
+    """
+    Agrupa as tarefas em níveis do grafo de dependências (TASK_DEPENDENCIES).
+    Tarefas do mesmo nível não dependem umas das outras e podem rodar ao mesmo tempo.
+    """
+    dependencies = {
+        name: [dep for dep in TASK_DEPENDENCIES.get(name, ()) if dep in task_names]
+        for name in task_names
+    }
+    levels = []
+    placed = set()
+    while len(placed) < len(task_names):
+        level = [name for name in task_names if name not in placed and all(dep in placed for dep in dependencies[name])]
+        if not level:
+            raise ValueError(f"Dependência circular entre as tarefas: {sorted(set(task_names) - placed)}")
+        levels.append(level)
+        placed.update(level)
+    return levels
+
+
+def combine_development_outputs(task_names: list, outputs: dict) -> str:
+    """Concatena as saídas das tarefas de desenvolvimento na ordem original."""
+    return "\n\n".join(f"### {name}\n{outputs[name]}" for name in task_names if name in outputs)
+
+
+def run_tasks_as_dag(state: dict, max_parallel: int = CREW_MAX_PARALLEL_TASKS, progress_callback=None,
+                     time_limit: int = DEVELOPMENT_STAGE_TIME_LIMIT) -> dict:
+    """
+    Executa as tarefas de state["tasks_for_dev_crew"] respeitando TASK_DEPENDENCIES.
+    Tarefas sem dependência entre si rodam em paralelo (até max_parallel por vez);
+    dependências que não fazem parte da execução atual são ignoradas.
+    Retorna as saídas de cada tarefa (nome -> saída). Em caso de falha ou de tempo esgotado (time_limit segundos),
+    levanta DevelopmentStageError com as saídas das tarefas que concluíram.
+    """
+    task_names = state["tasks_for_dev_crew"]
+    dependencies = {
+        name: [dep for dep in TASK_DEPENDENCIES.get(name, ()) if dep in task_names]
+        for name in task_names
+    }
+
+    outputs = dict(state["development_outputs"])
+    pending = {name: deps for name, deps in dependencies.items() if name not in outputs}
+    running = {}
+    deadline = time.monotonic() + time_limit if time_limit else None
+    executor = ThreadPoolExecutor(max_workers=max(1, max_parallel))
+    try:
+        while pending or running:
+            ready = [name for name, deps in pending.items() if all(dep in outputs for dep in deps)]
+            for name in ready:
+                del pending[name]
+                snapshot = {**state, "development_outputs": dict(outputs)}
+                # Copia o contexto (ex: prioridade das chamadas ao LLM) para a thread da tarefa
+                context = contextvars.copy_context()
+                running[executor.submit(context.run, run_development_task_stage, snapshot, name, progress_callback)] = name
+
+            if not running:
+                raise ValueError(f"Dependência circular entre as tarefas: {sorted(pending)}")
+
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                raise StageTimeLimitExceeded(
+                    f"Tempo limite de {time_limit}s da etapa de desenvolvimento esgotado; tarefas interrompidas: {sorted(running.values())}"
+                )
+            for future in done:
+                name = running.pop(future)
+                outputs[name] = future.result()
+    except Exception as e:
+        # Não agenda novas tarefas nem espera as que estão rodando (podem estar presas em uma chamada ao LLM)
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise DevelopmentStageError(str(e), outputs) from e
+    executor.shutdown()
+    return outputs
+
+
+def _sequential_task_callback(task_names: list, progress_callback):
+    """
+    Cria o task_callback da crew sequencial: a cada tarefa concluída, notifica
+    o fim dela e o início da próxima (as tarefas rodam na ordem de task_names).
+    A duração de cada tarefa é medida entre callbacks consecutivos (e registrada também como span "task").
+    """
+    finished = []
+    started_at = [time.perf_counter()]
+    started_ns = [time.time_ns()]
+
+    def on_task_finished(output):
+        name = task_names[len(finished)]
+        finished.append(name)
+        now = time.perf_counter()
+        STAGE_DURATION.labels(stage="development_task", task=name).observe(now - started_at[0])
+        started_at[0] = now
+        record_span("task", started_ns[0], task=name, output_chars=len(str(output)))
+        started_ns[0] = time.time_ns()
+        budget = current_task_budget()
+        if budget is not None and len(finished) < len(task_names):
+            # O orçamento vale por tarefa: a próxima tarefa da crew começa com os contadores zerados
+            budget.start_next_task(task_names[len(finished)])
+        _notify(progress_callback, "development_task", "finished", f"Tarefa '{name}' concluída.", task=name)
+        if len(finished) < len(task_names):
+            next_name = task_names[len(finished)]
+            _notify(progress_callback, "development_task", "started", f"Tarefa '{next_name}' iniciada.", task=next_name)
+
+    return on_task_finished
+
+
+def run_development_stage(state: dict, progress_callback=None) -> dict:
+    """
+    Etapa 2: Executar as Tarefas de Desenvolvimento (em sequência ou como DAG).
+    Com checkpoints ativos, o modo sequencial também executa uma crew por tarefa (uma de cada vez),
+    para que cada tarefa possa ser gravada e reaproveitada individualmente.
+    Se um orçamento interromper a crew sequencial, levanta DevelopmentStageError com as saídas até ali.
+    """
+    tasks_for_dev_crew = state["tasks_for_dev_crew"]
+    if not tasks_for_dev_crew:
+        return state
+
+    _notify(progress_callback, "development", "started", "Desenvolvimento iniciado.", tasks=tasks_for_dev_crew)
+    outputs = {}
+    try:
+        with track_stage("development"), span("stage", stage="development", tasks=",".join(tasks_for_dev_crew)):
+            if CREW_EXECUTION_MODE == "dag" or CREW_CHECKPOINTS_ENABLED:
+                max_parallel = CREW_MAX_PARALLEL_TASKS if CREW_EXECUTION_MODE == "dag" else 1
+                outputs = run_tasks_as_dag(state, max_parallel, progress_callback=progress_callback)
+                final_development_result = combine_development_outputs(tasks_for_dev_crew, outputs)
+            else:
+                # A tarefa de orquestração não faz parte da crew de desenvolvimento
+                graph = build_crew_graph(tasks_for_dev_crew, _run_context(state), paths=_project_paths(state))
+                main_development_crew = Crew(
+                    agents=[graph.agents[name] for name in DEVELOPMENT_AGENTS],
+                    tasks=list(graph.tasks.values()),
+                    verbose=True,
+                    process=Process.sequential,
+                    manager_llm=graph.agents["product_owner"].llm,
+                    task_callback=_sequential_task_callback(tasks_for_dev_crew, progress_callback)
+                )
+                first_task = tasks_for_dev_crew[0]
+                _notify(progress_callback, "development_task", "started", f"Tarefa '{first_task}' iniciada.", task=first_task)
+                try:
+                    output, budget_stopped = _traced_kickoff(main_development_crew, "development", tasks_for_dev_crew)
+                    final_development_result = str(output)
+                finally:
+                    # Também em caso de erro: as tarefas já concluídas entram no resultado parcial
+                    outputs = {
+                        name: str(task.output)
+                        for name, task in graph.tasks.items()
+                        if getattr(task, "output", None) is not None
+                    }
+                if budget_stopped:
+                    # A crew parou na primeira tarefa sem saída; as seguintes nem começaram
+                    pending = [name for name in tasks_for_dev_crew if name not in outputs]
+                    if pending:
+                        outputs[pending[0]] = final_development_result
+                    raise DevelopmentStageError(
+                        f"Orçamento atingido na tarefa '{pending[0] if pending else tasks_for_dev_crew[-1]}'; "
+                        f"tarefas não executadas: {pending[1:]}",
+                        outputs,
+                    )
+    except DevelopmentStageError as e:
+        _notify(progress_callback, "development", "failed", f"Erro na etapa de desenvolvimento: {e}")
+        raise
+    except Exception as e:
+        # Ex: limite de tempo do Celery durante a crew sequencial
+        _notify(progress_callback, "development", "failed", f"Erro na etapa de desenvolvimento: {e}")
+        raise DevelopmentStageError(str(e) or type(e).__name__, outputs) from e
+    _notify(progress_callback, "development", "finished", "Desenvolvimento concluído.")
+    return {**state, "development_outputs": outputs, "development_result": final_development_result}
+
+
+def build_status_update_context(state: dict):
+    """
+    Monta o contexto da tarefa de atualização de status dentro do orçamento de tokens:
+    código reduzido a nomes de arquivos e assinaturas e o status anterior como diferença em relação ao roteiro.
+    Retorna (contexto, relatório de tokens).
+    """
+    _, roadmap = get_roadmap_from_file(_project_paths(state).technologies_and_roadmap_spec)
+    fields, report = fit_fields_to_budget({
+        "planning_result_context": state["planning_result"],
+        "development_result_context": state["development_result"],
+        "completed_tasks_context": summarize_completed_items(state["current_completed_tasks"], roadmap),
+    })
+    return {**_run_context(state), **fields}, report
+
+
+def extract_status_locally(state: dict):
+    """
+    Extrai os itens concluídos sem LLM, comparando as tarefas executadas e suas saídas com o roteiro.
+    Retorna StatusExtraction (itens, confiança, evidência).
+    """
+    _, roadmap = get_roadmap_from_file(_project_paths(state).technologies_and_roadmap_spec)
+    return extract_completed_items(
+        roadmap,
+        PHASE_TO_TASKS,
+        state["tasks_for_dev_crew"],
+        state["development_outputs"],
+        state["development_result"],
+        state["current_completed_tasks"],
+    )
+
+
+def run_status_update_stage(state: dict, progress_callback=None):
+    """
+    Etapa 3: Atualizar o Status do Projeto.
+    No modo "auto" a extração local decide sozinha quando tem confiança suficiente;
+    só os casos duvidosos (e o modo "llm") passam pela crew de atualização de status.
+    Retorna (itens recém-concluídos, relatório com o método usado, a confiança e os tokens do contexto);
+    levanta json.JSONDecodeError ou StatusUpdateError se a saída do LLM não for uma lista JSON válida.
+    """
+    if STATUS_EXTRACTION_MODE != "llm":
+        with track_stage("status_update", "local"), span("stage", stage="status_update", method="local") as local_span:
+            extraction = extract_status_locally(state)
+            local_span.set_attribute("confidence", extraction.confidence)
+        if STATUS_EXTRACTION_MODE == "local" or extraction.confidence >= STATUS_EXTRACTION_MIN_CONFIDENCE:
+            _notify(progress_callback, "status_update", "finished", "Status atualizado pela extração local.",
+                    method="local", confidence=extraction.confidence)
+            return extraction.items, {"method": "local", "confidence": extraction.confidence, "evidence": extraction.evidence}
+        print(f"Extração local de status com confiança baixa ({extraction.confidence:.2f}); usando o LLM.")
+
+    newly_completed_items, context_report = run_status_update_crew(state, progress_callback)
+    return newly_completed_items, {"method": "llm", **context_report}
+
+
+def run_status_update_crew(state: dict, progress_callback=None):
+    """
+    Atualiza o status com a crew do Product Owner (uma chamada ao LLM).
+    Retorna (itens recém-concluídos, relatório de tokens do contexto); levanta json.JSONDecodeError
+    ou StatusUpdateError se a saída do LLM não for uma lista JSON válida.
+    """
+    # Cria a tarefa de atualização de status com os resultados desta execução
+    graph = build_crew_graph([], _run_context(state), paths=_project_paths(state))
+    product_owner = graph.agents["product_owner"]
+    status_context, context_report = build_status_update_context(state)
+    print(f"Contexto da atualização de status: {context_report['tokens_before']} -> {context_report['tokens_after']} tokens "
+          f"({context_report['tokens_saved']} economizados).")
+    update_project_status_task = graph.new_task("update_project_status_task", status_context)
 
     status_update_crew = Crew(
         agents=[product_owner],
@@ -182,41 +626,97 @@ def run_crew_process(user_input: str, current_completed_tasks: list):
     )
 
     status_update_result_str = "[]"
-    newly_completed_items = []
+    budget_stopped = False
+    checkpoint, cached_result = _load_task_checkpoint(
+        "update_project_status_task",
+        update_project_status_task.description,
+        task_input_files("update_project_status_task", _project_paths(state)),
+    )
 
+    _notify(progress_callback, "status_update", "started", "Atualização de status iniciada.")
     try:
-        # Tenta executar a tarefa de atualização de status
-        status_update_result_str = status_update_crew.kickoff()
+        # Tenta executar a tarefa de atualização de status (ou reaproveita a saída já validada)
+        if cached_result is not None:
+            status_update_result_str = cached_result
+        else:
+            with track_stage("status_update", "llm"):
+                output, budget_stopped = _traced_kickoff(status_update_crew, "status_update", ["update_project_status_task"])
+                status_update_result_str = str(output)
         
         # Tenta parsear a saída JSON
         parsed_result = json.loads(status_update_result_str)
         
-        if isinstance(parsed_result, list):
-            newly_completed_items = parsed_result
-        else:
+        if not isinstance(parsed_result, list):
             raise ValueError("O output do PO para atualização de status não é uma lista JSON válida.")
-    
     except json.JSONDecodeError as e:
+        _notify(progress_callback, "status_update", "failed", f"Erro de formato JSON na atualização de status: {e}")
         print(f"Erro ao decodificar JSON na atualização de status: {e}. Output bruto: {status_update_result_str}")
-        # Retorna erro, mas não falha todo o processo se desenvolvimento foi bem
-        return {
-            "error": f"Erro de formato JSON na atualização de status. Tente novamente ou ajuste a instrução. Detalhes: {e}",
-            "planning_result": planning_result,
-            "development_result": final_development_result,
-            "newly_completed_items": []
-        }
+        raise
     except Exception as e:
+        _notify(progress_callback, "status_update", "failed", f"Erro geral na atualização de status: {e}")
         print(f"Erro na etapa de atualização de status (não JSON): {e}. Resultado bruto: {status_update_result_str}")
-        return {
-            "error": f"Erro geral na atualização de status: {e}. Resultado bruto: {status_update_result_str}",
-            "planning_result": planning_result,
-            "development_result": final_development_result,
-            "newly_completed_items": []
-        }
+        raise StatusUpdateError(str(e), status_update_result_str) from e
+
+    # Só grava a saída depois de validada, para que uma resposta inválida seja gerada de novo
+    if cached_result is None and not budget_stopped:
+        _save_task_checkpoint(checkpoint, "update_project_status_task", status_update_result_str)
+    _notify(progress_callback, "status_update", "finished", "Atualização de status concluída.",
+            tokens_saved=context_report["tokens_saved"])
+    # O status anterior foi resumido no prompt; descarta itens que já estavam concluídos
+    already_completed = set(state["current_completed_tasks"])
+    return [item for item in parsed_result if item not in already_completed], context_report
+
 
+def build_run_results(state: dict, newly_completed_items: list, error: str = None, **extra) -> dict:
+    """Monta o dicionário de resultados de uma execução a partir do seu estado (com o consumo do orçamento da execução)."""
+    budget = current_run_budget()
+    if budget is not None:
+        extra = {"budget": budget.report(), **extra}
     return {
-        "planning_result": planning_result,
-        "development_result": final_development_result,
+        "planning_result": state["planning_result"],
+        "development_result": state["development_result"],
         "newly_completed_items": newly_completed_items,
-        "error": None
-    }
\ No newline at end of file
+        "error": error,
+        **extra
+    }
+
+
+def run_crew_process(user_input: str, current_completed_tasks: list, progress_callback=None, project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Executa o processo CrewAI com base na entrada do usuário e no status atual do projeto.
+    Retorna os resultados do planejamento, do desenvolvimento e os itens recém-concluídos.
+    Agentes e tarefas são criados a cada chamada, então execuções simultâneas não interferem entre si.
+    Se informado, progress_callback(stage, status, message, **detail) recebe os eventos de cada etapa.
+    """
+    with run_budget(project_id):
+        # --- Etapa 0: Processar Entrada do Usuário e Status ---
+        error_roadmap, state = prepare_run_state(user_input, current_completed_tasks, project_id)
+        if error_roadmap:
+            return error_roadmap # Return the error directly if roadmap loading fails
+
+        # --- Etapa 1: Orquestração e Geração do Plano de Desenvolvimento Detalhado ---
+        try:
+            state = run_planning_stage(state, progress_callback)
+        except Exception as e:
+            return {"error": f"Erro na etapa de planejamento: {e}", "planning_result": state["planning_result"], "development_result": "N/A", "newly_completed_items": []}
+
+        # --- Etapa 2: Executar as Tarefas de Desenvolvimento ---
+        try:
+            state = run_development_stage(state, progress_callback)
+        except DevelopmentStageError as e:
+            # Falha ou tempo esgotado: a execução termina com as saídas das tarefas que concluíram
+            return build_run_results(with_partial_development(state, e.partial_outputs), [], f"Erro na etapa de desenvolvimento: {e}")
+
+        # --- Etapa 3: Atualizar o Status do Projeto ---
+        try:
+            newly_completed_items, context_report = run_status_update_stage(state, progress_callback)
+        except json.JSONDecodeError as e:
+            # Retorna erro, mas não falha todo o processo se desenvolvimento foi bem
+            return build_run_results(state, [], f"Erro de formato JSON na atualização de status. Tente novamente ou ajuste a instrução. Detalhes: {e}")
+        except StatusUpdateError as e:
+            return build_run_results(state, [], f"Erro geral na atualização de status: {e}. Resultado bruto: {e.raw_output}")
+        except Exception as e:
+            # Ex: limite de tempo do Celery; planejamento e desenvolvimento já concluídos são entregues
+            return build_run_results(state, [], f"Erro na atualização de status: {str(e) or type(e).__name__}")
+
+        return build_run_results(state, newly_completed_items, status_update_context=context_report)
@@ -0,0 +1,337 @@
+import os
+import time
+from celery import chain, group
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import task_prerun, task_postrun, worker_process_init, worker_process_shutdown
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Tarefas Celery executadas pelos workers. Só este módulo (e o que ele importa) carrega o CrewAI;
+# o processo web enfileira as tarefas pelo nome (celery_app.py).
+from celery_app import celery, queue_for_priority
+from crew_orchestrator import (
+    run_crew_process,
+    prepare_run_state,
+    run_planning_stage,
+    run_development_task_stage,
+    run_status_update_stage,
+    development_task_levels,
+    combine_development_outputs,
+    build_run_results
+)
+from async_orchestrator import CREW_ENGINE, run_crew_process_on_loop
+from crew_config.llm_cache import get_cache_stats
+from crew_config.agents import reset_llm_model
+from crew_config.http_pool import get_pool_stats
+from crew_config.rate_limiter import llm_priority
+from progress_events import publish_progress
+from tracing import trace_run
+from metrics import CELERY_TASK_DURATION, CELERY_TASKS_IN_PROGRESS, mark_process_dead
+from run_coalescing import RUN_COALESCING_ENABLED, release_run
+from projects import DEFAULT_PROJECT_ID, get_project_paths, init_project
+from artifact_store import externalize_artifacts, externalize_results, inline_artifacts
+from run_store import (
+    start_run,
+    save_stage_output,
+    finish_run,
+    export_completed_items_json,
+    store_path
+)
+
+# Retentativas e limites de tempo (em segundos) das tarefas de etapa do modo "canvas"
+CREW_STAGE_MAX_RETRIES = int(os.getenv("CREW_STAGE_MAX_RETRIES", "3"))
+CREW_STAGE_RETRY_BACKOFF = int(os.getenv("CREW_STAGE_RETRY_BACKOFF", "30"))
+CREW_STAGE_RETRY_BACKOFF_MAX = int(os.getenv("CREW_STAGE_RETRY_BACKOFF_MAX", "600"))
+PLANNING_STAGE_TIME_LIMIT = int(os.getenv("PLANNING_STAGE_TIME_LIMIT", "900"))
+DEVELOPMENT_TASK_STAGE_TIME_LIMIT = int(os.getenv("DEVELOPMENT_TASK_STAGE_TIME_LIMIT", "1200"))
+STATUS_UPDATE_STAGE_TIME_LIMIT = int(os.getenv("STATUS_UPDATE_STAGE_TIME_LIMIT", "600"))
+# Folga entre o limite "soft" (a etapa termina limpa, com o que já produziu) e o "hard" (o processo é encerrado)
+CREW_HARD_TIME_LIMIT_MARGIN = int(os.getenv("CREW_HARD_TIME_LIMIT_MARGIN", "60"))
+# Limite da execução inteira no modo de tarefa única (run_crew_task)
+CREW_RUN_SOFT_TIME_LIMIT = int(os.getenv("CREW_RUN_SOFT_TIME_LIMIT", "3600"))
+
+# --- Métricas das tarefas Celery (duração e tarefas em execução) ---
+_celery_task_started = {}
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, **kwargs):
+    _celery_task_started[task_id] = time.perf_counter()
+    CELERY_TASKS_IN_PROGRESS.labels(task=task.name).inc()
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _celery_task_started.pop(task_id, None)
+    CELERY_TASKS_IN_PROGRESS.labels(task=task.name).dec()
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task=task.name, state=state or "UNKNOWN").observe(time.perf_counter() - started)
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs):
+    # Cada processo filho (pool prefork) cria seu próprio cliente HTTP com pool keep-alive,
+    # reaproveitado por todas as tarefas e execuções deste processo
+    reset_llm_model()
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
+
+
+def export_project_status(project_id: str = DEFAULT_PROJECT_ID):
+    """Reexporta, a partir do histórico, o arquivo JSON de status do projeto lido pelas ferramentas de arquivo dos agentes."""
+    try:
+        status_path = get_project_paths(project_id).project_status
+        export_completed_items_json(status_path, project_id)
+        print(f"Status do projeto '{project_id}' exportado para '{status_path}'.")
+    except Exception as e:
+        print(f"Erro ao exportar o status atualizado do projeto: {e}")
+
+def save_last_run_results(run_id: str, results: dict, user_input: str = None, project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Conclui a execução no histórico: saídas das etapas, itens concluídos e status em uma única transação.
+    Se a execução concluiu itens, o arquivo JSON de status é reexportado depois da transação.
+    """
+    try:
+        finish_run(run_id, results, project_id, user_input=user_input)
+        print(f"Resultados da execução {run_id} salvos em '{store_path(project_id)}'.")
+    except Exception as e:
+        print(f"Erro ao salvar os resultados da última execução: {e}")
+        return
+    if results.get("newly_completed_items"):
+        export_project_status(project_id)
+
+def _progress_reporter(celery_task, run_id: str):
+    """Cria o callback de progresso que publica eventos da execução `run_id` e atualiza seu estado no Celery."""
+    def report_progress(stage, status, message="", **detail):
+        publish_progress(run_id, stage, status, message, **detail)
+        celery_task.update_state(task_id=run_id, state='PROGRESS', meta={'status': message, 'stage': stage, 'stage_status': status})
+    return report_progress
+
+
+def _release_coalesced_run(run_id: str):
+    """Libera a instrução da execução para novos envios; falhas no Redis não interrompem a finalização."""
+    if not RUN_COALESCING_ENABLED:
+        return
+    try:
+        release_run(run_id)
+    except Exception as e:
+        print(f"Erro ao liberar a execução {run_id} para novos envios: {e}")
+
+
+def _inline_state(state: dict) -> dict:
+    """Estado com o código dos artefatos de volta no texto: as tarefas e o LLM trabalham sobre o conteúdo completo."""
+    return {
+        **state,
+        "development_outputs": {name: inline_artifacts(output) for name, output in state["development_outputs"].items()},
+        "development_result": inline_artifacts(state["development_result"]),
+    }
+
+
+def _finish_run(run_id: str, results: dict, current_completed_tasks: list, report_progress, project_id: str = DEFAULT_PROJECT_ID):
+    """Atualiza o status do projeto, salva os resultados e publica o evento final da execução."""
+    # O código gerado vai para o armazenamento de artefatos; resultado e histórico guardam só as referências
+    results = externalize_results(results)
+    if results.get("newly_completed_items"):
+        updated_completed_tasks = list(set(current_completed_tasks + results["newly_completed_items"]))
+        results["current_completed_tasks_after_run"] = updated_completed_tasks # Adiciona para o log
+    else:
+        results["current_completed_tasks_after_run"] = current_completed_tasks
+
+    # Salva o resultado completo da execução e os itens concluídos, e atualiza o arquivo de status do projeto
+    save_last_run_results(run_id, results, project_id=project_id)
+
+    print(f"Tarefa CrewAI concluída. Resultados salvos.")
+    print(f"Cache do LLM (hits/misses por agente): {get_cache_stats()}")
+    print(f"Conexões HTTP com o LLM neste processo (reaproveitadas/novas): {get_pool_stats()}")
+    _release_coalesced_run(run_id)
+    if results.get("error"):
+        report_progress("run", "failed", results["error"])
+    else:
+        report_progress("run", "finished", "Processo CrewAI concluído.")
+    return results
+
+
+@celery.task(bind=True, soft_time_limit=CREW_RUN_SOFT_TIME_LIMIT, time_limit=CREW_RUN_SOFT_TIME_LIMIT + CREW_HARD_TIME_LIMIT_MARGIN)
+def run_crew_task(self, user_input: str, current_completed_tasks: list, priority: str = "interactive",
+                  project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Tarefa Celery para executar o processo da CrewAI em segundo plano.
+    Publica eventos de progresso de cada etapa e salva os resultados em um arquivo após a conclusão.
+    `priority` ("interactive" ou "batch") define a prioridade das chamadas ao LLM no limitador de taxa.
+    `project_id` escolhe os arquivos de especificação e de status e o shard do histórico da execução.
+    Ao atingir o limite "soft", a execução termina como falha, com os resultados parciais que já existirem.
+    """
+    report_progress = _progress_reporter(self, self.request.id)
+
+    print(f"Iniciando tarefa CrewAI do projeto '{project_id}' com input: {user_input}")
+    init_project(project_id)
+    start_run(self.request.id, user_input, project_id)
+    report_progress("run", "started", "Processo CrewAI iniciado.")
+
+    try:
+        # No motor "async", as execuções deste processo compartilham um event loop (ver async_orchestrator.py)
+        run_process = run_crew_process_on_loop if CREW_ENGINE == "async" else run_crew_process
+        with llm_priority(priority), trace_run(self.request.id, "run_crew_task", project_id=project_id, priority=priority, engine=CREW_ENGINE):
+            results = run_process(user_input, current_completed_tasks, progress_callback=report_progress, project_id=project_id)
+    except SoftTimeLimitExceeded:
+        # As etapas já tratam o limite com resultados parciais; aqui só chega o que escapou delas (ex: motor async)
+        results = {
+            "planning_result": "N/A",
+            "development_result": "N/A",
+            "newly_completed_items": [],
+            "error": f"Tempo limite de {CREW_RUN_SOFT_TIME_LIMIT}s da execução esgotado.",
+        }
+    except Exception as e:
+        # Conclui a execução no histórico como falha, para que ela não fique "running" para sempre
+        save_last_run_results(self.request.id, {
+            "planning_result": None,
+            "development_result": None,
+            "newly_completed_items": [],
+            "error": f"Erro inesperado no processo CrewAI: {e}",
+        }, project_id=project_id)
+        _release_coalesced_run(self.request.id)
+        report_progress("run", "failed", f"Erro inesperado no processo CrewAI: {e}")
+        raise
+
+    return _finish_run(self.request.id, results, current_completed_tasks, report_progress, project_id)
+
+
+# --- Pipeline em etapas (CREW_PIPELINE_MODE=canvas) ---
+# planejamento -> desenvolvimento (um grupo de tarefas por nível do DAG, distribuído entre os workers)
+# -> atualização de status -> finalização. Cada etapa tem suas próprias retentativas e limites de tempo;
+# o estado da execução (dicionário JSON) é passado de uma etapa para a seguinte.
+
+def _retry_or_fail(celery_task, state: dict, exc: Exception, error_message: str) -> dict:
+    """
+    Reagenda a etapa com backoff exponencial enquanto houver retentativas.
+    Esgotadas as retentativas (ou se a etapa estourou o tempo limite, que não é repetida),
+    marca o estado com o erro para que as etapas seguintes apenas o repassem, junto com as saídas já prontas.
+    """
+    if isinstance(exc, SoftTimeLimitExceeded):
+        return {**state, "error": f"{error_message} (tempo limite da etapa esgotado)"}
+    retries = celery_task.request.retries
+    if retries < celery_task.max_retries:
+        countdown = min(CREW_STAGE_RETRY_BACKOFF * (2 ** retries), CREW_STAGE_RETRY_BACKOFF_MAX)
+        raise celery_task.retry(exc=exc, countdown=countdown)
+    return {**state, "error": error_message}
+
+
+@celery.task(bind=True, max_retries=CREW_STAGE_MAX_RETRIES,
+             soft_time_limit=PLANNING_STAGE_TIME_LIMIT, time_limit=PLANNING_STAGE_TIME_LIMIT + CREW_HARD_TIME_LIMIT_MARGIN)
+def plan_stage_task(self, user_input: str, current_completed_tasks: list, run_id: str, priority: str = "interactive",
+                    project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Etapa de planejamento do pipeline em etapas. `priority` e `project_id` ficam no estado: as etapas seguintes
+    vão para a fila correspondente, usam a mesma prioridade no limitador de taxa do LLM e os arquivos do projeto.
+    """
+    report_progress = _progress_reporter(self, run_id)
+    if self.request.retries == 0:
+        print(f"Iniciando pipeline CrewAI {run_id} do projeto '{project_id}' com input: {user_input}")
+        init_project(project_id)
+        start_run(run_id, user_input, project_id)
+        report_progress("run", "started", "Processo CrewAI iniciado.")
+
+    error_roadmap, state = prepare_run_state(user_input, current_completed_tasks, project_id)
+    if error_roadmap:
+        return {
+            "project_id": project_id,
+            "current_completed_tasks": list(current_completed_tasks),
+            "tasks_for_dev_crew": [],
+            "planning_result": "N/A",
+            "development_result": "N/A",
+            "error": error_roadmap["error"],
+            "priority": priority,
+        }
+    state["priority"] = priority
+    try:
+        with llm_priority(priority), trace_run(run_id, "plan_stage_task", project_id=project_id, attempt=self.request.retries):
+            state = run_planning_stage(state, report_progress)
+    except Exception as e:
+        return _retry_or_fail(self, state, e, f"Erro na etapa de planejamento: {e}")
+    save_stage_output(run_id, "planning", state["planning_result"], project_id)
+    return state
+
+
+@celery.task(bind=True)
+def development_dispatch_task(self, state: dict, run_id: str):
+    """
+    Substitui-se pelo restante do pipeline: um grupo de tarefas de desenvolvimento por nível do DAG,
+    seguido da atualização de status e da finalização (que herda o id desta tarefa, o run_id).
+    """
+    # Todas as etapas da execução ficam na fila escolhida pelo web (interativa ou bulk)
+    options = {"queue": queue_for_priority(state.get("priority", "interactive"))}
+    finalize = finalize_run_task.s(
+        run_id, state["current_completed_tasks"], state.get("project_id", DEFAULT_PROJECT_ID)
+    ).set(**options)
+    levels = [] if state.get("error") else development_task_levels(state["tasks_for_dev_crew"])
+    if not levels:
+        raise self.replace(chain(status_update_stage_task.s(state, run_id).set(**options), finalize))
+
+    publish_progress(run_id, "development", "started", "Desenvolvimento iniciado.", tasks=state["tasks_for_dev_crew"])
+    steps = []
+    for index, level in enumerate(levels):
+        if index == 0:
+            steps.append(group(development_task_stage_task.s(state, name, run_id).set(**options) for name in level))
+        else:
+            steps.append(group(development_task_stage_task.s(name, run_id).set(**options) for name in level))
+        steps.append(merge_development_outputs_task.s(run_id, index == len(levels) - 1).set(**options))
+    raise self.replace(chain(*steps, status_update_stage_task.s(run_id).set(**options), finalize))
+
+
+@celery.task(bind=True, max_retries=CREW_STAGE_MAX_RETRIES,
+             soft_time_limit=DEVELOPMENT_TASK_STAGE_TIME_LIMIT, time_limit=DEVELOPMENT_TASK_STAGE_TIME_LIMIT + CREW_HARD_TIME_LIMIT_MARGIN)
+def development_task_stage_task(self, state: dict, task_name: str, run_id: str):
+    """Executa uma tarefa de desenvolvimento; qualquer worker livre pode pegá-la."""
+    if state.get("error"):
+        return state
+    try:
+        with llm_priority(state.get("priority", "interactive")), \
+                trace_run(run_id, "development_task_stage_task", task=task_name, attempt=self.request.retries):
+            output = run_development_task_stage(_inline_state(state), task_name, _progress_reporter(self, run_id))
+    except Exception as e:
+        return _retry_or_fail(self, state, e, f"Erro na etapa de desenvolvimento ({task_name}): {e}")
+    # Entre as tarefas do pipeline (backend do Celery) a saída trafega só com as referências aos artefatos
+    output, artifacts = externalize_artifacts(output, task_name)
+    save_stage_output(run_id, f"development:{task_name}", output, state.get("project_id", DEFAULT_PROJECT_ID), artifacts)
+    return {**state, "development_outputs": {**state["development_outputs"], task_name: output}}
+
+
+@celery.task
+def merge_development_outputs_task(states: list, run_id: str, last_level: bool):
+    """Junta os estados retornados pelas tarefas de um nível do DAG em um único estado."""
+    merged = dict(states[0])
+    outputs = {}
+    for state in states:
+        outputs.update(state["development_outputs"])
+        if state.get("error") and not merged.get("error"):
+            merged["error"] = state["error"]
+    merged["development_outputs"] = outputs
+    merged["development_result"] = combine_development_outputs(merged["tasks_for_dev_crew"], outputs)
+    if merged.get("error"):
+        publish_progress(run_id, "development", "failed", merged["error"])
+    elif last_level:
+        publish_progress(run_id, "development", "finished", "Desenvolvimento concluído.")
+    return merged
+
+
+@celery.task(bind=True, max_retries=CREW_STAGE_MAX_RETRIES,
+             soft_time_limit=STATUS_UPDATE_STAGE_TIME_LIMIT, time_limit=STATUS_UPDATE_STAGE_TIME_LIMIT + CREW_HARD_TIME_LIMIT_MARGIN)
+def status_update_stage_task(self, state: dict, run_id: str):
+    """Etapa de atualização de status; só ela é repetida se a saída do LLM não for uma lista JSON."""
+    if state.get("error"):
+        return build_run_results(state, [], state["error"])
+    try:
+        with llm_priority(state.get("priority", "interactive")), \
+                trace_run(run_id, "status_update_stage_task", attempt=self.request.retries):
+            newly_completed_items, context_report = run_status_update_stage(_inline_state(state), _progress_reporter(self, run_id))
+    except Exception as e:
+        failed_state = _retry_or_fail(self, state, e, f"Erro na atualização de status: {e}")
+        return externalize_results(build_run_results(failed_state, [], failed_state["error"]))
+    return externalize_results(build_run_results(state, newly_completed_items, status_update_context=context_report))
+
+
+@celery.task(bind=True)
+def finalize_run_task(self, results: dict, run_id: str, current_completed_tasks: list, project_id: str = DEFAULT_PROJECT_ID):
+    """Última etapa do pipeline: salva status e resultados e publica o evento final."""
+    return _finish_run(run_id, results, current_completed_tasks, _progress_reporter(self, run_id), project_id)
@@ -0,0 +1,195 @@
+import os
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    CONTENT_TYPE_LATEST,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Com vários processos (web + workers Celery na mesma máquina/volume), cada processo grava suas métricas
+# neste diretório e o /metrics do Flask agrega todas. Sem ele, /metrics mostra só as do próprio processo.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Filas do broker cuja profundidade é exposta em /metrics
+METRICS_CELERY_QUEUES = [queue.strip() for queue in os.getenv("METRICS_CELERY_QUEUES", "crew_interactive,crew_bulk").split(",") if queue.strip()]
+
+# Buckets pensados para chamadas de LLM e etapas da crew (de segundos a dezenas de minutos)
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, float("inf"))
+
+STAGE_DURATION = Histogram(
+    "crew_stage_duration_seconds",
+    "Duração de cada etapa do processo CrewAI (planejamento, cada tarefa de desenvolvimento, atualização de status).",
+    ["stage", "task"],
+    buckets=DURATION_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "crew_stage_errors_total",
+    "Etapas do processo CrewAI que terminaram com erro.",
+    ["stage", "task"],
+)
+LLM_CALLS = Counter(
+    "crew_llm_calls_total",
+    "Chamadas ao LLM por agente.",
+    ["agent"],
+)
+LLM_CALL_DURATION = Histogram(
+    "crew_llm_call_duration_seconds",
+    "Latência das chamadas ao LLM por agente.",
+    ["agent"],
+    buckets=DURATION_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "crew_llm_tokens_total",
+    "Tokens consumidos por agente (kind=prompt|completion).",
+    ["agent", "kind"],
+)
+LLM_ERRORS = Counter(
+    "crew_llm_errors_total",
+    "Chamadas ao LLM que falharam, por agente.",
+    ["agent"],
+)
+TOOL_CALLS = Counter(
+    "crew_tool_calls_total",
+    "Chamadas de ferramentas (leitura/escrita de arquivos) por agente.",
+    ["agent", "tool"],
+)
+LLM_HTTP_CONNECTIONS = Counter(
+    "crew_llm_http_connections_total",
+    "Requisições ao LLM que reaproveitaram uma conexão do pool (result=hit) ou abriram uma nova (result=miss).",
+    ["result"],
+)
+LLM_RATE_LIMIT_WAIT = Histogram(
+    "crew_llm_rate_limit_wait_seconds",
+    "Tempo de espera no limitador de taxa compartilhado antes de cada chamada ao LLM, por prioridade.",
+    ["priority"],
+    buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float("inf")),
+)
+LLM_RATE_LIMITED_RESPONSES = Counter(
+    "crew_llm_rate_limited_responses_total",
+    "Respostas 429/503 do provedor do LLM.",
+    ["status"],
+)
+BUDGET_EXCEEDED = Counter(
+    "crew_budget_exceeded_total",
+    "Tarefas e execuções interrompidas por orçamento (scope=task|run; limit=delegations, iterations, tokens, seconds ou delegation_cycle).",
+    ["scope", "limit"],
+)
+DELEGATIONS = Counter(
+    "crew_delegations_total",
+    "Delegações e perguntas entre agentes (de -> para).",
+    ["agent", "coworker"],
+)
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Duração das tarefas Celery, por nome e estado final.",
+    ["task", "state"],
+    buckets=DURATION_BUCKETS,
+)
+CELERY_TASKS_IN_PROGRESS = Gauge(
+    "celery_tasks_in_progress",
+    "Tarefas Celery em execução nos workers.",
+    ["task"],
+    multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def track_stage(stage: str, task: str = ""):
+    """Mede a duração de uma etapa e conta os erros (a exceção é propagada)."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage=stage, task=task).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(stage=stage, task=task).observe(time.perf_counter() - start)
+
+
+def record_tool_call(agent: str, tool: str):
+    TOOL_CALLS.labels(agent=agent, tool=tool).inc()
+
+
+def record_llm_call(agent: str, duration: float, prompt_tokens: int = 0, completion_tokens: int = 0):
+    LLM_CALLS.labels(agent=agent).inc()
+    LLM_CALL_DURATION.labels(agent=agent).observe(duration)
+    if prompt_tokens:
+        LLM_TOKENS.labels(agent=agent, kind="prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(agent=agent, kind="completion").inc(completion_tokens)
+
+
+def record_llm_error(agent: str):
+    LLM_ERRORS.labels(agent=agent).inc()
+
+
+class CeleryQueueDepthCollector:
+    """Lê a profundidade das filas do broker Redis (LLEN) no momento da coleta."""
+
+    def __init__(self, broker_url: str, queues: list = None):
+        self.broker_url = broker_url
+        self.queues = queues or METRICS_CELERY_QUEUES
+        self._redis = None
+
+    def collect(self):
+        gauge = GaugeMetricFamily("celery_queue_depth", "Mensagens aguardando em cada fila do broker.", labels=["queue"])
+        try:
+            if self._redis is None:
+                import redis
+                self._redis = redis.Redis.from_url(self.broker_url, socket_timeout=2)
+            pipe = self._redis.pipeline()
+            for queue in self.queues:
+                pipe.llen(queue)
+            for queue, depth in zip(self.queues, pipe.execute()):
+                gauge.add_metric([queue], depth)
+        except Exception as e:
+            print(f"Erro ao ler a profundidade das filas do Celery: {e}")
+        yield gauge
+
+
+class _RegistryCollector:
+    """Expõe as métricas de outro registro, para combiná-lo com coletores extras sem registrá-los globalmente."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def collect(self):
+        return self.registry.collect()
+
+
+def _scrape_registry():
+    """Registro usado em /metrics: o agregado dos processos (modo multiprocesso) ou o do próprio processo."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics(extra_collectors: tuple = ()):
+    """Retorna (corpo, content-type) no formato de exposição do Prometheus."""
+    registry = _scrape_registry()
+    if extra_collectors:
+        combined = CollectorRegistry(auto_describe=False)
+        combined.register(_RegistryCollector(registry))
+        for collector in extra_collectors:
+            combined.register(collector)
+        registry = combined
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Remove os arquivos de gauges "live" de um processo encerrado (modo multiprocesso)."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import redis
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Eventos de progresso usam o mesmo Redis do Celery por padrão
+PROGRESS_REDIS_URL = os.getenv("PROGRESS_REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+# Por quanto tempo o histórico de eventos de uma tarefa fica disponível para novos assinantes
+PROGRESS_EVENTS_TTL_SECONDS = int(os.getenv("PROGRESS_EVENTS_TTL_SECONDS", "3600"))
+# Intervalo máximo sem mensagens antes de enviar um keepalive ao navegador
+PROGRESS_KEEPALIVE_SECONDS = int(os.getenv("PROGRESS_KEEPALIVE_SECONDS", "15"))
+
+# Estágio/status que encerram o stream de uma tarefa
+TERMINAL_STATUSES = ("finished", "failed")
+
+_redis_client = None
+
+
+def get_redis():
+    """Retorna o cliente Redis compartilhado pelo processo."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(PROGRESS_REDIS_URL, decode_responses=True)
+    return _redis_client
+
+
+def _channel(task_id: str) -> str:
+    return f"crew_progress:{task_id}"
+
+
+def _history_key(task_id: str) -> str:
+    return f"crew_progress:{task_id}:history"
+
+
+def _sequence_key(task_id: str) -> str:
+    return f"crew_progress:{task_id}:seq"
+
+
+def is_terminal_event(event: dict) -> bool:
+    """Indica se o evento encerra a execução (estágio 'run' finalizado ou com falha)."""
+    return event.get("stage") == "run" and event.get("status") in TERMINAL_STATUSES
+
+
+def publish_progress(task_id: str, stage: str, status: str, message: str = "", **detail):
+    """
+    Publica um evento de progresso da tarefa via Redis pub/sub.
+    O evento também é guardado em um histórico com TTL, para quem se inscrever depois.
+    """
+    client = get_redis()
+    event = {
+        "seq": client.incr(_sequence_key(task_id)),
+        "task_id": task_id,
+        "stage": stage,
+        "status": status,
+        "message": message,
+        "timestamp": time.time(),
+        **detail,
+    }
+    payload = json.dumps(event)
+    pipe = client.pipeline()
+    pipe.rpush(_history_key(task_id), payload)
+    pipe.expire(_history_key(task_id), PROGRESS_EVENTS_TTL_SECONDS)
+    pipe.expire(_sequence_key(task_id), PROGRESS_EVENTS_TTL_SECONDS)
+    pipe.publish(_channel(task_id), payload)
+    pipe.execute()
+    return event
+
+
+def iter_progress_events(task_id: str):
+    """
+    Gera os eventos de progresso da tarefa: primeiro o histórico, depois os novos em tempo real.
+    Gera None a cada PROGRESS_KEEPALIVE_SECONDS sem eventos e termina no evento final da execução.
+    """
+    client = get_redis()
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    # Inscreve antes de ler o histórico para não perder eventos publicados entre as duas etapas
+    pubsub.subscribe(_channel(task_id))
+    try:
+        last_seq = 0
+        for payload in client.lrange(_history_key(task_id), 0, -1):
+            event = json.loads(payload)
+            last_seq = event["seq"]
+            yield event
+            if is_terminal_event(event):
+                return
+
+        while True:
+            message = pubsub.get_message(timeout=PROGRESS_KEEPALIVE_SECONDS)
+            if message is None:
+                yield None
+                continue
+            event = json.loads(message["data"])
+            if event["seq"] <= last_seq:
+                continue
+            last_seq = event["seq"]
+            yield event
+            if is_terminal_event(event):
+                return
+    finally:
+        pubsub.close()
@@ -0,0 +1,104 @@
+import os
+import re
+import json
+import shutil
+from typing import NamedTuple
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Projeto usado quando nenhum é informado: continua lendo os caminhos do .env, como antes do modo multiprojeto
+DEFAULT_PROJECT_ID = "default"
+# Os demais projetos ficam em PROJECTS_DIR/<id>/, cada um com seus arquivos de especificação e de status
+PROJECTS_DIR = os.getenv("PROJECTS_DIR", "projects")
+
+PROJECT_STATUS_PATH = os.getenv("PROJECT_STATUS_PATH")
+TECHNOLOGIES_AND_ROADMAP_SPEC_PATH = os.getenv("TECHNOLOGIES_AND_ROADMAP_SPEC_PATH")
+SYSTEM_FLOW_SPEC_PATH = os.getenv("SYSTEM_FLOW_SPEC_PATH")
+DER_SPEC_PATH = os.getenv("DER_SPEC_PATH")
+
+_PROJECT_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+
+class ProjectPaths(NamedTuple):
+    """Arquivos de um projeto: status lido/escrito pelos agentes, especificações e diretório de trabalho."""
+    project_id: str
+    project_status: str
+    technologies_and_roadmap_spec: str
+    system_flow_spec: str
+    der_spec: str
+    workspace: str
+
+
+def validate_project_id(project_id: str) -> str:
+    """Retorna o id se ele for válido (letras, números, '-' e '_', até 64 caracteres); senão levanta ValueError."""
+    if not project_id or not _PROJECT_ID_PATTERN.fullmatch(project_id):
+        raise ValueError(f"Id de projeto inválido: {project_id!r}. Use letras, números, '-' e '_' (até 64 caracteres).")
+    return project_id
+
+
+def get_project_paths(project_id: str = DEFAULT_PROJECT_ID) -> ProjectPaths:
+    """Caminhos dos arquivos do projeto. O projeto padrão usa os caminhos do .env."""
+    project_id = validate_project_id(project_id or DEFAULT_PROJECT_ID)
+    if project_id == DEFAULT_PROJECT_ID:
+        return ProjectPaths(
+            project_id=project_id,
+            project_status=PROJECT_STATUS_PATH,
+            technologies_and_roadmap_spec=TECHNOLOGIES_AND_ROADMAP_SPEC_PATH,
+            system_flow_spec=SYSTEM_FLOW_SPEC_PATH,
+            der_spec=DER_SPEC_PATH,
+            workspace="./",
+        )
+    workspace = os.path.join(PROJECTS_DIR, project_id)
+    return ProjectPaths(
+        project_id=project_id,
+        project_status=os.path.join(workspace, "project_status.json"),
+        technologies_and_roadmap_spec=os.path.join(workspace, "project_spec", "technologies_and_roadmap.md"),
+        system_flow_spec=os.path.join(workspace, "project_spec", "system_flow.md"),
+        der_spec=os.path.join(workspace, "project_spec", "der_documentation.md"),
+        workspace=workspace,
+    )
+
+
+def project_exists(project_id: str) -> bool:
+    """O projeto já foi criado (init_project)? O projeto padrão sempre existe. Levanta ValueError se o id for inválido."""
+    paths = get_project_paths(project_id)
+    return paths.project_id == DEFAULT_PROJECT_ID or os.path.isdir(paths.workspace)
+
+
+def init_project(project_id: str) -> ProjectPaths:
+    """
+    Cria os arquivos que faltarem no projeto: as especificações são copiadas do projeto padrão
+    (para serem editadas depois) e o status começa vazio. Arquivos existentes não são alterados.
+    """
+    paths = get_project_paths(project_id)
+    if paths.project_id == DEFAULT_PROJECT_ID:
+        return paths
+    defaults = get_project_paths(DEFAULT_PROJECT_ID)
+    for source, target in (
+        (defaults.technologies_and_roadmap_spec, paths.technologies_and_roadmap_spec),
+        (defaults.system_flow_spec, paths.system_flow_spec),
+        (defaults.der_spec, paths.der_spec),
+    ):
+        if not os.path.exists(target) and source and os.path.exists(source):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+    if not os.path.exists(paths.project_status):
+        os.makedirs(paths.workspace, exist_ok=True)
+        with open(paths.project_status, 'w', encoding='utf-8') as f:
+            json.dump({"completed_items": []}, f, indent=2)
+    return paths
+
+
+if __name__ == "__main__":
+    # Cria um projeto antes da primeira visita à página: python projects.py <id>
+    import sys
+
+    if len(sys.argv) != 2:
+        sys.exit("Uso: python projects.py <id-do-projeto>")
+    try:
+        created = init_project(sys.argv[1])
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"Projeto '{created.project_id}' pronto em '{created.workspace}'; edite as especificações em project_spec/.")
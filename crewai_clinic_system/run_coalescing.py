@@ -0,0 +1,84 @@
+import os
+import re
+import json
+import hashlib
+from dotenv import load_dotenv
+
+from progress_events import get_redis
+from projects import DEFAULT_PROJECT_ID
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Envios idênticos (mesma instrução e mesmo status do projeto) acompanham a execução já em andamento
+RUN_COALESCING_ENABLED = os.getenv("RUN_COALESCING_ENABLED", "true").lower() in ("1", "true", "yes")
+# Validade da marcação de execução em andamento; cobre execuções que morreram sem liberá-la
+RUN_COALESCING_TTL_SECONDS = int(os.getenv("RUN_COALESCING_TTL_SECONDS", "10800"))
+
+# Apaga a chave só se ela ainda apontar para a execução informada
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# Troca a execução da chave só se ela ainda apontar para a execução antiga (já encerrada)
+_REPLACE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+def normalize_user_input(user_input: str) -> str:
+    """Ignora maiúsculas e espaços extras; listas de fases ("1, 2,3") ficam sem espaços ("1,2,3")."""
+    text = " ".join((user_input or "").split()).casefold()
+    if re.fullmatch(r"[\d\s,]+", text):
+        text = ",".join(part.strip() for part in text.split(",") if part.strip())
+    return text
+
+
+def coalescing_key(user_input: str, completed_items: list, project_id: str = DEFAULT_PROJECT_ID) -> str:
+    """Chave da execução: projeto + instrução normalizada + hash do conjunto de itens concluídos."""
+    completed_hash = hashlib.sha256(json.dumps(sorted(set(completed_items)), ensure_ascii=False).encode("utf-8")).hexdigest()
+    digest = hashlib.sha256(f"{project_id}\0{normalize_user_input(user_input)}\0{completed_hash}".encode("utf-8")).hexdigest()
+    return f"crew_inflight:{digest}"
+
+
+def _run_key(run_id: str) -> str:
+    return f"crew_inflight_run:{run_id}"
+
+
+def claim_run(user_input: str, completed_items: list, run_id: str, is_stale=None, project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Tenta registrar `run_id` como a execução em andamento para esta instrução e status do projeto.
+    Retorna None se o registro foi feito (a execução deve ser enfileirada) ou o id da execução
+    idêntica já em andamento. `is_stale(id)` permite descartar uma marcação cuja execução já terminou.
+    """
+    redis_client = get_redis()
+    key = coalescing_key(user_input, completed_items, project_id)
+    for _ in range(3):
+        if redis_client.set(key, run_id, nx=True, ex=RUN_COALESCING_TTL_SECONDS):
+            redis_client.set(_run_key(run_id), key, ex=RUN_COALESCING_TTL_SECONDS)
+            return None
+        existing = redis_client.get(key)
+        if existing is None:
+            continue # Expirou entre o SET e o GET; tenta de novo
+        if is_stale is not None and is_stale(existing):
+            if redis_client.eval(_REPLACE_SCRIPT, 1, key, existing, run_id, RUN_COALESCING_TTL_SECONDS):
+                redis_client.set(_run_key(run_id), key, ex=RUN_COALESCING_TTL_SECONDS)
+                return None
+            continue
+        return existing
+    return None
+
+
+def release_run(run_id: str):
+    """Remove a marcação de execução em andamento de `run_id` (chamada quando a execução termina)."""
+    redis_client = get_redis()
+    key = redis_client.get(_run_key(run_id))
+    if key:
+        redis_client.eval(_RELEASE_SCRIPT, 1, key, run_id)
+    redis_client.delete(_run_key(run_id))
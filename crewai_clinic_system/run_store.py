@@ -0,0 +1,364 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import zlib
+import threading
+from dotenv import load_dotenv
+
+from projects import DEFAULT_PROJECT_ID
+from artifact_store import list_artifact_references
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Banco SQLite (modo WAL) com o histórico de execuções, saídas por etapa e itens concluídos
+RUN_STORE_PATH = os.getenv("RUN_STORE_PATH", "run_history.sqlite3")
+# Com vários projetos, o histórico é dividido em RUN_STORE_SHARDS bancos (escolhido pelo id do projeto),
+# para que as escritas de projetos diferentes não disputem o mesmo arquivo. 1 mantém um único banco.
+RUN_STORE_SHARDS = int(os.getenv("RUN_STORE_SHARDS", "1"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    user_input TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_project_created ON runs(project_id, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS stage_outputs (
+    run_id TEXT NOT NULL REFERENCES runs(id),
+    stage TEXT NOT NULL,
+    output TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (run_id, stage)
+);
+
+-- Artefatos referenciados por cada execução: a página só serve artefatos do próprio projeto
+CREATE TABLE IF NOT EXISTS run_artifacts (
+    run_id TEXT NOT NULL REFERENCES runs(id),
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (run_id, sha256)
+);
+CREATE INDEX IF NOT EXISTS idx_run_artifacts_sha256 ON run_artifacts(sha256);
+
+CREATE TABLE IF NOT EXISTS completed_items (
+    project_id TEXT NOT NULL,
+    item TEXT NOT NULL,
+    run_id TEXT,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (project_id, item)
+);
+"""
+
+def store_path(project_id: str = DEFAULT_PROJECT_ID) -> str:
+    """Banco (shard) que guarda o histórico do projeto. O projeto padrão fica sempre em RUN_STORE_PATH."""
+    if RUN_STORE_SHARDS <= 1 or project_id == DEFAULT_PROJECT_ID:
+        return RUN_STORE_PATH
+    root, ext = os.path.splitext(RUN_STORE_PATH)
+    return f"{root}.{zlib.crc32(project_id.encode('utf-8')) % RUN_STORE_SHARDS:03d}{ext}"
+
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _connect(path: str = None) -> sqlite3.Connection:
+    """Retorna a conexão desta thread com o banco (uma por thread e por arquivo)."""
+    path = path or RUN_STORE_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        with _schema_lock:
+            if path not in _schema_ready:
+                had_run_artifacts = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'run_artifacts'"
+                ).fetchone()
+                conn.executescript(SCHEMA)
+                if not had_run_artifacts:
+                    _backfill_run_artifacts(conn)
+                _schema_ready.add(path)
+        connections[path] = conn
+    return conn
+
+
+class _transaction:
+    """Transação explícita (BEGIN IMMEDIATE ... COMMIT/ROLLBACK) na conexão da thread."""
+
+    def __init__(self, path: str = None):
+        self.conn = _connect(path)
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.conn.execute("ROLLBACK")
+            return False
+        try:
+            self.conn.execute("COMMIT")
+        except Exception:
+            # Ex: SQLITE_BUSY após o timeout; sem o ROLLBACK a conexão da thread ficaria presa na transação aberta
+            self.conn.execute("ROLLBACK")
+            raise
+        return False
+
+
+def _backfill_run_artifacts(conn: sqlite3.Connection):
+    """Preenche run_artifacts (uma única vez, na criação da tabela) a partir das saídas já gravadas no histórico."""
+    rows = conn.execute(
+        "SELECT run_id, stage, output FROM stage_outputs WHERE stage = 'artifacts' OR stage LIKE 'development%'"
+    ).fetchall()
+    references = set()
+    for row in rows:
+        if row["stage"] == "artifacts":
+            try:
+                artifacts = json.loads(row["output"] or "[]")
+            except json.JSONDecodeError:
+                continue
+        else:
+            artifacts = list_artifact_references(row["output"])
+        references.update((row["run_id"], artifact["sha256"]) for artifact in artifacts if artifact.get("sha256"))
+    if references:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR IGNORE INTO run_artifacts (run_id, sha256) VALUES (?, ?)", sorted(references))
+        conn.execute("COMMIT")
+
+
+def _insert_run_artifacts(conn: sqlite3.Connection, run_id: str, artifacts: list):
+    """Registra os artefatos (metadados de externalize_artifacts) referenciados pela execução."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO run_artifacts (run_id, sha256) VALUES (?, ?)",
+        [(run_id, artifact["sha256"]) for artifact in artifacts or []]
+    )
+
+
+def start_run(run_id: str, user_input: str, project_id: str = DEFAULT_PROJECT_ID):
+    """Registra o início de uma execução (idempotente: retentativas não duplicam a linha)."""
+    with _transaction(store_path(project_id)) as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO runs (id, project_id, user_input, status, created_at) VALUES (?, ?, ?, 'running', ?)",
+            (run_id, project_id, user_input, time.time())
+        )
+
+
+def save_stage_output(run_id: str, stage: str, output, project_id: str = DEFAULT_PROJECT_ID, artifacts: list = None):
+    """Grava (ou substitui) a saída de uma etapa da execução e registra os artefatos (`artifacts`) que ela referencia."""
+    with _transaction(store_path(project_id)) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO stage_outputs (run_id, stage, output, created_at) VALUES (?, ?, ?, ?)",
+            (run_id, stage, output if isinstance(output, str) else json.dumps(output, ensure_ascii=False), time.time())
+        )
+        _insert_run_artifacts(conn, run_id, artifacts)
+
+
+def finish_run(run_id: str, results: dict, project_id: str = DEFAULT_PROJECT_ID, user_input: str = None):
+    """
+    Conclui a execução em uma única transação: saídas das etapas, itens recém-concluídos e status final.
+    Uma falha no meio não deixa o histórico pela metade.
+    """
+    now = time.time()
+    with _transaction(store_path(project_id)) as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO runs (id, project_id, user_input, status, created_at) VALUES (?, ?, ?, 'running', ?)",
+            (run_id, project_id, user_input, now)
+        )
+        for stage, key in (("planning", "planning_result"), ("development", "development_result")):
+            if results.get(key) is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO stage_outputs (run_id, stage, output, created_at) VALUES (?, ?, ?, ?)",
+                    (run_id, stage, str(results[key]), now)
+                )
+        if results.get("artifacts"):
+            conn.execute(
+                "INSERT OR REPLACE INTO stage_outputs (run_id, stage, output, created_at) VALUES (?, ?, ?, ?)",
+                (run_id, "artifacts", json.dumps(results["artifacts"], ensure_ascii=False), now)
+            )
+            _insert_run_artifacts(conn, run_id, results["artifacts"])
+        conn.executemany(
+            "INSERT OR IGNORE INTO completed_items (project_id, item, run_id, completed_at) VALUES (?, ?, ?, ?)",
+            [(project_id, item, run_id, now) for item in results.get("newly_completed_items") or []]
+        )
+        conn.execute(
+            "UPDATE runs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            ("failed" if results.get("error") else "finished", results.get("error"), now, run_id)
+        )
+
+
+def add_completed_items(items: list, project_id: str = DEFAULT_PROJECT_ID, run_id: str = None):
+    """Acrescenta itens concluídos ao projeto (os que já existem são mantidos)."""
+    now = time.time()
+    with _transaction(store_path(project_id)) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO completed_items (project_id, item, run_id, completed_at) VALUES (?, ?, ?, ?)",
+            [(project_id, item, run_id, now) for item in items]
+        )
+
+
+def get_completed_items(project_id: str = DEFAULT_PROJECT_ID) -> list:
+    """Itens concluídos do projeto, em ordem alfabética."""
+    rows = _connect(store_path(project_id)).execute(
+        "SELECT item FROM completed_items WHERE project_id = ? ORDER BY item", (project_id,)
+    ).fetchall()
+    return [row["item"] for row in rows]
+
+
+def _stage_rows(conn, run_id: str, preview_chars: int = None) -> list:
+    """
+    Saídas das etapas da execução. Com preview_chars, só o início de cada saída sai do banco
+    (a lista de artefatos vem sempre inteira); o tamanho completo vem em "length".
+    """
+    if preview_chars is None:
+        return conn.execute(
+            "SELECT stage, output, length(output) AS length FROM stage_outputs WHERE run_id = ?", (run_id,)
+        ).fetchall()
+    return conn.execute(
+        "SELECT stage, CASE WHEN stage = 'artifacts' THEN output ELSE substr(output, 1, ?) END AS output, "
+        "length(output) AS length FROM stage_outputs WHERE run_id = ?", (preview_chars, run_id)
+    ).fetchall()
+
+
+def _run_from_rows(run_row, stage_rows) -> dict:
+    outputs = {row["stage"]: row["output"] for row in stage_rows}
+    return {
+        "id": run_row["id"],
+        "project_id": run_row["project_id"],
+        "user_input": run_row["user_input"],
+        "status": run_row["status"],
+        "error": run_row["error"],
+        "created_at": run_row["created_at"],
+        "finished_at": run_row["finished_at"],
+        "planning_result": outputs.get("planning"),
+        "development_result": outputs.get("development"),
+        "stage_outputs": outputs,
+        "section_lengths": {row["stage"]: row["length"] or 0 for row in stage_rows},
+    }
+
+
+def get_run(run_id: str, project_id: str = DEFAULT_PROJECT_ID):
+    """Retorna uma execução do projeto pelo id (com as saídas das etapas), ou None."""
+    conn = _connect(store_path(project_id))
+    run_row = conn.execute("SELECT * FROM runs WHERE id = ? AND project_id = ?", (run_id, project_id)).fetchone()
+    if run_row is None:
+        return None
+    return _run_from_rows(run_row, _stage_rows(conn, run_id))
+
+
+def run_exists(run_id: str, project_id: str = DEFAULT_PROJECT_ID) -> bool:
+    """Se a execução existe no histórico do projeto (sem ler as saídas das etapas)."""
+    conn = _connect(store_path(project_id))
+    return conn.execute("SELECT 1 FROM runs WHERE id = ? AND project_id = ?", (run_id, project_id)).fetchone() is not None
+
+
+def get_latest_run(project_id: str = DEFAULT_PROJECT_ID, finished_only: bool = True, preview_chars: int = None):
+    """
+    Retorna a execução mais recente do projeto (por padrão, só as já concluídas), ou None.
+    Com preview_chars, as saídas vêm truncadas (o restante é lido por get_stage_output_chunk).
+    """
+    query = "SELECT * FROM runs WHERE project_id = ?"
+    if finished_only:
+        query += " AND status != 'running'"
+    conn = _connect(store_path(project_id))
+    run_row = conn.execute(query + " ORDER BY created_at DESC LIMIT 1", (project_id,)).fetchone()
+    if run_row is None:
+        return None
+    return _run_from_rows(run_row, _stage_rows(conn, run_row["id"], preview_chars))
+
+
+def get_stage_output_info(run_id: str, stage: str, project_id: str = DEFAULT_PROJECT_ID):
+    """Tamanho (em caracteres) e data de gravação da saída de uma etapa, sem ler o texto; None se não existir."""
+    row = _connect(store_path(project_id)).execute(
+        "SELECT length(s.output) AS length, s.created_at FROM stage_outputs s JOIN runs r ON r.id = s.run_id "
+        "WHERE s.run_id = ? AND s.stage = ? AND r.project_id = ?", (run_id, stage, project_id)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def get_stage_output_chunk(run_id: str, stage: str, offset: int, limit: int, project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Trecho [offset, offset + limit) da saída de uma etapa (em caracteres), recortado pelo próprio SQLite.
+    Retorna {"content", "length", "created_at"} ou None se a etapa não existir.
+    """
+    row = _connect(store_path(project_id)).execute(
+        "SELECT substr(s.output, ?, ?) AS content, length(s.output) AS length, s.created_at "
+        "FROM stage_outputs s JOIN runs r ON r.id = s.run_id "
+        "WHERE s.run_id = ? AND s.stage = ? AND r.project_id = ?", (offset + 1, limit, run_id, stage, project_id)
+    ).fetchone()
+    return {"content": row["content"] or "", "length": row["length"] or 0, "created_at": row["created_at"]} if row else None
+
+
+def artifact_referenced(digest: str, project_id: str = DEFAULT_PROJECT_ID) -> bool:
+    """Se alguma execução do projeto referencia o artefato (consulta pontual no índice de run_artifacts)."""
+    row = _connect(store_path(project_id)).execute(
+        "SELECT 1 FROM run_artifacts a JOIN runs r ON r.id = a.run_id WHERE a.sha256 = ? AND r.project_id = ? LIMIT 1",
+        (digest, project_id)
+    ).fetchone()
+    return row is not None
+
+
+def list_runs(project_id: str = DEFAULT_PROJECT_ID, limit: int = 20) -> list:
+    """Lista as execuções mais recentes do projeto, sem as saídas."""
+    rows = _connect(store_path(project_id)).execute(
+        "SELECT id, user_input, status, error, created_at, finished_at FROM runs "
+        "WHERE project_id = ? ORDER BY created_at DESC LIMIT ?", (project_id, limit)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def export_completed_items_json(path: str, project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Escreve os itens concluídos no arquivo JSON lido pelas ferramentas de arquivo dos agentes.
+    A escrita é atômica (arquivo temporário + rename), então leitores nunca veem um arquivo pela metade.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"completed_items": get_completed_items(project_id)}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def import_legacy_json(status_path: str, results_path: str, project_id: str = DEFAULT_PROJECT_ID):
+    """
+    Importa uma única vez os arquivos antigos (project_status.json e last_run_results.json)
+    quando o banco ainda não tem nada do projeto.
+    """
+    conn = _connect(store_path(project_id))
+    has_items = conn.execute("SELECT 1 FROM completed_items WHERE project_id = ? LIMIT 1", (project_id,)).fetchone()
+    has_runs = conn.execute("SELECT 1 FROM runs WHERE project_id = ? LIMIT 1", (project_id,)).fetchone()
+
+    if not has_items and status_path and os.path.exists(status_path):
+        try:
+            with open(status_path, 'r', encoding='utf-8') as f:
+                items = json.load(f).get("completed_items", [])
+            if items:
+                add_completed_items(items, project_id, run_id="legacy")
+        except (json.JSONDecodeError, AttributeError) as e:
+            print(f"Erro ao importar '{status_path}': {e}")
+
+    if not has_runs and results_path and os.path.exists(results_path):
+        try:
+            with open(results_path, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+            if isinstance(results, dict):
+                finish_run("legacy", {**results, "newly_completed_items": []}, project_id)
+        except json.JSONDecodeError as e:
+            print(f"Erro ao importar '{results_path}': {e}")
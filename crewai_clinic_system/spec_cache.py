@@ -0,0 +1,82 @@
+import os
+import re
+import json
+import threading
+
+# Cache de arquivos já lidos e parseados: (caminho, parser) -> (mtime_ns, tamanho, valor)
+# O arquivo só é lido de novo quando seu mtime ou tamanho mudam.
+_cache = {}
+_cache_lock = threading.Lock()
+
+# Fase no roteiro: título ("## Fase 1: Descoberta e Design"), item de lista ("- Fase 1: ...", "1. Fase 1: ...")
+# ou texto em destaque ("**Fase 1: ...**", "- **Fase 1:** ..."), como o parser original aceitava
+PHASE_PATTERN = re.compile(r"^\s*(?:#{1,6}\s*|(?:[-*+]|\d+[.)])\s+)?[*_`]*\s*(Fase \d+:.+?)(?:\s+#+)?\s*$")
+# Marcas de destaque do Markdown removidas do nome da fase
+_EMPHASIS = re.compile(r"\*\*?|__|`")
+# Sub-item de uma fase: lista ("- item", "* item", "1. item") ou subtítulo ("### item")
+SUB_ITEM_PATTERN = re.compile(r"^\s*(?:[-*+]|\d+[.)]|#{3,})\s+(.+?)\s*$")
+
+
+def load_cached(path: str, parser):
+    """
+    Retorna parser(conteúdo do arquivo), reaproveitando o resultado enquanto o arquivo não mudar.
+    Levanta FileNotFoundError se o arquivo não existir; erros do parser são propagados e nada é guardado.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), parser)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        value = parser(f.read())
+    with _cache_lock:
+        _cache[key] = (stat.st_mtime_ns, stat.st_size, value)
+    return value
+
+
+def invalidate(path: str = None):
+    """Descarta o cache de um arquivo (ou de todos, se `path` for None)."""
+    with _cache_lock:
+        if path is None:
+            _cache.clear()
+            return
+        absolute_path = os.path.abspath(path)
+        for key in [key for key in _cache if key[0] == absolute_path]:
+            del _cache[key]
+
+
+def parse_roadmap(content: str) -> dict:
+    """Extrai as fases do roteiro e seus sub-itens: {"Fase 1: ...": ["sub-item", ...], ...}."""
+    phases = {}
+    current_phase = None
+    for line in content.splitlines():
+        phase_match = PHASE_PATTERN.match(line)
+        if phase_match:
+            current_phase = " ".join(_EMPHASIS.sub("", phase_match.group(1)).split())
+            phases.setdefault(current_phase, [])
+            continue
+        if line.lstrip().startswith("#") and not line.lstrip().startswith("###"):
+            # Outro título de mesmo nível encerra a fase atual
+            current_phase = None
+            continue
+        sub_item_match = SUB_ITEM_PATTERN.match(line)
+        if current_phase and sub_item_match:
+            phases[current_phase].append(sub_item_match.group(1))
+    return phases
+
+
+def parse_json(content: str):
+    """Parser JSON para load_cached."""
+    return json.loads(content)
+
+
+def get_roadmap_from_file(path: str):
+    """Lê (com cache) o arquivo de roteiro e retorna (erro, {fase: [sub-itens]})."""
+    try:
+        if not path or not os.path.exists(path):
+            return {"error": f"Erro: O arquivo de roteiro '{path}' não foi encontrado."}, {}
+        return None, load_cached(path, parse_roadmap)
+    except Exception as e:
+        return {"error": f"Erro ao ler ou parsear o roteiro: {e}"}, {}
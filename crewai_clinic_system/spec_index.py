@@ -0,0 +1,192 @@
+import os
+import re
+import math
+import hashlib
+import threading
+import unicodedata
+from collections import Counter
+from dotenv import load_dotenv
+
+from context_budget import count_tokens, truncate_to_tokens
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Busca nas especificações em Markdown: os arquivos são divididos em seções (pelos títulos) e ranqueados
+# por BM25, de modo que o agente recebe só os trechos relevantes em vez do arquivo inteiro.
+SPEC_SEARCH_TOP_K = int(os.getenv("SPEC_SEARCH_TOP_K", "4"))
+SPEC_SEARCH_MAX_TOKENS = int(os.getenv("SPEC_SEARCH_MAX_TOKENS", "1500"))
+# Seções maiores que isso são quebradas em trechos (por parágrafo) para o ranking ficar mais preciso
+SPEC_SECTION_MAX_TOKENS = int(os.getenv("SPEC_SECTION_MAX_TOKENS", "400"))
+
+# Parâmetros usuais do BM25 (saturação do termo e normalização pelo tamanho da seção)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+_WORD = re.compile(r"\w+")
+# Palavras muito frequentes que não ajudam a diferenciar as seções
+_STOPWORDS = frozenset(
+    "a o as os de da do das dos e em no na nos nas um uma uns umas por para com sem que se ao aos "
+    "the of and to in for on is are be with".split()
+)
+
+# Índices já construídos: caminho absoluto -> (mtime_ns, tamanho, sha256, SpecIndex)
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def tokenize(text: str) -> list:
+    """Termos para o ranking: minúsculos, sem acentos e sem stopwords."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [word for word in _WORD.findall(text) if len(word) > 1 and word not in _STOPWORDS]
+
+
+def _split_long_section(title: str, body: str) -> list:
+    """Quebra o corpo de uma seção grande em trechos de até SPEC_SECTION_MAX_TOKENS, nos limites de parágrafo."""
+    if count_tokens(body) <= SPEC_SECTION_MAX_TOKENS:
+        return [(title, body)]
+    chunks, current = [], []
+    for paragraph in re.split(r"\n\s*\n", body):
+        if current and count_tokens("\n\n".join(current + [paragraph])) > SPEC_SECTION_MAX_TOKENS:
+            chunks.append("\n\n".join(current))
+            current = []
+        current.append(paragraph)
+    if current:
+        chunks.append("\n\n".join(current))
+    return [(f"{title} ({number}/{len(chunks)})", chunk) for number, chunk in enumerate(chunks, start=1)]
+
+
+def split_markdown_sections(content: str) -> list:
+    """
+    Divide o Markdown em seções pelos títulos (#, ##, ...), ignorando linhas dentro de blocos de código.
+    Cada seção é (título com o caminho dos títulos pais, ex: "Fluxo > Agendamento", texto).
+    """
+    sections = []
+    headings = []
+    lines = []
+    in_fence = False
+
+    def flush():
+        # Um título sem corpo (ex: só a lista de fases do roteiro) ainda é uma seção: o próprio título é o conteúdo
+        body = "\n".join(lines).strip() or (headings[-1] if headings else "")
+        if body:
+            sections.extend(_split_long_section(" > ".join(headings) or "(início)", body))
+
+    for line in content.splitlines():
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(line)
+        if match:
+            flush()
+            lines = []
+            level = len(match.group(1))
+            headings = headings[:level - 1] + [match.group(2)]
+            continue
+        lines.append(line)
+    flush()
+    return sections
+
+
+class SpecIndex:
+    """Índice BM25 das seções de um arquivo de especificação."""
+
+    def __init__(self, source: str, sections: list):
+        self.source = source
+        self.sections = sections
+        # O título entra nos termos da seção: costuma ser o melhor resumo do que ela trata
+        self.term_counts = [Counter(tokenize(f"{title}\n{text}")) for title, text in sections]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        total = len(sections)
+        self.idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def search(self, query: str, top_k: int = SPEC_SEARCH_TOP_K) -> list:
+        """Retorna até top_k (pontuação, título, texto) em ordem decrescente de relevância (só pontuação > 0)."""
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        if not terms:
+            return []
+        scored = []
+        for position, counts in enumerate(self.term_counts):
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / (self.average_length or 1))
+            score = 0.0
+            for term in terms:
+                frequency = counts.get(term)
+                if frequency:
+                    score += self.idf[term] * frequency * (BM25_K1 + 1) / (frequency + length_norm)
+            if score > 0:
+                title, text = self.sections[position]
+                scored.append((score, title, text))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:top_k]
+
+
+def get_spec_index(path: str) -> SpecIndex:
+    """
+    Retorna o índice do arquivo, reconstruindo-o só quando o conteúdo (SHA-256) muda.
+    O hash só é recalculado quando o mtime ou o tamanho mudam. Levanta FileNotFoundError se o arquivo não existir.
+    """
+    absolute_path = os.path.abspath(path)
+    stat = os.stat(absolute_path)
+    with _indexes_lock:
+        cached = _indexes.get(absolute_path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[3]
+
+    with open(absolute_path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if cached and cached[2] == digest:
+        index = cached[3]
+    else:
+        index = SpecIndex(path, split_markdown_sections(data.decode("utf-8")))
+    with _indexes_lock:
+        _indexes[absolute_path] = (stat.st_mtime_ns, stat.st_size, digest, index)
+    return index
+
+
+def search_specs(query: str, paths: list, top_k: int = SPEC_SEARCH_TOP_K, max_tokens: int = SPEC_SEARCH_MAX_TOKENS) -> str:
+    """
+    Busca `query` nos arquivos `paths` e retorna as top_k seções mais relevantes, formatadas em Markdown
+    e limitadas a max_tokens no total. Arquivos ausentes são ignorados.
+    """
+    results = []
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        index = get_spec_index(path)
+        results.extend((score, os.path.basename(path), title, text) for score, title, text in index.search(query, top_k))
+    if not results:
+        return f"Nenhuma seção das especificações corresponde à busca: {query!r}. Tente outros termos."
+
+    results.sort(key=lambda item: item[0], reverse=True)
+    parts = []
+    used_tokens = 0
+    for score, file_name, title, text in results[:top_k]:
+        part = f"### {file_name} — {title}\n{text}"
+        remaining = max_tokens - used_tokens
+        if remaining <= 0:
+            break
+        if count_tokens(part) > remaining:
+            # A primeira seção sempre entra (truncada); as seguintes só se couberem inteiras
+            if parts:
+                break
+            part = truncate_to_tokens(part, remaining)
+        parts.append(part)
+        used_tokens += count_tokens(part)
+    return "\n\n".join(parts)
+
+
+def invalidate(path: str = None):
+    """Descarta o índice de um arquivo (ou de todos, se `path` for None)."""
+    with _indexes_lock:
+        if path is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(os.path.abspath(path), None)
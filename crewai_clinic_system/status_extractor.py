@@ -0,0 +1,169 @@
+import os
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import NamedTuple
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Como descobrir os itens concluídos: "auto" (local; LLM só se a confiança for baixa), "local" ou "llm"
+STATUS_EXTRACTION_MODE = os.getenv("STATUS_EXTRACTION_MODE", "auto")
+# Confiança mínima da extração local para dispensar a crew de atualização de status
+STATUS_EXTRACTION_MIN_CONFIDENCE = float(os.getenv("STATUS_EXTRACTION_MIN_CONFIDENCE", "0.75"))
+
+# Semelhança mínima para considerar um texto como menção a uma fase/sub-item
+FUZZY_MATCH_THRESHOLD = 0.85
+# Abaixo disso, a semelhança é considerada ruído; entre os dois limites a menção é ambígua
+FUZZY_AMBIGUOUS_THRESHOLD = 0.6
+
+# Saídas de tarefa que indicam que o agente não terminou o trabalho
+FAILED_OUTPUT_PATTERN = re.compile(
+    r"agent stopped due to|iteration limit|time limit|não (?:foi possível|consegui)|i (?:couldn't|could not|cannot)",
+    re.I
+)
+# Início da saída de uma tarefa interrompida por orçamento (crew_config/budget.py): o texto que segue é parcial
+BUDGET_STOPPED_MARKER = "[Tarefa interrompida por orçamento"
+
+
+class StatusExtraction(NamedTuple):
+    """Resultado da extração local: itens concluídos, confiança (0 a 1) e a evidência de cada decisão."""
+    items: list
+    confidence: float
+    evidence: dict
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e sem pontuação, para comparar nomes de fases e sub-itens."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w]+", " ", text.lower()).split())
+
+
+def _candidate_lines(text: str) -> list:
+    """Títulos, itens de lista e linhas curtas da saída: onde uma fase ou sub-item costuma ser citado."""
+    candidates = []
+    for line in (text or "").splitlines():
+        line = normalize(line)
+        if line and len(line) <= 200:
+            candidates.append(line)
+    return candidates
+
+
+def best_match(name: str, text: str) -> float:
+    """Semelhança (0 a 1) entre `name` e a melhor linha de `text`; 1.0 quando o nome aparece literalmente."""
+    target = normalize(name)
+    if not target:
+        return 0.0
+    if target in normalize(text):
+        return 1.0
+    best = 0.0
+    for line in _candidate_lines(text):
+        matcher = SequenceMatcher(None, target, line, autojunk=False)
+        # Descarta rápido as linhas que não podem atingir a melhor semelhança atual
+        if matcher.real_quick_ratio() <= best or matcher.quick_ratio() <= best:
+            continue
+        best = max(best, matcher.ratio())
+    return best
+
+
+def _phase_tasks(phase: str, phase_to_tasks: dict) -> list:
+    """Tarefas da fase; nomes de fase levemente diferentes no roteiro são casados por semelhança."""
+    if phase in phase_to_tasks:
+        return list(phase_to_tasks[phase])
+    target = normalize(phase)
+    scored = [(SequenceMatcher(None, target, normalize(name)).ratio(), name) for name in phase_to_tasks]
+    if scored:
+        ratio, name = max(scored)
+        if ratio >= FUZZY_MATCH_THRESHOLD:
+            return list(phase_to_tasks[name])
+    return []
+
+
+def is_budget_stopped(output) -> bool:
+    """A tarefa foi interrompida por orçamento e não concluída (a saída começa com BUDGET_STOPPED_MARKER)."""
+    return str(output or "").lstrip().startswith(BUDGET_STOPPED_MARKER)
+
+
+def _output_is_usable(output) -> bool:
+    return (bool(output and str(output).strip()) and not is_budget_stopped(output)
+            and not FAILED_OUTPUT_PATTERN.search(str(output)[:2000]))
+
+
+def extract_completed_items(roadmap: dict, phase_to_tasks: dict, tasks_run: list, task_outputs: dict,
+                            development_result: str = "", completed_items: list = ()) -> StatusExtraction:
+    """
+    Descobre, sem LLM, quais fases e sub-itens do roteiro foram concluídos nesta execução.
+
+    Uma fase é concluída quando todas as suas tarefas (phase_to_tasks) rodaram e produziram saída utilizável;
+    sub-itens de fases incompletas são procurados (exata ou aproximadamente) nas saídas das tarefas da fase.
+    Tarefas interrompidas por orçamento (is_budget_stopped) nunca concluem a fase nem servem de evidência.
+    Cada decisão tem uma confiança; a da extração é a menor delas, para que qualquer caso duvidoso
+    (saída ausente ou com cara de falha, menção ambígua, fase sem tarefas citada na saída) leve ao LLM.
+    """
+    already_completed = set(completed_items)
+    tasks_run = set(tasks_run)
+    items = []
+    evidence = {}
+
+    def decide(item: str, completed: bool, confidence: float, reason: str):
+        evidence[item] = {"completed": completed, "confidence": round(confidence, 3), "reason": reason}
+        if completed and item not in already_completed and item not in items:
+            items.append(item)
+
+    for phase, sub_items in roadmap.items():
+        if phase in already_completed:
+            continue
+        mapped = _phase_tasks(phase, phase_to_tasks)
+        ran = [name for name in mapped if name in tasks_run]
+        # Saídas parciais de tarefas interrompidas por orçamento não contam como evidência de conclusão
+        stopped = [name for name in ran if is_budget_stopped(task_outputs.get(name))]
+        finished = [name for name in ran if name not in stopped]
+        phase_text = "\n".join(str(task_outputs.get(name, "")) for name in finished)
+
+        if not mapped:
+            # Fase sem tarefas conhecidas: só o LLM sabe dizer se uma menção na saída significa conclusão
+            ratio = best_match(phase, development_result)
+            if ratio >= FUZZY_AMBIGUOUS_THRESHOLD:
+                decide(phase, False, 1.0 - ratio, f"fase sem tarefas mapeadas citada na saída (semelhança {ratio:.2f})")
+            else:
+                decide(phase, False, 1.0, "fase sem tarefas mapeadas e não citada")
+        elif not ran:
+            decide(phase, False, 1.0, "nenhuma tarefa da fase foi executada")
+        elif stopped:
+            decide(phase, False, 1.0, f"tarefas interrompidas por orçamento: {stopped}")
+        elif len(ran) < len(mapped):
+            decide(phase, False, 0.9, f"só {len(ran)} de {len(mapped)} tarefas da fase foram executadas")
+        else:
+            missing = [name for name in ran if name not in task_outputs]
+            failed = [name for name in ran if name in task_outputs and not _output_is_usable(task_outputs[name])]
+            if missing:
+                decide(phase, True, 0.5, f"saída individual ausente para {missing}")
+            elif failed:
+                decide(phase, False, 0.3, f"saída vazia ou com indício de falha em {failed}")
+            else:
+                decide(phase, True, 1.0, "todas as tarefas da fase foram executadas com saída")
+
+        for sub_item in sub_items:
+            if sub_item in already_completed:
+                continue
+            if evidence[phase]["completed"]:
+                decide(sub_item, True, evidence[phase]["confidence"], "fase concluída")
+                continue
+            if not finished:
+                decide(sub_item, False, 1.0, "nenhuma tarefa da fase foi executada" if not ran
+                       else "tarefas da fase interrompidas por orçamento")
+                continue
+            ratio = best_match(sub_item, phase_text)
+            if ratio == 1.0:
+                decide(sub_item, True, 0.8, "citado literalmente na saída das tarefas da fase")
+            elif ratio >= FUZZY_MATCH_THRESHOLD:
+                decide(sub_item, True, ratio * 0.9, f"citado aproximadamente (semelhança {ratio:.2f})")
+            elif ratio >= FUZZY_AMBIGUOUS_THRESHOLD:
+                decide(sub_item, False, 0.5, f"menção ambígua (semelhança {ratio:.2f})")
+            else:
+                decide(sub_item, False, 0.9, "não citado na saída das tarefas da fase")
+
+    confidence = min((entry["confidence"] for entry in evidence.values()), default=1.0)
+    return StatusExtraction(items=items, confidence=confidence, evidence=evidence)
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import fakeredis
+import pytest
+
+# Os módulos do app são importados pelo nome, a partir de crewai_clinic_system/ (como em app.py e nos workers)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Nenhum teste fala com um Redis de verdade: o cliente do processo (progress_events.get_redis) é um fakeredis."""
+    import progress_events
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(progress_events, "_redis_client", client)
+    return client
@@ -0,0 +1,162 @@
+import pytest
+
+import crew_config.budget as budget_module
+from crew_config.budget import Budget, BudgetExceeded, guard_llm, run_budget, task_budget
+from crew_config.fake_llm import FakeChatModel
+from crew_orchestrator import _budget_stopped_output
+from status_extractor import BUDGET_STOPPED_MARKER, is_budget_stopped
+
+
+def make_budget(delegations=0, iterations=0, tokens=0, seconds=0):
+    return Budget("task", "tarefa", delegations, iterations, tokens, seconds)
+
+
+# --- Limite exato: um limite N permite N ---
+
+def test_iteration_limit_allows_exactly_n_calls():
+    budget = make_budget(iterations=3)
+    for _ in range(3):
+        budget.check()
+        budget.charge_llm_start()
+    with pytest.raises(BudgetExceeded) as excinfo:
+        budget.check()
+    assert excinfo.value.limit == "iterations"
+    assert budget.iterations == 3
+
+
+def test_token_limit_allows_exactly_n_tokens():
+    budget = make_budget(tokens=1000)
+    budget.charge_llm_end(1000, "")
+    budget.check()
+    budget.charge_llm_end(1, "")
+    with pytest.raises(BudgetExceeded) as excinfo:
+        budget.check()
+    assert excinfo.value.limit == "tokens"
+
+
+def test_delegation_limit_allows_exactly_n_delegations():
+    budget = make_budget(delegations=2)
+    budget.charge_delegation("tech lead", "backend developer")
+    budget.charge_delegation("tech lead", "frontend developer")
+    assert budget.exceeded is None
+    budget.charge_delegation("tech lead", "qa engineer")
+    assert budget.exceeded.limit == "delegations"
+
+
+def test_zero_disables_limit():
+    budget = make_budget()
+    for _ in range(100):
+        budget.check()
+        budget.charge_llm_start()
+        budget.charge_delegation("a", "b")
+    budget.charge_llm_end(10 ** 9, "")
+    budget.check()
+
+
+def test_only_first_exceeded_limit_is_recorded():
+    budget = make_budget(iterations=1, tokens=10)
+    budget.check()
+    budget.charge_llm_start()
+    budget.charge_llm_end(50, "")
+    with pytest.raises(BudgetExceeded):
+        budget.check()
+    assert budget.exceeded.limit == "tokens"
+
+
+# --- Ciclos de delegação ---
+
+@pytest.mark.parametrize("edges, cycle", [
+    ([("a", "b"), ("b", "a")], True),
+    ([("a", "b"), ("b", "c"), ("c", "b")], True),
+    ([("a", "b"), ("a", "b")], False),
+    ([("a", "b"), ("b", "c"), ("c", "a")], False),
+    ([("a", ""), ("", "a")], False),
+])
+def test_charge_delegation_detects_direct_cycles(edges, cycle):
+    budget = make_budget()
+    for agent, coworker in edges:
+        budget.charge_delegation(agent, coworker)
+    assert (budget.exceeded is not None and budget.exceeded.limit == "delegation_cycle") == cycle
+    assert budget.delegations == len(edges)
+
+
+def test_delegation_cycle_stops_the_next_llm_call():
+    budget = make_budget()
+    budget.charge_delegation("product owner", "tech lead")
+    budget.charge_delegation("tech lead", "product owner")
+    with pytest.raises(BudgetExceeded) as excinfo:
+        budget.check()
+    assert excinfo.value.limit == "delegation_cycle"
+    assert "tech lead -> product owner -> tech lead" in str(excinfo.value)
+
+
+def test_start_next_task_resets_counters_and_edges():
+    budget = make_budget(iterations=1)
+    budget.charge_llm_start()
+    budget.charge_delegation("a", "b")
+    budget.start_next_task("seguinte")
+    budget.charge_delegation("b", "a")
+    budget.check()
+    assert budget.name == "seguinte"
+
+
+# --- Orçamentos aplicados ao LLM (BudgetGuardHandler) ---
+
+def test_guarded_llm_stops_at_task_iteration_limit(monkeypatch):
+    monkeypatch.setattr(budget_module, "CREW_TASK_MAX_ITERATIONS", 2)
+    llm = guard_llm(FakeChatModel(prompt_tokens=100, completion_tokens=50))
+    with task_budget("tarefa") as budget:
+        llm.invoke("primeira")
+        llm.invoke("segunda")
+        with pytest.raises(BudgetExceeded):
+            llm.invoke("terceira")
+    assert budget.iterations == 2
+    assert budget.tokens == 300
+
+
+def test_guarded_llm_charges_task_and_run_budgets(monkeypatch):
+    monkeypatch.setattr(budget_module, "CREW_RUN_MAX_ITERATIONS", 3)
+    monkeypatch.setattr(budget_module, "CREW_TASK_MAX_ITERATIONS", 0)
+    llm = guard_llm(FakeChatModel())
+    with run_budget("execução") as run:
+        with task_budget("primeira"):
+            llm.invoke("a")
+            llm.invoke("b")
+        with task_budget("segunda") as second:
+            llm.invoke("c")
+            with pytest.raises(BudgetExceeded) as excinfo:
+                llm.invoke("d")
+    assert excinfo.value.scope == "run"
+    assert run.iterations == 3
+    # A chamada recusada pelo orçamento da execução não é contada em nenhum dos dois
+    assert second.iterations == 1
+
+
+def test_guard_llm_keeps_the_original_model_untouched():
+    llm = FakeChatModel()
+    guarded = guard_llm(llm)
+    assert not llm.callbacks
+    assert len(guarded.callbacks) == 1
+
+
+# --- Saída de tarefa interrompida por orçamento ---
+
+def test_budget_stopped_output_is_marked_and_keeps_best_output():
+    budget = make_budget(iterations=1)
+    budget.charge_llm_end(0, "Thought: quase lá\nFinal Answer: esboço do serviço de autenticação")
+    output = _budget_stopped_output(budget, BudgetExceeded("task", "iterations", "limite"))
+    assert output.startswith(BUDGET_STOPPED_MARKER)
+    assert output.endswith("esboço do serviço de autenticação")
+    assert is_budget_stopped(output)
+
+
+@pytest.mark.parametrize("output, stopped", [
+    (f"{BUDGET_STOPPED_MARKER}: limite. A tarefa NÃO foi concluída.]", True),
+    (f"\n  {BUDGET_STOPPED_MARKER}: limite.]", True),
+    (f"Resumo da tarefa.\n{BUDGET_STOPPED_MARKER}: citado no meio do texto", False),
+    ("Código do serviço de autenticação", False),
+    ("", False),
+    (None, False),
+])
+def test_is_budget_stopped(output, stopped):
+    assert is_budget_stopped(output) == stopped
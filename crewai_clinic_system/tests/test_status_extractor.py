@@ -0,0 +1,165 @@
+import pytest
+
+import crew_orchestrator
+from status_extractor import (
+    BUDGET_STOPPED_MARKER,
+    FUZZY_AMBIGUOUS_THRESHOLD,
+    FUZZY_MATCH_THRESHOLD,
+    best_match,
+    extract_completed_items,
+)
+
+PHASE_1 = "Fase 1: Descoberta e Design"
+PHASE_2 = "Fase 2: Configuração e Bootstrap"
+REQUIREMENTS = "Levantar requisitos"
+DATABASE = "Configurar banco de dados PostgreSQL"
+
+ROADMAP = {PHASE_1: [REQUIREMENTS, DATABASE]}
+PHASE_TO_TASKS = {PHASE_1: ["analyze_task", "design_task"]}
+BOTH_TASKS = ["analyze_task", "design_task"]
+STOPPED = f"{BUDGET_STOPPED_MARKER}: 26ª chamada ao LLM de 25. A tarefa NÃO foi concluída; o texto abaixo é parcial.]"
+
+# Cada caso: tarefas executadas, saídas por tarefa, itens concluídos esperados,
+# decisões esperadas {item: (concluído, confiança)} e quem decide no modo "auto" ("local" ou "llm").
+CASES = [
+    pytest.param(
+        BOTH_TASKS, {"analyze_task": "Análise concluída.", "design_task": "Arquitetura e esquema do banco."},
+        [PHASE_1, REQUIREMENTS, DATABASE],
+        {PHASE_1: (True, 1.0), REQUIREMENTS: (True, 1.0), DATABASE: (True, 1.0)},
+        "local",
+        id="fase-executada-inteira",
+    ),
+    pytest.param(
+        ["analyze_task"], {"analyze_task": "Análise concluída."},
+        [],
+        {PHASE_1: (False, 0.9), REQUIREMENTS: (False, 0.9), DATABASE: (False, 0.9)},
+        "local",
+        id="fase-parcial",
+    ),
+    pytest.param(
+        BOTH_TASKS, {"analyze_task": "Análise concluída.", "design_task": f"{STOPPED}\n\n- {DATABASE}"},
+        [],
+        # O sub-item citado só na saída parcial da tarefa interrompida não conta
+        {PHASE_1: (False, 1.0), REQUIREMENTS: (False, 0.9), DATABASE: (False, 0.9)},
+        "local",
+        id="tarefa-interrompida-por-orcamento",
+    ),
+    pytest.param(
+        BOTH_TASKS, {"analyze_task": f"{STOPPED}\n\n- {REQUIREMENTS}", "design_task": f"{STOPPED}\n\n- {DATABASE}"},
+        [],
+        {PHASE_1: (False, 1.0), REQUIREMENTS: (False, 1.0), DATABASE: (False, 1.0)},
+        "local",
+        id="todas-as-tarefas-interrompidas",
+    ),
+    pytest.param(
+        BOTH_TASKS, {"analyze_task": "Análise concluída."},
+        [PHASE_1, REQUIREMENTS, DATABASE],
+        {PHASE_1: (True, 0.5), REQUIREMENTS: (True, 0.5), DATABASE: (True, 0.5)},
+        "llm",
+        id="saida-ausente",
+    ),
+    pytest.param(
+        BOTH_TASKS, {"analyze_task": "Análise concluída.", "design_task": "Agent stopped due to iteration limit or time limit."},
+        [],
+        {PHASE_1: (False, 0.3)},
+        "llm",
+        id="saida-com-indicio-de-falha",
+    ),
+    pytest.param(
+        ["analyze_task"], {"analyze_task": f"Entregas:\n- {REQUIREMENTS}"},
+        [REQUIREMENTS],
+        {PHASE_1: (False, 0.9), REQUIREMENTS: (True, 0.8), DATABASE: (False, 0.9)},
+        "local",
+        id="sub-item-exato",
+    ),
+    pytest.param(
+        ["analyze_task"], {"analyze_task": "Entregas:\n- Configurar bancos de dados Postgres"},
+        [DATABASE],
+        {PHASE_1: (False, 0.9), DATABASE: (True, pytest.approx(0.862, abs=1e-3))},
+        "local",
+        id="sub-item-aproximado",
+    ),
+    pytest.param(
+        ["analyze_task"], {"analyze_task": "Entregas:\n- Configurar banco Redis"},
+        [],
+        {PHASE_1: (False, 0.9), DATABASE: (False, 0.5)},
+        "llm",
+        id="sub-item-ambiguo",
+    ),
+]
+
+
+@pytest.mark.parametrize("tasks_run, outputs, expected_items, expected_decisions, expected_method", CASES)
+def test_extract_completed_items(tasks_run, outputs, expected_items, expected_decisions, expected_method):
+    extraction = extract_completed_items(ROADMAP, PHASE_TO_TASKS, tasks_run, outputs, "\n\n".join(outputs.values()))
+    assert extraction.items == expected_items
+    for item, (completed, confidence) in expected_decisions.items():
+        assert extraction.evidence[item]["completed"] == completed, extraction.evidence[item]["reason"]
+        assert extraction.evidence[item]["confidence"] == confidence, extraction.evidence[item]["reason"]
+    assert extraction.confidence == min(entry["confidence"] for entry in extraction.evidence.values())
+
+
+@pytest.mark.parametrize("tasks_run, outputs, expected_items, expected_decisions, expected_method", CASES)
+def test_status_update_falls_back_to_llm_when_confidence_is_low(monkeypatch, tasks_run, outputs, expected_items,
+                                                                expected_decisions, expected_method):
+    monkeypatch.setattr(crew_orchestrator, "STATUS_EXTRACTION_MODE", "auto")
+    monkeypatch.setattr(crew_orchestrator, "STATUS_EXTRACTION_MIN_CONFIDENCE", 0.75)
+    monkeypatch.setattr(
+        crew_orchestrator, "extract_status_locally",
+        lambda state: extract_completed_items(ROADMAP, PHASE_TO_TASKS, tasks_run, outputs, ""),
+    )
+    llm_calls = []
+
+    def fake_status_update_crew(state, progress_callback=None):
+        llm_calls.append(state)
+        return ["itens do LLM"], {"tokens_before": 0, "tokens_after": 0, "tokens_saved": 0}
+
+    monkeypatch.setattr(crew_orchestrator, "run_status_update_crew", fake_status_update_crew)
+
+    items, report = crew_orchestrator.run_status_update_stage({"tasks_for_dev_crew": tasks_run})
+    assert report["method"] == expected_method
+    assert items == (["itens do LLM"] if expected_method == "llm" else expected_items)
+    assert len(llm_calls) == (1 if expected_method == "llm" else 0)
+
+
+def test_already_completed_items_are_not_repeated():
+    outputs = {"analyze_task": "Análise concluída.", "design_task": "Arquitetura."}
+    extraction = extract_completed_items(ROADMAP, PHASE_TO_TASKS, BOTH_TASKS, outputs, completed_items=[REQUIREMENTS])
+    assert extraction.items == [PHASE_1, DATABASE]
+    assert REQUIREMENTS not in extraction.evidence
+
+
+@pytest.mark.parametrize("development_result, completed, confidence", [
+    ("Nada relacionado a esta fase.", False, 1.0),
+    (f"## {PHASE_2}\nDocker Compose configurado.", False, 0.0),
+])
+def test_phase_without_mapped_tasks_is_left_to_the_llm_when_cited(development_result, completed, confidence):
+    roadmap = {PHASE_2: []}
+    extraction = extract_completed_items(roadmap, {}, [], {}, development_result)
+    assert extraction.items == []
+    assert extraction.evidence[PHASE_2]["completed"] == completed
+    assert extraction.evidence[PHASE_2]["confidence"] == confidence
+
+
+def test_phase_names_are_matched_approximately_to_their_tasks():
+    roadmap = {"Fase 1: Descoberta & Design": []}
+    outputs = {"analyze_task": "Resumo.", "design_task": "Arquitetura."}
+    extraction = extract_completed_items(roadmap, PHASE_TO_TASKS, BOTH_TASKS, outputs)
+    assert extraction.items == ["Fase 1: Descoberta & Design"]
+
+
+@pytest.mark.parametrize("text, band", [
+    (f"- {DATABASE}", "exato"),
+    ("- Configurar bancos de dados Postgres", "aproximado"),
+    ("- Configurar banco Redis", "ambiguo"),
+    ("- Criar endpoints de login", "ruido"),
+])
+def test_similarity_bands_used_by_the_cases(text, band):
+    # Mantém os casos acima honestos se os limites de semelhança mudarem
+    ratio = best_match(DATABASE, text)
+    assert band == (
+        "exato" if ratio == 1.0
+        else "aproximado" if ratio >= FUZZY_MATCH_THRESHOLD
+        else "ambiguo" if ratio >= FUZZY_AMBIGUOUS_THRESHOLD
+        else "ruido"
+    )
@@ -0,0 +1,315 @@
+import os
+import json
+import uuid
+import time
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Carrega as variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Rastreamento por execução: spans aninhados (tarefa Celery -> kickoff da crew -> tarefa -> chamadas ao LLM e
+# às ferramentas) com duração, tokens e tamanhos. Cada execução tem um arquivo em TRACES_DIR/<trace_id>.jsonl,
+# uma ExportTraceServiceRequest do OTLP em JSON por linha (o formato do file exporter do OpenTelemetry).
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACES_DIR = os.getenv("TRACES_DIR", "traces")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "crewai_clinic_system")
+
+# Códigos de status e tipo de span do OTLP
+STATUS_OK = 1
+STATUS_ERROR = 2
+SPAN_KIND_INTERNAL = 1
+
+# Span aberto no contexto atual (execução, thread ou corrotina)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def trace_id_for_run(run_id: str) -> str:
+    """Id do trace (32 dígitos hex) derivado do id da execução: as etapas em workers diferentes caem no mesmo trace."""
+    try:
+        return uuid.UUID(str(run_id)).hex
+    except ValueError:
+        return hashlib.sha256(str(run_id).encode("utf-8")).hexdigest()[:32]
+
+
+def trace_path(run_id: str) -> str:
+    return os.path.join(TRACES_DIR, f"{trace_id_for_run(run_id)}.jsonl")
+
+
+class Span:
+    """Um intervalo medido da execução, com atributos (tokens, tamanhos, nomes) e status."""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str, recorder, attributes: dict, start_ns: int = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.recorder = recorder
+        self.attributes = {key: value for key, value in attributes.items() if value is not None}
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.error = message or "erro"
+
+    def end(self, end_ns: int = None):
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            self.recorder.add(self)
+
+
+class _NoopSpan:
+    """Span usado fora de uma execução rastreada (ou com o rastreamento desligado): não grava nada."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _attribute_value(value: dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    for kind in ("boolValue", "doubleValue", "stringValue"):
+        if kind in value:
+            return value[kind]
+    return None
+
+
+def to_otlp(spans: list) -> dict:
+    """Spans no formato ExportTraceServiceRequest do OTLP (JSON: ids em hex, inteiros de 64 bits como string)."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", TRACING_SERVICE_NAME), _attribute("process.pid", os.getpid())]},
+        "scopeSpans": [{
+            "scope": {"name": "crewai_clinic_system.tracing"},
+            "spans": [{
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": SPAN_KIND_INTERNAL,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [_attribute(key, value) for key, value in span.attributes.items()],
+                "status": {"code": STATUS_ERROR, "message": span.error} if span.error else {"code": STATUS_OK},
+            } for span in spans],
+        }],
+    }]}
+
+
+class _TraceRecorder:
+    """
+    Spans de uma execução (ou de uma etapa do pipeline) neste processo, gravados juntos numa linha do arquivo
+    quando o span raiz termina. Spans que terminam depois disso (ex: tarefa abandonada por tempo esgotado)
+    são gravados numa linha própria.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.trace_id = trace_id_for_run(run_id)
+        self._spans = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            if not self._closed:
+                self._spans.append(span)
+                return
+        self._write([span])
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            spans, self._spans = self._spans, []
+        self._write(spans)
+
+    def _write(self, spans: list):
+        if not spans:
+            return
+        try:
+            os.makedirs(TRACES_DIR, exist_ok=True)
+            # Uma única escrita em modo append por linha: processos diferentes podem gravar no mesmo arquivo
+            with open(trace_path(self.run_id), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(to_otlp(spans), ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Erro ao gravar o trace da execução {self.run_id} em '{TRACES_DIR}': {e}")
+
+
+def current_span():
+    """Span aberto no contexto atual, ou None fora de uma execução rastreada."""
+    return _current_span.get()
+
+
+@contextmanager
+def use_span(span):
+    """Torna `span` o span atual dentro do bloco (para repassá-lo a outra thread ou event loop)."""
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def _open_span(span: Span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+@contextmanager
+def trace_run(run_id: str, name: str, **attributes):
+    """
+    Span raiz de uma execução (ou de uma etapa do pipeline em um worker). Os spans abertos dentro do bloco,
+    inclusive em threads que copiam o contexto, entram no trace da execução, gravado ao final do bloco.
+    """
+    if not TRACING_ENABLED or not run_id:
+        yield _NOOP_SPAN
+        return
+    recorder = _TraceRecorder(run_id)
+    parent = _current_span.get()
+    root = Span(name, recorder.trace_id, parent.span_id if parent else None, recorder, {"run_id": run_id, **attributes})
+    try:
+        with _open_span(root):
+            yield root
+    finally:
+        recorder.close()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Span filho do span atual; fora de uma execução rastreada não faz nada."""
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+    with _open_span(Span(name, parent.trace_id, parent.span_id, parent.recorder, attributes)) as child:
+        yield child
+
+
+def record_span(name: str, start_ns: int, end_ns: int = None, parent=None, error: str = None, **attributes):
+    """Registra um span já concluído (medido por callbacks), filho de `parent` ou do span atual."""
+    parent = parent or _current_span.get()
+    if parent is None:
+        return
+    finished = Span(name, parent.trace_id, parent.span_id, parent.recorder, attributes, start_ns=start_ns)
+    if error:
+        finished.set_error(error)
+    finished.end(end_ns)
+
+
+def _load_trace_requests(run_id: str) -> list:
+    """ExportTraceServiceRequests gravados da execução (um por linha do arquivo). Linhas inválidas são ignoradas."""
+    try:
+        with open(trace_path(run_id), 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    requests = []
+    for line in lines:
+        try:
+            requests.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return requests
+
+
+def load_trace(run_id: str) -> list:
+    """Spans gravados da execução (formato OTLP, achatados), em ordem de início. Linhas inválidas são ignoradas."""
+    spans = []
+    for request in _load_trace_requests(run_id):
+        for resource_spans in request.get("resourceSpans", []):
+            for scope_spans in resource_spans.get("scopeSpans", []):
+                spans.extend(scope_spans.get("spans", []))
+    spans.sort(key=lambda item: int(item["startTimeUnixNano"]))
+    return spans
+
+
+def load_trace_otlp(run_id: str) -> dict:
+    """
+    Spans gravados da execução num único ExportTraceServiceRequest: as linhas do arquivo (uma por processo e
+    span raiz) são unidas por resource e por scope, que são mantidos como foram gravados.
+    """
+    resources = {}
+    for request in _load_trace_requests(run_id):
+        for resource_spans in request.get("resourceSpans", []):
+            resource = resource_spans.get("resource", {})
+            merged = resources.setdefault(
+                json.dumps(resource, sort_keys=True), {"resource": resource, "scopes": {}}
+            )
+            for scope_spans in resource_spans.get("scopeSpans", []):
+                scope = scope_spans.get("scope", {})
+                merged["scopes"].setdefault(
+                    json.dumps(scope, sort_keys=True), {"scope": scope, "spans": []}
+                )["spans"].extend(scope_spans.get("spans", []))
+    return {"resourceSpans": [
+        {"resource": merged["resource"], "scopeSpans": list(merged["scopes"].values())}
+        for merged in resources.values()
+    ]}
+
+
+def build_waterfall(spans: list) -> dict:
+    """
+    Linhas da visualização em cascata: cada span com profundidade, início e duração relativos ao trace
+    (em ms e em % da duração total) e atributos, na ordem pai -> filhos.
+    """
+    if not spans:
+        return {"rows": [], "duration_ms": 0}
+    start = min(int(item["startTimeUnixNano"]) for item in spans)
+    end = max(int(item["endTimeUnixNano"]) for item in spans)
+    total = max(end - start, 1)
+    children = {}
+    ids = {item["spanId"] for item in spans}
+    for item in spans:
+        parent = item.get("parentSpanId") if item.get("parentSpanId") in ids else ""
+        children.setdefault(parent, []).append(item)
+
+    rows = []
+
+    def visit(item, depth):
+        span_start, span_end = int(item["startTimeUnixNano"]), int(item["endTimeUnixNano"])
+        rows.append({
+            "name": item["name"],
+            "depth": depth,
+            "start_ms": (span_start - start) / 1e6,
+            "duration_ms": (span_end - span_start) / 1e6,
+            "offset_pct": (span_start - start) / total * 100,
+            "width_pct": max((span_end - span_start) / total * 100, 0.2),
+            "attributes": {attribute["key"]: _attribute_value(attribute["value"]) for attribute in item.get("attributes", [])},
+            "error": (item.get("status") or {}).get("message") if (item.get("status") or {}).get("code") == STATUS_ERROR else None,
+        })
+        for child in children.get(item["spanId"], []):
+            visit(child, depth + 1)
+
+    for root in children.get("", []):
+        visit(root, 0)
+    return {"rows": rows, "duration_ms": total / 1e6}